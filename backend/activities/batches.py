@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import uuid
+from typing import Any
+
+from temporalio import activity
+
+from ..app.db import session_scope
+from ..app.events.bus import get_bus
+from ..app.events.envelope import Event
+from ..app.models import Batch, BatchDriver, RunStatus
+from ..app.services.batches import Item, claim_batch_items, claimed_items, set_item_status
+from ..app.services.dispatch import portal_target
+from ..app.settings import get_settings
+
+
+@activity.defn
+async def get_batch_info(batch_id: str) -> dict[str, Any]:
+    async with session_scope() as s:
+        b = await s.get(Batch, uuid.UUID(batch_id))
+        if b is None:
+            raise ValueError(f"batch {batch_id} not found")
+        return {"purpose": b.purpose, "valid_rows": b.valid_rows}
+
+
+@activity.defn
+async def claim_batch_page(batch_id: str, purpose: str, limit: int) -> list[dict[str, Any]]:
+    # The claimant id is the same on every retry of this call, so a retry
+    # after the claim committed gets that page back instead of claiming (and
+    # stranding) another one
+    info = activity.info()
+    claimant = f"workflow:{info.workflow_id}:{info.workflow_run_id}:{info.activity_id}"
+    bid = uuid.UUID(batch_id)
+    claimed = await claimed_items(bid, purpose, claimant)
+    if claimed:
+        # Owners no longer running were failed by the earlier attempt
+        return [
+            await _page_item(it, recorded=it.owner and status is not RunStatus.running) for it, status in claimed
+        ]
+    items = await claim_batch_items(bid, purpose, limit, claimant, driver=BatchDriver.workflow)
+    return [await _page_item(it) for it in items]
+
+
+async def _page_item(it: Item, recorded: bool = False) -> dict[str, Any]:
+    s = get_settings()
+    item: dict[str, Any] = {
+        "batch_id": str(it.batch_id),
+        "row_num": it.row_num,
+        "payer_id": it.payer_id,
+        "run_id": str(it.run_id),
+        "owner": it.owner,
+        "local_emit": s.emit_local_activity,
+    }
+    if not it.owner:
+        return item
+    if recorded:
+        item["error"] = "not_configured"
+        return item
+    try:
+        target = await portal_target(it.payer_id, it.purpose)
+        item.update(flow_hash=target.flow_hash, credential_id=target.credential_id, input=it.input)
+    except ValueError as e:
+        # Recorded here; the workflow only counts it
+        await _record(it, RunStatus.failed, error=str(e), error_code="not_configured")
+        item["error"] = str(e)
+    return item
+
+
+@activity.defn
+async def record_batch_item(item: dict[str, Any], output: dict | None, error: str | None) -> None:
+    status = RunStatus.failed if error else RunStatus.succeeded
+    it = Item(uuid.UUID(item["batch_id"]), item["row_num"], "", item["payer_id"], uuid.UUID(item["run_id"]))
+    await _record(it, status, output=output, error=error)
+
+
+async def _record(item: Item, status: RunStatus, **result: Any) -> None:
+    await set_item_status(item, status, **result)
+    await get_bus().publish(
+        Event(type=f"run.{status.value}", run_id=str(item.run_id), batch_id=str(item.batch_id), payload={}).dict()
+    )
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
-import json
-
-import redis.asyncio as aioredis
 from temporalio import activity
 
+from ..app.events.bus import EventBus
+from ..app.events.emitter import BufferedEmitter
+from ..app.metrics import EMIT_EVENT, timed
+from ..app.tracing import annotate, current_carrier, run_id_from_workflow_id
 from ..app.settings import get_settings
 
 
+# Worker-wide: one pooled Redis client and one coalescing emitter per process
+_emitter: BufferedEmitter | None = None
+
+
+def get_emitter() -> BufferedEmitter:
+    global _emitter
+    if _emitter is None:
+        s = get_settings()
+        _emitter = BufferedEmitter(EventBus(s.redis_url), flush_interval=s.emit_flush_interval_ms / 1000)
+    return _emitter
+
+
+async def close_emitter() -> None:
+    global _emitter
+    if _emitter is not None:
+        await _emitter.close()
+        await _emitter.bus.close()
+        _emitter = None
+
+
 @activity.defn
 async def emit_event(event: dict) -> None:
-    s = get_settings()
-    r = aioredis.from_url(s.redis_url)
-    try:
-        await r.publish("events", json.dumps(event))
-    finally:
-        await r.close()
+    # Same path as the API: durable stream entry + pub/sub fan-out. Workflow
+    # events get the activity span's context so SSE delivery joins the trace.
+    annotate(run_id=event.get("run_id") or run_id_from_workflow_id(activity.info().workflow_id or ""))
+    if not event.get("trace"):
+        event = {**event, "trace": current_carrier()}
+    with timed(EMIT_EVENT):
+        await get_emitter().emit(event)
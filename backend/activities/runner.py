@@ -1,13 +1,31 @@
 from __future__ import annotations
 
+import time
 from typing import Any
 
 from temporalio import activity
 
+from ..agents.playwright_executor import execute
+from ..app.metrics import FLOW_DURATION
+from ..app.tracing import annotate, run_id_from_workflow_id
+from ..dsl.compiler import get_registry
 
-@activity.defn
-async def run_steps(flow_yaml: str) -> dict[str, Any]:
-    # Stub: validate YAML and return deterministic mock output
-    # Real implementation will execute via Playwright
-    return {"ok": True, "summary": "stubbed execution", "length": len(flow_yaml)}
 
+@activity.defn
+async def run_steps(flow_hash: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+    # Workflows carry only the content hash; the IR comes from the per-process
+    # cache (compiled at most once per worker) backed by the shared registry.
+    params = params or {}
+    run_id = run_id_from_workflow_id(activity.info().workflow_id or "")
+    annotate(run_id=run_id, payer=params.get("payer_id"), flow=flow_hash[:12])
+    if run_id:
+        params = {**params, "run_id": run_id}
+    flow = await get_registry().get(flow_hash)
+    t0 = time.perf_counter()
+    outcome = "failed"
+    try:
+        result = await execute(flow, params)
+        outcome = "succeeded"
+    finally:
+        FLOW_DURATION.labels(params.get("payer_id", "default"), flow_hash[:12], outcome).observe(time.perf_counter() - t0)
+    return {"ok": True, "flow_hash": flow_hash, "steps": len(flow.steps), **result}
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import uuid
+from typing import Any
+
+from temporalio import activity
+
+from ..app.models import RunStatus
+from ..app.services.dispatch import record_run_result
+
+
+@activity.defn
+async def record_run(run_id: str, output: dict | None, error: str | None, error_code: str = "portal_error") -> None:
+    # Result of a standalone run (started by start_run); batch items are
+    # recorded by their driver instead
+    status = RunStatus.failed if error else RunStatus.succeeded
+    result: dict[str, Any] = {"error": error, "error_code": error_code} if error else {"output": output}
+    await record_run_result(uuid.UUID(run_id), status, **result)
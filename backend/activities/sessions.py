@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import logging
+
+from temporalio import activity
+
+from ..agents.sessions import get_session_cache, probe
+from ..workflows.client import get_temporal_client
+
+
+log = logging.getLogger(__name__)
+
+
+@activity.defn
+async def session_checkout(payer_id: str, credential_id: str, owner: str) -> str:
+    # "valid": a cached session passed its probe; "owner": caller must log in
+    # (and holds the re-auth lock); "wait": another workflow is logging in
+    cache = get_session_cache()
+    state = await cache.get(payer_id, credential_id)
+    if state is not None:
+        if await probe(payer_id, state):
+            return "valid"
+        await cache.invalidate(payer_id, credential_id)
+    if await cache.try_lock(payer_id, credential_id, owner):
+        return "owner"
+    # Register for the owner's release, then look again in case it released
+    # between the two calls and nobody is left to wake us
+    await cache.add_waiter(payer_id, credential_id, owner)
+    if await cache.try_lock(payer_id, credential_id, owner):
+        return "owner"
+    return "wait"
+
+
+@activity.defn
+async def session_refresh(payer_id: str, credential_id: str, owner: str) -> bool:
+    return await get_session_cache().refresh_lock(payer_id, credential_id, owner)
+
+
+@activity.defn
+async def session_release(payer_id: str, credential_id: str, owner: str) -> None:
+    cache = get_session_cache()
+    await cache.release(payer_id, credential_id, owner)
+    waiters = await cache.pop_waiters(payer_id, credential_id)
+    if not waiters:
+        return
+    client = await get_temporal_client()
+    for workflow_id in waiters:
+        try:
+            await client.get_workflow_handle(workflow_id).signal("session_released")
+        except Exception as e:  # finished or timed out meanwhile
+            log.info("could not wake %s: %s", workflow_id, e)
@@ -1,8 +1,421 @@
 from __future__ import annotations
 
-# Stub module; real implementation will map DSL to Playwright actions.
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
-async def execute(flow_yaml: str) -> dict:
-    # Placeholder execution; to be replaced with Playwright logic
-    return {"executed": True}
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+from prometheus_client import Counter, Gauge, Histogram
 
+from ..app.artifacts.cas import get_chunk_store
+from ..app.settings import get_settings
+from ..dsl.compiler import FlowIR, Step, Template
+from .sessions import get_session_cache
+
+
+log = logging.getLogger(__name__)
+
+POOL_BROWSERS = Gauge("browser_pool_browsers", "Live pooled browsers", multiprocess_mode="livesum")
+POOL_CAPACITY = Gauge("browser_pool_capacity", "Context slots across live browsers", multiprocess_mode="livesum")
+POOL_IN_USE = Gauge("browser_pool_contexts_in_use", "Contexts currently handed out", multiprocess_mode="livesum")
+POOL_PAYER_IN_USE = Gauge("browser_pool_payer_contexts_in_use", "Contexts in use per payer", ["payer"], multiprocess_mode="livesum")
+POOL_WAIT = Histogram("browser_pool_acquire_wait_seconds", "Time waiting for a context slot")
+POOL_RECYCLES = Counter("browser_pool_recycles_total", "Browser recycles", ["reason"])
+
+
+def _tree_rss_bytes(root_pids: list[int]) -> dict[int, int] | None:
+    # Linux only: RSS of each process plus all of its descendants (Chromium
+    # keeps renderers, GPU and utility processes as children of the browser
+    # process), from one pass over /proc for the whole pool
+    try:
+        children: dict[int, list[int]] = {}
+        rss: dict[int, int] = {}
+        page = os.sysconf("SC_PAGE_SIZE")
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            pid = int(entry)
+            children.setdefault(int(fields[1]), []).append(pid)  # field 4: ppid
+            rss[pid] = int(fields[21]) * page  # field 24: rss pages
+    except OSError:
+        return None
+    totals: dict[int, int] = {}
+    for root in root_pids:
+        total, stack = 0, [root]
+        while stack:
+            pid = stack.pop()
+            total += rss.get(pid, 0)
+            stack.extend(children.get(pid, ()))
+        totals[root] = total
+    return totals
+
+
+def _browser_pid(marker: str) -> int | None:
+    # Once per launch: find the browser process by its marker argument
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                if marker.encode() in f.read():
+                    return int(entry)
+        except OSError:
+            continue
+    return None
+
+
+class PooledBrowser:
+    def __init__(self, slot: int, generation: int, browser: Browser, pid: int | None) -> None:
+        self.slot = slot
+        self.generation = generation
+        self.browser = browser
+        self.pid = pid
+        self.active = 0
+        self.served = 0
+        self.draining = False
+        self.crashed = False
+        browser.on("disconnected", lambda _: self._on_disconnect())
+
+    def _on_disconnect(self) -> None:
+        if not self.draining:
+            self.crashed = True
+
+    @property
+    def usable(self) -> bool:
+        return not (self.draining or self.crashed) and self.browser.is_connected()
+
+
+class BrowserPool:
+    # Pre-launched browsers handing out isolated contexts. A browser is
+    # recycled after serving max_contexts contexts, when its process tree
+    # passes max_rss_mb, when a health probe fails, or when it crashes.
+    # Recycling runs in the background; a slot whose relaunch fails is
+    # retried with backoff while the other slots keep serving.
+    def __init__(
+        self,
+        size: int,
+        contexts_per_browser: int = 4,
+        max_contexts: int = 200,
+        max_rss_mb: int = 1500,
+        payer_limits: dict[str, int] | None = None,
+        default_payer_limit: int | None = None,
+        health_interval_s: float = 30.0,
+    ) -> None:
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.max_contexts = max_contexts
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.payer_limits = payer_limits or {}
+        self.default_payer_limit = default_payer_limit or size * contexts_per_browser
+        self.health_interval_s = health_interval_s
+        self._pw: Playwright | None = None
+        self._browsers: list[PooledBrowser | None] = [None] * size
+        self._generation = 0
+        self._cond = asyncio.Condition()
+        self._payer_in_use: dict[str, int] = {}
+        self._health_task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+        self._started = False
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        self._pw = await async_playwright().start()
+        await asyncio.gather(*(self._launch(i) for i in range(self.size)))
+        self._health_task = asyncio.create_task(self._health_loop())
+        self._started = True
+        self._report()
+
+    async def _launch(self, slot: int) -> None:
+        assert self._pw is not None
+        self._generation += 1
+        marker = f"--rcm-pool-browser={os.getpid()}-{slot}-{self._generation}"
+        generation = self._generation
+        browser = await self._pw.chromium.launch(headless=True, args=[marker])
+        pid = await asyncio.to_thread(_browser_pid, marker)
+        async with self._cond:
+            self._browsers[slot] = PooledBrowser(slot, generation, browser, pid)
+            self._cond.notify_all()
+
+    async def _refill(self, slot: int) -> None:
+        delay = 1.0
+        while self._started:
+            try:
+                await self._launch(slot)
+                self._report()
+                return
+            except Exception:
+                log.exception("relaunching browser slot %d failed; retrying in %.0fs", slot, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _payer_limit(self, payer_id: str) -> int:
+        return self.payer_limits.get(payer_id, self.default_payer_limit)
+
+    def _pick(self, payer_id: str) -> PooledBrowser | None:
+        if self._payer_in_use.get(payer_id, 0) >= self._payer_limit(payer_id):
+            return None
+        best: PooledBrowser | None = None
+        for b in self._browsers:
+            if b is not None and b.usable and b.active < self.contexts_per_browser:
+                if best is None or b.active < best.active:
+                    best = b
+        return best
+
+    @asynccontextmanager
+    async def context(self, payer_id: str = "default", **context_kwargs: Any) -> AsyncIterator[BrowserContext]:
+        t0 = time.perf_counter()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._pick(payer_id) is not None)
+            pb = self._pick(payer_id)
+            assert pb is not None
+            pb.active += 1
+            self._payer_in_use[payer_id] = self._payer_in_use.get(payer_id, 0) + 1
+        POOL_WAIT.observe(time.perf_counter() - t0)
+        self._report(payer_id)
+        ctx: BrowserContext | None = None
+        try:
+            ctx = await pb.browser.new_context(**context_kwargs)
+            yield ctx
+        finally:
+            if ctx is not None:
+                try:
+                    await ctx.close()
+                except Exception:
+                    pass  # browser may have crashed underneath us
+            async with self._cond:
+                pb.active -= 1
+                pb.served += 1
+                self._payer_in_use[payer_id] -= 1
+                self._cond.notify_all()
+            self._report(payer_id)
+            # Never fails or delays the caller's (finished) run
+            if pb.draining or pb.crashed or pb.served >= self.max_contexts or not pb.browser.is_connected():
+                self._spawn(self._maybe_recycle(pb))
+
+    async def _maybe_recycle(self, pb: PooledBrowser, reason: str | None = None) -> None:
+        if reason is None:
+            if pb.crashed or not pb.browser.is_connected():
+                reason = "crash"
+            elif pb.served >= self.max_contexts:
+                reason = "contexts"
+            elif pb.draining:
+                reason = "drained"
+        if reason is None:
+            return
+        pb.draining = True
+        if pb.active > 0 and reason != "crash":
+            return  # finish in-flight contexts; the last release recycles it
+        if self._browsers[pb.slot] is not pb:
+            return  # already replaced
+        self._browsers[pb.slot] = None
+        POOL_RECYCLES.labels(reason).inc()
+        log.info("recycling browser slot %d (gen %d): %s", pb.slot, pb.generation, reason)
+        self._report()
+        try:
+            await pb.browser.close()
+        except Exception:
+            pass
+        self._spawn(self._refill(pb.slot))
+
+    async def _probe(self, pb: PooledBrowser) -> bool:
+        try:
+            ctx = await asyncio.wait_for(pb.browser.new_context(), timeout=10)
+            try:
+                page = await ctx.new_page()
+                return await asyncio.wait_for(page.evaluate("1 + 1"), timeout=10) == 2
+            finally:
+                await ctx.close()
+        except Exception:
+            return False
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval_s)
+            browsers = [pb for pb in self._browsers if pb is not None]
+            pids = [pb.pid for pb in browsers if pb.pid is not None and pb.active == 0]
+            rss = await asyncio.to_thread(_tree_rss_bytes, pids) if pids else None
+            for pb in browsers:
+                try:
+                    if pb.crashed or not pb.browser.is_connected():
+                        await self._maybe_recycle(pb, "crash")
+                    elif pb.active == 0 and not pb.draining:
+                        if not await self._probe(pb):
+                            await self._maybe_recycle(pb, "health")
+                        elif rss and pb.pid is not None and rss.get(pb.pid, 0) > self.max_rss:
+                            await self._maybe_recycle(pb, "rss")
+                        else:
+                            await self._maybe_recycle(pb)
+                except Exception:
+                    log.exception("browser health check failed for slot %d", pb.slot)
+
+    def stats(self) -> dict[str, Any]:
+        live = [b for b in self._browsers if b is not None and b.usable]
+        in_use = sum(b.active for b in self._browsers if b is not None)
+        capacity = len(live) * self.contexts_per_browser
+        return {
+            "browsers": len(live),
+            "capacity": capacity,
+            "in_use": in_use,
+            "saturation": in_use / capacity if capacity else 1.0,
+            "per_payer": dict(self._payer_in_use),
+        }
+
+    def _report(self, payer_id: str | None = None) -> None:
+        st = self.stats()
+        POOL_BROWSERS.set(st["browsers"])
+        POOL_CAPACITY.set(st["capacity"])
+        POOL_IN_USE.set(st["in_use"])
+        if payer_id is not None:
+            POOL_PAYER_IN_USE.labels(payer_id).set(self._payer_in_use.get(payer_id, 0))
+
+    async def close(self) -> None:
+        self._started = False
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for task in list(self._background):
+            task.cancel()
+        for pb in self._browsers:
+            if pb is not None:
+                pb.draining = True
+                try:
+                    await pb.browser.close()
+                except Exception:
+                    pass
+        self._browsers = [None] * self.size
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+        self._started = False
+
+
+_pool: BrowserPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> BrowserPool:
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            s = get_settings()
+            # Each browser worker process has its own pool and runs at most
+            # WORKER_BROWSER_SLOTS steps at once; more browsers would sit idle
+            # (and multiply by the number of browser processes)
+            size = s.browser_pool_size or math.ceil(s.worker_browser_slots / s.browser_contexts_per_browser)
+            pool = BrowserPool(
+                size=max(1, size),
+                contexts_per_browser=s.browser_contexts_per_browser,
+                max_contexts=s.browser_max_contexts,
+                max_rss_mb=s.browser_max_rss_mb,
+                payer_limits={p: int(c["max_contexts"]) for p, c in s.payer_limits.items() if "max_contexts" in c},
+            )
+            await pool.start()
+            _pool = pool
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def _render(v: Any, params: dict[str, Any]) -> Any:
+    return v.render(params) if isinstance(v, Template) else v
+
+
+async def _run_step(page, step: Step, params: dict[str, Any], out: dict[str, Any]) -> str | None:
+    # Returns a breakpoint reason when the flow needs a human
+    op, sel = step.op, step.selector
+    if op == "navigate":
+        await page.goto(_render(step.param("url"), params))
+    elif op == "input":
+        await page.fill(sel, _render(step.param("value"), params))
+    elif op == "click":
+        await page.click(sel)
+    elif op == "wait":
+        await page.wait_for_selector(sel, state=step.param("state", "visible"), timeout=step.param("timeout_ms", 30_000))
+    elif op == "extract":
+        for name, spec in step.param("mappings"):
+            if isinstance(spec, tuple):
+                d = dict(spec)
+                loc = page.locator(d["selector"]).first
+                out["extracted"][name] = await loc.get_attribute(d["attr"]) if d.get("attr") else await loc.inner_text()
+            else:
+                out["extracted"][name] = (await page.locator(spec).first.inner_text()).strip()
+    elif op == "assert":
+        want = _render(step.param("contains"), params)
+        text = await page.locator(sel).first.inner_text()
+        if want not in text:
+            raise AssertionError(f"{sel!r} does not contain {want!r}")
+    elif op == "emit":
+        mapping = dict(step.param("map") or ())
+        out["emitted"].append(
+            {
+                "schema": step.param("schema"),
+                "data": {
+                    k: out["extracted"].get(v[1:]) if isinstance(v, str) and v.startswith("$") else _render(v, params)
+                    for k, v in mapping.items()
+                },
+            }
+        )
+    elif op == "breakpoint":
+        return str(_render(step.param("reason"), params))
+    return None
+
+
+async def _save_failure_dom(page, run_id: str, payer_id: str) -> None:
+    # The page a step failed on, kept as a chunked run artifact for replay
+    # debugging (GET /runs/{id}/artifacts/failure.html). Best effort: the
+    # step's own error is what the run reports.
+    try:
+        html = (await page.content()).encode()
+        await asyncio.to_thread(
+            get_chunk_store().put_run_artifact, run_id, "failure.html", html, "text/html", payer_id
+        )
+    except Exception as e:
+        log.warning("could not save failure DOM for run %s: %s", run_id, e)
+
+
+async def execute(flow: FlowIR, params: dict[str, Any] | None = None) -> dict:
+    params = params or {}
+    payer_id = params.get("payer_id", "default")
+    # params["session"] = {"credential_id": ..., "save": bool}: start from the
+    # cached storage_state and/or persist the one this run ends with
+    session = params.get("session")
+    cache = get_session_cache() if session else None
+    storage_state = await cache.get(payer_id, session["credential_id"]) if cache and session else None
+
+    pool = await get_pool()
+    out: dict[str, Any] = {"extracted": {}, "emitted": [], "breakpoint": None}
+    async with pool.context(payer_id, storage_state=storage_state) as ctx:
+        page = await ctx.new_page()
+        try:
+            for step in flow.steps:
+                reason = await _run_step(page, step, params, out)
+                if reason is not None:
+                    out["breakpoint"] = reason
+                    break
+        except Exception:
+            if params.get("run_id"):
+                await _save_failure_dom(page, params["run_id"], payer_id)
+            raise
+        if cache and session and session.get("save") and out["breakpoint"] is None:
+            await cache.put(payer_id, session["credential_id"], await ctx.storage_state())
+    out["executed"] = True
+    return out
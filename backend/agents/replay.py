@@ -1,7 +1,429 @@
 from __future__ import annotations
 
-# Deterministic replay stub over saved DOM snapshots (to be implemented).
+# Deterministic replay of DSL flows over saved DOM snapshots.
+#
+# Each snapshot is parsed once into a compact, indexed tree; each flow's
+# selectors are compiled once; a regression over many snapshots fans out to a
+# process pool (flows are compiled once per worker process, snapshots travel as
+# paths and are chunked to amortise IPC).
+#
+# CLI: python -m backend.agents.replay --flow flow.yaml --snapshots dir/ [--param name=value] [--workers N] [--out results.ndjson]
+# A snapshot "x.html" is compared against "x.expected.json" when present.
 
-def replay(flow_yaml: str, dom_snapshot: str) -> dict:
-    return {"replayed": True}
+import argparse
+import json
+import os
+import pathlib
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Iterable, Iterator
 
+from ..dsl.compiler import Template, compile_cached
+
+
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class Snapshot:
+    # Flat, preorder node arrays: node i's subtree is [i, end[i]), so descendant
+    # text is a slice join and ancestor checks walk the parent array.
+    __slots__ = ("tag", "attrs", "parent", "end", "text", "by_tag", "by_id", "by_class")
+
+    def __init__(self) -> None:
+        self.tag: list[str] = []
+        self.attrs: list[dict[str, str]] = []
+        self.parent: list[int] = []
+        self.end: list[int] = []
+        self.text: list[str] = []
+        self.by_tag: dict[str, list[int]] = {}
+        self.by_id: dict[str, list[int]] = {}
+        self.by_class: dict[str, list[int]] = {}
+
+    def text_of(self, i: int) -> str:
+        return " ".join(t for t in self.text[i : self.end[i]] if t).strip()
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.snap = Snapshot()
+        self.stack: list[int] = []
+        self._add("#root", {}, -1)
+        self.stack.append(0)
+
+    def _add(self, tag: str, attrs: dict[str, str], parent: int) -> int:
+        s = self.snap
+        i = len(s.tag)
+        s.tag.append(tag)
+        s.attrs.append(attrs)
+        s.parent.append(parent)
+        s.end.append(i + 1)
+        s.text.append("")
+        s.by_tag.setdefault(tag, []).append(i)
+        if "id" in attrs:
+            s.by_id.setdefault(attrs["id"], []).append(i)
+        for c in attrs.get("class", "").split():
+            s.by_class.setdefault(c, []).append(i)
+        return i
+
+    def handle_starttag(self, tag, attrs):
+        i = self._add(tag, {k: v or "" for k, v in attrs}, self.stack[-1])
+        if tag not in _VOID:
+            self.stack.append(i)
+
+    def handle_startendtag(self, tag, attrs):
+        self._add(tag, {k: v or "" for k, v in attrs}, self.stack[-1])
+
+    def handle_endtag(self, tag):
+        # Pop to the matching open tag; tolerate unclosed/misnested markup
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.snap.tag[self.stack[depth]] == tag:
+                del self.stack[depth:]
+                return
+
+    def handle_data(self, data):
+        data = data.strip()
+        if data:
+            i = self.stack[-1]
+            self.snap.text[i] = f"{self.snap.text[i]} {data}" if self.snap.text[i] else data
+
+    def close(self):
+        super().close()
+        # Fix subtree ends now that every node is known
+        s = self.snap
+        for i in range(len(s.tag) - 1, 0, -1):
+            p = s.parent[i]
+            if s.end[i] > s.end[p]:
+                s.end[p] = s.end[i]
+
+
+def parse_snapshot(html: str) -> Snapshot:
+    b = _TreeBuilder()
+    b.feed(html)
+    b.close()
+    return b.snap
+
+
+# --- selectors -----------------------------------------------------------
+
+_COMPOUND = re.compile(
+    r"""(?P<tag>[a-zA-Z][\w-]*|\*)?
+        (?P<rest>(?:\#[\w-]+|\.[\w-]+|\[(?:"[^"]*"|'[^']*'|[^\]"'])+\])*)""",
+    re.X,
+)
+# A selector splits into compounds and combinators; whitespace and ">" inside
+# quoted attribute values (e.g. [aria-label="Member ID"]) belong to the compound
+_TOKEN = re.compile(r"""\s*(?P<child>>)\s*|\s+|(?P<compound>(?:\[(?:"[^"]*"|'[^']*'|[^\]"'])*\]|[^\s>\[])+)""")
+_PART = re.compile(r"\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)\s*(?:(?P<op>[~^$*]?=)\s*(?P<val>\"[^\"]*\"|'[^']*'|[^\]]*))?\]")
+
+
+@dataclass(frozen=True)
+class Compound:
+    tag: str | None
+    id: str | None
+    classes: tuple[str, ...]
+    attrs: tuple[tuple[str, str | None, str | None], ...]
+
+    def matches(self, s: Snapshot, i: int) -> bool:
+        if self.tag and s.tag[i] != self.tag:
+            return False
+        a = s.attrs[i]
+        if self.id and a.get("id") != self.id:
+            return False
+        if self.classes:
+            have = a.get("class", "").split()
+            if any(c not in have for c in self.classes):
+                return False
+        for name, op, val in self.attrs:
+            v = a.get(name)
+            if v is None:
+                return False
+            if op == "=" and v != val:
+                return False
+            if op == "~=" and val not in v.split():
+                return False
+            if op == "^=" and not v.startswith(val or ""):
+                return False
+            if op == "$=" and not v.endswith(val or ""):
+                return False
+            if op == "*=" and (val or "") not in v:
+                return False
+        return True
+
+
+@dataclass(frozen=True)
+class Selector:
+    # Right-to-left: parts[0] is the subject, then (combinator, compound) pairs
+    source: str
+    parts: tuple[tuple[str, Compound], ...]
+
+    def _candidates(self, s: Snapshot) -> Iterable[int]:
+        subject = self.parts[0][1]
+        if subject.id:
+            return s.by_id.get(subject.id, ())
+        if subject.classes:
+            return s.by_class.get(subject.classes[0], ())
+        if subject.tag:
+            return s.by_tag.get(subject.tag, ())
+        return range(1, len(s.tag))
+
+    def select(self, s: Snapshot, first: bool = False) -> list[int]:
+        out: list[int] = []
+        for i in self._candidates(s):
+            if self.parts[0][1].matches(s, i) and self._ancestors_match(s, i, 1):
+                out.append(i)
+                if first:
+                    break
+        return out
+
+    def _ancestors_match(self, s: Snapshot, i: int, k: int) -> bool:
+        if k == len(self.parts):
+            return True
+        comb, comp = self.parts[k]
+        p = s.parent[i]
+        if comb == ">":
+            return p > 0 and comp.matches(s, p) and self._ancestors_match(s, p, k + 1)
+        while p > 0:
+            if comp.matches(s, p) and self._ancestors_match(s, p, k + 1):
+                return True
+            p = s.parent[p]
+        return False
+
+
+def _tokens(source: str) -> list[str]:
+    tokens: list[str] = []
+    pos = 0
+    while pos < len(source):
+        m = _TOKEN.match(source, pos)
+        if m is None:
+            raise ValueError(f"unsupported selector: {source!r}")
+        if m.group("child"):
+            tokens.append(">")
+        elif m.group("compound"):
+            tokens.append(m.group("compound"))
+        pos = m.end()
+    return tokens
+
+
+def compile_selector(source: str) -> Selector:
+    tokens = _tokens(source.strip())
+    parts: list[tuple[str, Compound]] = []
+    comb = " "
+    for tok in tokens:
+        if tok == ">":
+            comb = ">"
+            continue
+        m = _COMPOUND.fullmatch(tok)
+        if not m or not tok:
+            raise ValueError(f"unsupported selector: {source!r}")
+        ident = None
+        classes: list[str] = []
+        attrs: list[tuple[str, str | None, str | None]] = []
+        for pm in _PART.finditer(m.group("rest") or ""):
+            if pm.group("id"):
+                ident = pm.group("id")
+            elif pm.group("cls"):
+                classes.append(pm.group("cls"))
+            else:
+                val = pm.group("val")
+                if val and val[0] in "\"'":
+                    val = val[1:-1]
+                attrs.append((pm.group("attr"), pm.group("op"), val))
+        tag = m.group("tag")
+        parts.append((comb, Compound(None if tag in (None, "*") else tag.lower(), ident, tuple(classes), tuple(attrs))))
+        comb = " "
+    if not parts:
+        raise ValueError(f"empty selector: {source!r}")
+    parts.reverse()
+    # Shift combinators so each entry holds the combinator linking it to the
+    # previous (more specific) part
+    shifted = [(" ", parts[0][1])] + [(parts[k - 1][0], parts[k][1]) for k in range(1, len(parts))]
+    return Selector(source, tuple(shifted))
+
+
+# --- flows ---------------------------------------------------------------
+
+@dataclass
+class CompiledStep:
+    op: str
+    params: dict[str, Any]
+    selector: Selector | None = None
+    extract: dict[str, tuple[Selector, str | None]] = field(default_factory=dict)
+
+
+@dataclass
+class CompiledFlow:
+    steps: list[CompiledStep]
+
+
+def compile_flow(flow_yaml: str) -> CompiledFlow:
+    # Validation and lowering happen once per content hash in the DSL compiler;
+    # here the IR's normalized selectors are turned into snapshot matchers.
+    ir = compile_cached(flow_yaml)
+    steps: list[CompiledStep] = []
+    for st in ir.steps:
+        step = CompiledStep(op=st.op, params=dict(st.params))
+        if st.selector:
+            step.selector = compile_selector(st.selector)
+        if st.op == "extract":
+            for name, spec in st.param("mappings"):
+                if isinstance(spec, tuple):
+                    d = dict(spec)
+                    step.extract[name] = (compile_selector(d["selector"]), d.get("attr"))
+                else:
+                    step.extract[name] = (compile_selector(spec), None)
+        steps.append(step)
+    return CompiledFlow(steps)
+
+
+def _render(v: Any, params: dict[str, Any]) -> Any:
+    # Unbound placeholders keep their source text, so output stays JSON
+    if not isinstance(v, Template):
+        return v
+    return v.render(params) if v.variables <= params.keys() else v.source
+
+
+def run_flow(flow: CompiledFlow, snap: Snapshot, params: dict[str, Any] | None = None) -> dict[str, Any]:
+    params = params or {}
+    extracted: dict[str, Any] = {}
+    emitted: list[dict[str, Any]] = []
+    errors: list[str] = []
+    breakpoints: list[str] = []
+    for n, step in enumerate(flow.steps):
+        if step.op in ("input", "click", "wait") and step.selector is not None:
+            if not step.selector.select(snap, first=True):
+                errors.append(f"step {n} {step.op}: no match for {step.selector.source!r}")
+        elif step.op == "extract":
+            for name, (sel, attr) in step.extract.items():
+                hit = sel.select(snap, first=True)
+                if not hit:
+                    extracted[name] = None
+                    continue
+                extracted[name] = snap.attrs[hit[0]].get(attr) if attr else snap.text_of(hit[0])
+        elif step.op == "assert" and step.selector is not None:
+            want = step.params.get("contains")
+            if isinstance(want, Template) and not want.variables <= params.keys():
+                missing = ", ".join(sorted(want.variables - params.keys()))
+                errors.append(f"step {n} assert: cannot evaluate {want.source!r}, missing parameters {missing}")
+                continue
+            want = _render(want, params)
+            hit = step.selector.select(snap, first=True)
+            if not hit or (want and want not in snap.text_of(hit[0])):
+                errors.append(f"step {n} assert: {step.selector.source!r} does not contain {want!r}")
+        elif step.op == "emit":
+            mapping = dict(step.params.get("map") or ())
+            emitted.append(
+                {
+                    "schema": step.params.get("schema"),
+                    "data": {
+                        k: extracted.get(v[1:]) if isinstance(v, str) and v.startswith("$") else _render(v, params)
+                        for k, v in mapping.items()
+                    },
+                }
+            )
+        elif step.op == "breakpoint":
+            breakpoints.append(str(_render(step.params.get("reason"), params)))
+    return {"extracted": extracted, "emitted": emitted, "errors": errors, "breakpoints": breakpoints}
+
+
+def diff(actual: dict[str, Any], expected: dict[str, Any]) -> dict[str, Any]:
+    # Field-level differences on the fields the expectation pins down
+    a = actual.get("extracted", {})
+    e = expected.get("extracted", expected)
+    return {k: {"expected": v, "actual": a.get(k)} for k, v in sorted(e.items()) if a.get(k) != v}
+
+
+def replay(flow_yaml: str, dom_snapshot: str, params: dict[str, Any] | None = None) -> dict:
+    return run_flow(compile_flow(flow_yaml), parse_snapshot(dom_snapshot), params)
+
+
+# --- parallel engine -----------------------------------------------------
+
+_worker_flows: dict[str, CompiledFlow] = {}
+_worker_params: dict[str, Any] = {}
+
+
+def _init_worker(flows: dict[str, str], params: dict[str, Any] | None = None) -> None:
+    _worker_params.update(params or {})
+    for name, text in flows.items():
+        _worker_flows[name] = compile_flow(text)
+
+
+def _replay_path(path: str) -> list[dict[str, Any]]:
+    p = pathlib.Path(path)
+    snap = parse_snapshot(p.read_text(errors="replace"))
+    exp_path = p.with_name(p.stem + ".expected.json")
+    expected = json.loads(exp_path.read_text()) if exp_path.exists() else None
+    results = []
+    for name, flow in _worker_flows.items():
+        out = run_flow(flow, snap, _worker_params)
+        rec: dict[str, Any] = {"snapshot": str(p), "flow": name, **out}
+        if expected is not None:
+            exp = expected.get(name, expected) if isinstance(expected, dict) else expected
+            rec["diff"] = diff(out, exp)
+        results.append(rec)
+    return results
+
+
+def replay_many(
+    flows: dict[str, str],
+    snapshots: list[str],
+    workers: int | None = None,
+    chunksize: int | None = None,
+    params: dict[str, Any] | None = None,
+) -> Iterator[dict[str, Any]]:
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, min(64, len(snapshots) // (workers * 4) or 1))
+    if workers == 1:
+        _init_worker(flows, params)
+        for path in snapshots:
+            yield from _replay_path(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(flows, params)) as pool:
+        for results in pool.map(_replay_path, snapshots, chunksize=chunksize):
+            yield from results
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Replay DSL flows over saved DOM snapshots")
+    ap.add_argument("--flow", action="append", required=True, help="flow YAML file (repeatable)")
+    ap.add_argument("--snapshots", required=True, help="directory of *.html snapshots")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunksize", type=int, default=None)
+    ap.add_argument("--out", default="-", help="NDJSON output path, '-' for stdout")
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=VALUE", help="flow parameter (repeatable)")
+    args = ap.parse_args(argv)
+    params = dict(p.partition("=")[::2] for p in args.param)
+
+    flows = {pathlib.Path(f).stem: pathlib.Path(f).read_text() for f in args.flow}
+    for text in flows.values():
+        compile_flow(text)  # fail fast before starting workers
+    snapshots = sorted(str(p) for p in pathlib.Path(args.snapshots).rglob("*.html"))
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    failed = mismatched = 0
+    t0 = time.perf_counter()
+    try:
+        for rec in replay_many(flows, snapshots, args.workers, args.chunksize, params):
+            failed += bool(rec["errors"])
+            mismatched += bool(rec.get("diff"))
+            out.write(json.dumps(rec) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    rate = len(snapshots) / elapsed if elapsed else 0.0
+    print(
+        f"replayed {len(snapshots)} snapshots x {len(flows)} flows in {elapsed:.2f}s "
+        f"({rate:.0f} snapshots/s); {failed} with step errors, {mismatched} differing from expected",
+        file=sys.stderr,
+    )
+    return 1 if failed or mismatched else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from typing import Any
+
+import redis.asyncio as aioredis
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ..app.settings import get_settings
+
+
+# Payer portal sessions (Playwright storage_state: cookies + local storage),
+# AES-GCM encrypted at rest in Redis with a TTL. The Redis key is bound into
+# the ciphertext as associated data, so a blob cannot be replayed under
+# another payer/credential. A per-session lock lets exactly one workflow
+# re-authenticate while the others wait for its result.
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SessionCache:
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        key: bytes,
+        default_ttl_s: int = 1800,
+        payer_ttls: dict[str, int] | None = None,
+        lock_ttl_s: int = 900,
+    ) -> None:
+        if len(key) not in (16, 24, 32):
+            raise ValueError("session encryption key must be 16, 24 or 32 bytes")
+        self.redis = redis
+        self._aead = AESGCM(key)
+        self.default_ttl_s = default_ttl_s
+        self.payer_ttls = payer_ttls or {}
+        self.lock_ttl_s = lock_ttl_s
+        self._release = redis.register_script(_RELEASE_LUA)
+        self._refresh = redis.register_script(_REFRESH_LUA)
+
+    @staticmethod
+    def cache_key(payer_id: str, credential_id: str) -> str:
+        # Credential ids never appear in Redis keys in the clear
+        cred = hashlib.sha256(credential_id.encode()).hexdigest()[:24]
+        return f"sessions:{payer_id}:{cred}"
+
+    async def get(self, payer_id: str, credential_id: str) -> dict[str, Any] | None:
+        key = self.cache_key(payer_id, credential_id)
+        blob = await self.redis.get(key)
+        if blob is None:
+            return None
+        try:
+            plain = self._aead.decrypt(blob[:12], blob[12:], key.encode())
+        except Exception:
+            await self.redis.delete(key)  # rotated key or tampered entry
+            return None
+        return json.loads(plain)
+
+    async def put(self, payer_id: str, credential_id: str, storage_state: dict[str, Any], ttl_s: int | None = None) -> None:
+        key = self.cache_key(payer_id, credential_id)
+        nonce = os.urandom(12)
+        blob = nonce + self._aead.encrypt(nonce, json.dumps(storage_state).encode(), key.encode())
+        await self.redis.set(key, blob, ex=ttl_s or self.payer_ttls.get(payer_id, self.default_ttl_s))
+
+    async def invalidate(self, payer_id: str, credential_id: str) -> None:
+        await self.redis.delete(self.cache_key(payer_id, credential_id))
+
+    async def try_lock(self, payer_id: str, credential_id: str, owner: str) -> bool:
+        key = self.cache_key(payer_id, credential_id) + ":lock"
+        if await self.redis.set(key, owner, nx=True, ex=self.lock_ttl_s):
+            return True
+        # Re-entrant for the same owner (activity retries, workflow replays)
+        current = await self.redis.get(key)
+        return current is not None and current.decode() == owner
+
+    async def refresh_lock(self, payer_id: str, credential_id: str, owner: str) -> bool:
+        # Extends the lock while its owner is still logging in (e.g. waiting
+        # for an MFA code); False if it expired and was taken meanwhile
+        key = self.cache_key(payer_id, credential_id) + ":lock"
+        return bool(await self._refresh(keys=[key], args=[owner, self.lock_ttl_s]))
+
+    async def release(self, payer_id: str, credential_id: str, owner: str) -> None:
+        await self._release(keys=[self.cache_key(payer_id, credential_id) + ":lock"], args=[owner])
+
+    async def add_waiter(self, payer_id: str, credential_id: str, waiter: str) -> None:
+        # Workflows parked on the lock, woken by its owner's release
+        key = self.cache_key(payer_id, credential_id) + ":waiters"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, waiter)
+            pipe.expire(key, self.lock_ttl_s)
+            await pipe.execute()
+
+    async def pop_waiters(self, payer_id: str, credential_id: str) -> list[str]:
+        key = self.cache_key(payer_id, credential_id) + ":waiters"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.smembers(key)
+            pipe.delete(key)
+            members, _ = await pipe.execute()
+        return sorted(m.decode() for m in members)
+
+
+async def probe(payer_id: str, storage_state: dict[str, Any]) -> bool:
+    # Validity probe: load the session in a pooled context and check for a
+    # logged-in marker. Payers without a configured probe trust the TTL.
+    cfg = get_settings().payer_session_probes.get(payer_id)
+    if not cfg:
+        return True
+    from .playwright_executor import get_pool
+
+    pool = await get_pool()
+    try:
+        async with pool.context(payer_id, storage_state=storage_state) as ctx:
+            page = await ctx.new_page()
+            await page.goto(cfg["url"], timeout=float(cfg.get("timeout_ms", 15_000)))
+            return await page.locator(cfg["selector"]).count() > 0
+    except Exception:
+        return False
+
+
+_cache: SessionCache | None = None
+
+
+def get_session_cache() -> SessionCache:
+    global _cache
+    if _cache is None:
+        s = get_settings()
+        if not s.session_encryption_key:
+            raise RuntimeError("SESSION_ENCRYPTION_KEY is not set")
+        _cache = SessionCache(
+            aioredis.from_url(s.redis_url),
+            base64.b64decode(s.session_encryption_key),
+            default_ttl_s=s.session_ttl_s,
+            payer_ttls={p: int(c["session_ttl_s"]) for p, c in s.payer_limits.items() if "session_ttl_s" in c},
+            lock_ttl_s=s.session_lock_ttl_s,
+        )
+    return _cache
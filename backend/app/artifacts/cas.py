@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Protocol
+
+import zstandard as zstd
+from botocore.exceptions import ClientError
+
+from . import client
+
+
+# Content-addressed artifact storage. Large text artifacts (DOM snapshots, HAR
+# files) are split into content-defined chunks; each unique chunk is stored once,
+# zstd-compressed (optionally with a per-payer trained dictionary), under
+#   cas/chunks/{dict_id}/{sha256[:2]}/{sha256}.zst
+# and the run keeps only a small manifest at runs/{run_id}/{name}.cas.json.
+
+MANIFEST_SUFFIX = ".cas.json"
+CHUNK_PREFIX = "cas/chunks"
+DICT_PREFIX = "cas/dicts"
+
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+_BOUNDARY_MASK = 0xFF  # 1 in 256 candidate positions ends a chunk
+_WINDOW = 32
+# Candidate cut points: after a newline (HAR/pretty JSON) or a tag end (HTML)
+_CANDIDATE = re.compile(rb"[\n>]")
+
+
+class ObjectStore(Protocol):
+    def exists(self, key: str) -> bool: ...
+    def put(self, key: str, data: bytes) -> None: ...
+    def get(self, key: str) -> bytes: ...
+
+
+class S3Store:
+    def exists(self, key: str) -> bool:
+        return client.exists(key)
+
+    def put(self, key: str, data: bytes) -> None:
+        client.put_bytes(key, data)
+
+    def get(self, key: str) -> bytes:
+        # Missing keys raise KeyError, as MemoryStore does
+        try:
+            return client.get_bytes(key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise KeyError(key) from e
+            raise
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+
+    def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    def put(self, key: str, data: bytes) -> None:
+        self.objects[key] = data
+
+    def get(self, key: str) -> bytes:
+        return self.objects[key]
+
+
+def chunk_boundaries(data: bytes) -> list[tuple[int, int]]:
+    # Content-defined chunking: a candidate position is a cut when the CRC of
+    # the preceding window hits the mask, so an edit only moves nearby cuts and
+    # identical regions keep identical chunks across snapshots.
+    bounds: list[tuple[int, int]] = []
+    start = 0
+    for m in _CANDIDATE.finditer(data):
+        pos = m.end()
+        size = pos - start
+        if size < MIN_CHUNK:
+            continue
+        if size < MAX_CHUNK and zlib.crc32(data[pos - _WINDOW : pos]) & _BOUNDARY_MASK:
+            continue
+        while pos - start > MAX_CHUNK:
+            bounds.append((start, start + MAX_CHUNK))
+            start += MAX_CHUNK
+        bounds.append((start, pos))
+        start = pos
+    while len(data) - start > MAX_CHUNK:
+        bounds.append((start, start + MAX_CHUNK))
+        start += MAX_CHUNK
+    if start < len(data):
+        bounds.append((start, len(data)))
+    return bounds
+
+
+@dataclass
+class ChunkRef:
+    sha256: str
+    size: int
+    key: str
+
+
+@dataclass
+class Manifest:
+    name: str
+    content_type: str
+    size: int
+    dict_key: str | None
+    chunks: list[ChunkRef] = field(default_factory=list)
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self), separators=(",", ":")).encode()
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> "Manifest":
+        d = json.loads(raw)
+        d["chunks"] = [ChunkRef(**c) for c in d["chunks"]]
+        return cls(**d)
+
+
+@dataclass
+class StoreStats:
+    logical_bytes: int = 0
+    chunks: int = 0
+    new_chunks: int = 0
+    new_raw_bytes: int = 0
+    new_stored_bytes: int = 0
+
+    @property
+    def dedupe_ratio(self) -> float:
+        # Logical bytes per byte of newly stored raw chunk data
+        return self.logical_bytes / self.new_raw_bytes if self.new_raw_bytes else float("inf")
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.logical_bytes - self.new_stored_bytes
+
+    def add(self, other: "StoreStats") -> None:
+        for f in ("logical_bytes", "chunks", "new_chunks", "new_raw_bytes", "new_stored_bytes"):
+            setattr(self, f, getattr(self, f) + getattr(other, f))
+
+
+class ChunkStore:
+    def __init__(self, store: ObjectStore | None = None, level: int = 3, known_cache: int = 200_000, io_threads: int = 16) -> None:
+        self.store = store or S3Store()
+        self.level = level
+        # Chunk keys known to exist, so hot chunks skip the HEAD request
+        self._known: OrderedDict[str, None] = OrderedDict()
+        self._known_size = known_cache
+        self._dicts: dict[str, zstd.ZstdCompressionDict] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="cas")
+
+    # --- dictionaries ----------------------------------------------------
+
+    def train_dictionary(self, payer_id: str, samples: list[bytes], size: int = 112_640) -> str:
+        d = zstd.train_dictionary(size, samples, level=self.level)
+        raw = d.as_bytes()
+        key = f"{DICT_PREFIX}/{payer_id}/{hashlib.sha256(raw).hexdigest()[:16]}.zdict"
+        self.store.put(key, raw)
+        self.store.put(f"{DICT_PREFIX}/{payer_id}/current", key.encode())
+        with self._lock:
+            self._dicts[key] = d
+        return key
+
+    def current_dictionary(self, payer_id: str) -> str | None:
+        pointer = f"{DICT_PREFIX}/{payer_id}/current"
+        if not self.store.exists(pointer):
+            return None
+        return self.store.get(pointer).decode()
+
+    def _dictionary(self, key: str) -> zstd.ZstdCompressionDict:
+        with self._lock:
+            d = self._dicts.get(key)
+        if d is None:
+            d = zstd.ZstdCompressionDict(self.store.get(key))
+            with self._lock:
+                self._dicts[key] = d
+        return d
+
+    # --- write -----------------------------------------------------------
+
+    def _is_known(self, key: str) -> bool:
+        with self._lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                return True
+        return False
+
+    def _mark_known(self, key: str) -> None:
+        with self._lock:
+            self._known[key] = None
+            if len(self._known) > self._known_size:
+                self._known.popitem(last=False)
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream", dict_key: str | None = None) -> tuple[Manifest, StoreStats]:
+        dict_id = dict_key.rsplit("/", 1)[-1].removesuffix(".zdict") if dict_key else "raw"
+        manifest = Manifest(name=name, content_type=content_type, size=len(data), dict_key=dict_key)
+        stats = StoreStats(logical_bytes=len(data))
+        pieces: dict[str, tuple[int, int]] = {}
+        for start, end in chunk_boundaries(data):
+            digest = hashlib.sha256(data[start:end]).hexdigest()
+            key = f"{CHUNK_PREFIX}/{dict_id}/{digest[:2]}/{digest}.zst"
+            manifest.chunks.append(ChunkRef(digest, end - start, key))
+            pieces.setdefault(key, (start, end))
+        stats.chunks = len(manifest.chunks)
+
+        unknown = [k for k in pieces if not self._is_known(k)]
+        present = dict(zip(unknown, self._pool.map(self.store.exists, unknown)))
+        missing = [k for k in unknown if not present[k]]
+        for k in unknown:
+            if present[k]:
+                self._mark_known(k)
+
+        def upload(key: str) -> int:
+            # Compressor objects are not thread-safe; one per upload
+            cctx = zstd.ZstdCompressor(level=self.level, dict_data=self._dictionary(dict_key) if dict_key else None)
+            start, end = pieces[key]
+            blob = cctx.compress(data[start:end])
+            self.store.put(key, blob)
+            self._mark_known(key)
+            return len(blob)
+
+        for key, stored in zip(missing, self._pool.map(upload, missing)):
+            start, end = pieces[key]
+            stats.new_chunks += 1
+            stats.new_raw_bytes += end - start
+            stats.new_stored_bytes += stored
+        return manifest, stats
+
+    def put_run_artifact(
+        self, run_id: str, name: str, data: bytes, content_type: str = "application/octet-stream", payer_id: str | None = None
+    ) -> StoreStats:
+        dict_key = self.current_dictionary(payer_id) if payer_id else None
+        manifest, stats = self.put(name, data, content_type, dict_key)
+        self.store.put(f"runs/{run_id}/{name}{MANIFEST_SUFFIX}", manifest.to_json())
+        return stats
+
+    # --- read ------------------------------------------------------------
+
+    def read_manifest(self, run_id: str, name: str) -> Manifest:
+        return Manifest.from_json(self.store.get(f"runs/{run_id}/{name}{MANIFEST_SUFFIX}"))
+
+    def _chunk(self, ref: ChunkRef, dict_key: str | None) -> bytes:
+        dctx = zstd.ZstdDecompressor(dict_data=self._dictionary(dict_key) if dict_key else None)
+        return dctx.decompress(self.store.get(ref.key), max_output_size=ref.size)
+
+    async def iter_object(self, manifest: Manifest, lookahead: int = 4) -> AsyncIterator[bytes]:
+        # Lazily reassemble; fetch a few chunks ahead of the one being sent
+        loop = asyncio.get_running_loop()
+        pending: list[asyncio.Future[bytes]] = []
+        refs = iter(manifest.chunks)
+        for ref in refs:
+            pending.append(loop.run_in_executor(self._pool, self._chunk, ref, manifest.dict_key))
+            if len(pending) >= lookahead:
+                break
+        while pending:
+            data = await pending.pop(0)
+            ref = next(refs, None)
+            if ref is not None:
+                pending.append(loop.run_in_executor(self._pool, self._chunk, ref, manifest.dict_key))
+            yield data
+
+    def get(self, manifest: Manifest) -> bytes:
+        return b"".join(self._chunk(ref, manifest.dict_key) for ref in manifest.chunks)
+
+
+_store: ChunkStore | None = None
+
+
+def get_chunk_store() -> ChunkStore:
+    global _store
+    if _store is None:
+        _store = ChunkStore()
+    return _store
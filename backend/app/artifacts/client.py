@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import IO
+from urllib.parse import quote, urlsplit
+
+import boto3
+from botocore.config import Config
+from botocore.credentials import Credentials, ReadOnlyCredentials
+from botocore.exceptions import ClientError
+
+from ..settings import get_settings
+
+
+_client = None
+_client_lock = threading.Lock()
+
+PRESIGN_EXPIRES_S = 3600
+_MAX_EXPIRES_S = 7 * 24 * 3600
+_CACHE_SIZE = 10_000
+
+
+def get_client():
+    # boto3 clients are thread-safe once built; building one is not, so guard it
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                s = get_settings()
+                _client = boto3.session.Session().client(
+                    "s3",
+                    endpoint_url=s.s3_endpoint_url,
+                    region_name=s.s3_region,
+                    aws_access_key_id=s.s3_access_key,
+                    aws_secret_access_key=s.s3_secret_key,
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=32,
+                        s3={"addressing_style": "path" if s.s3_endpoint_url else "auto"},
+                    ),
+                )
+    return _client
+
+
+def ensure_bucket() -> None:
+    s = get_settings()
+    client = get_client()
+    try:
+        client.head_bucket(Bucket=s.s3_bucket)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchBucket", "NotFound"):
+            raise
+        client.create_bucket(Bucket=s.s3_bucket)
+
+
+def list_prefix(prefix: str, max_keys: int | None = None) -> list[str]:
+    # Follows continuation tokens so prefixes with >1000 objects are complete
+    s = get_settings()
+    paginator = get_client().get_paginator("list_objects_v2")
+    keys: list[str] = []
+    for page in paginator.paginate(Bucket=s.s3_bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            keys.append(obj["Key"])
+            if max_keys is not None and len(keys) >= max_keys:
+                return keys
+    return keys
+
+
+def upload_fileobj(key: str, fileobj: IO[bytes], content_type: str = "application/octet-stream") -> None:
+    s = get_settings()
+    get_client().upload_fileobj(fileobj, s.s3_bucket, key, ExtraArgs={"ContentType": content_type})
+
+
+def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stream", metadata: dict[str, str] | None = None) -> None:
+    s = get_settings()
+    get_client().put_object(Bucket=s.s3_bucket, Key=key, Body=data, ContentType=content_type, Metadata=metadata or {})
+
+
+def get_bytes(key: str) -> bytes:
+    s = get_settings()
+    return get_client().get_object(Bucket=s.s3_bucket, Key=key)["Body"].read()
+
+
+def exists(key: str) -> bool:
+    s = get_settings()
+    try:
+        get_client().head_object(Bucket=s.s3_bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+class Presigner:
+    # Local SigV4 query-string presigning (no botocore event machinery, no I/O).
+    # URLs are signed at the start of a time bucket, so every request for the
+    # same key within a bucket gets the same URL, which makes them cacheable.
+    # X-Amz-Expires is extended by the bucket length, so a URL is always valid
+    # for at least `expires` seconds after it is handed out. Credentials are
+    # botocore's (static, IAM role or STS); each URL is signed with their
+    # current frozen value, session token included.
+    def __init__(
+        self,
+        credentials: Credentials,
+        region: str,
+        bucket: str,
+        endpoint_url: str | None = None,
+        cache_size: int = _CACHE_SIZE,
+    ) -> None:
+        self.credentials = credentials
+        self.region = region
+        self.bucket = bucket
+        if endpoint_url:
+            parts = urlsplit(endpoint_url)
+            self._base = f"{parts.scheme}://{parts.netloc}"
+            self._host = parts.netloc
+            self._path_prefix = f"/{bucket}/"
+        else:
+            self._host = f"{bucket}.s3.{region}.amazonaws.com"
+            self._base = f"https://{self._host}"
+            self._path_prefix = "/"
+        self._signing_keys: dict[tuple[str, str], bytes] = {}
+        self._cache: OrderedDict[tuple[str, int, int, str], str] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _signing_key(self, datestamp: str, secret_key: str) -> bytes:
+        key = self._signing_keys.get((datestamp, secret_key))
+        if key is None:
+            k = hmac.new(f"AWS4{secret_key}".encode(), datestamp.encode(), hashlib.sha256).digest()
+            for part in (self.region, "s3", "aws4_request"):
+                k = hmac.new(k, part.encode(), hashlib.sha256).digest()
+            # only today's key for the current credentials is ever needed
+            self._signing_keys = {(datestamp, secret_key): k}
+            key = k
+        return key
+
+    def sign(self, key: str, expires: int, signed_at: int, creds: ReadOnlyCredentials | None = None) -> str:
+        creds = creds or self.credentials.get_frozen_credentials()
+        ts = datetime.fromtimestamp(signed_at, tz=timezone.utc)
+        amz_date = ts.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = ts.strftime("%Y%m%d")
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        path = self._path_prefix + quote(key, safe="/~")
+        params = [
+            ("X-Amz-Algorithm", "AWS4-HMAC-SHA256"),
+            ("X-Amz-Credential", f"{creds.access_key}/{scope}"),
+            ("X-Amz-Date", amz_date),
+            ("X-Amz-Expires", str(expires)),
+        ]
+        if creds.token:
+            params.append(("X-Amz-Security-Token", creds.token))
+        params.append(("X-Amz-SignedHeaders", "host"))  # canonical query: sorted by name
+        query = "&".join(f"{k}={quote(v, safe='~')}" for k, v in params)
+        canonical = f"GET\n{path}\n{query}\nhost:{self._host}\n\nhost\nUNSIGNED-PAYLOAD"
+        to_sign = f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n{hashlib.sha256(canonical.encode()).hexdigest()}"
+        sig = hmac.new(self._signing_key(datestamp, creds.secret_key), to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self._base}{path}?{query}&X-Amz-Signature={sig}"
+
+    def presign_get(self, key: str, expires: int = PRESIGN_EXPIRES_S) -> str:
+        bucket_len = max(1, expires // 4)
+        now = int(time.time())
+        start = now - now % bucket_len
+        # Rotated credentials (STS refresh) get fresh URLs
+        creds = self.credentials.get_frozen_credentials()
+        cache_key = (key, expires, start, creds.access_key)
+        with self._lock:
+            url = self._cache.get(cache_key)
+            if url is not None:
+                self.hits += 1
+                self._cache.move_to_end(cache_key)
+                return url
+        url = self.sign(key, min(expires + bucket_len, _MAX_EXPIRES_S), start, creds)
+        with self._lock:
+            self.misses += 1
+            self._cache[cache_key] = url
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return url
+
+
+_presigner: Presigner | None = None
+
+
+def get_presigner() -> Presigner:
+    global _presigner
+    if _presigner is None:
+        s = get_settings()
+        # The client's credentials, so keys left unset fall back to boto's
+        # chain (IAM role, STS) exactly as for every other S3 call
+        credentials = get_client()._request_signer._credentials
+        if credentials is None:
+            raise RuntimeError("no S3 credentials available for presigning")
+        _presigner = Presigner(credentials, s.s3_region, s.s3_bucket, s.s3_endpoint_url)
+    return _presigner
+
+
+def presign_get(key: str, expires: int = PRESIGN_EXPIRES_S) -> str:
+    return get_presigner().presign_get(key, expires)
+
+
+def presign_many(keys: list[str], expires: int = PRESIGN_EXPIRES_S) -> list[str]:
+    p = get_presigner()
+    return [p.presign_get(k, expires) for k in keys]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import uuid
+import zlib
+from typing import Any, AsyncIterator, Literal
+
+from sqlalchemy import select
+
+from ..db import session_scope
+from ..models import BatchItem, Run
+from ..services.archive import load_archived_many
+from ..services.runs import runs_by_ids
+
+
+ExportFormat = Literal["csv", "ndjson"]
+
+PAGE_SIZE = 1000
+
+CSV_COLUMNS = ["row_num", "status", "run_id", "source", "error_code", "error_msg", "input", "output", "archive_key", "artifacts_path"]
+
+
+async def iter_result_pages(batch_id: uuid.UUID, page_size: int = PAGE_SIZE) -> AsyncIterator[list[dict[str, Any]]]:
+    # Keyset pagination on (batch_id, row_num): each page is its own short
+    # transaction over plain column rows, so nothing is held open between pages
+    # and nothing goes through the ORM identity map.
+    after = 0
+    while True:
+        async with session_scope() as s:
+            rows = (
+                await s.execute(
+                    select(BatchItem.row_num, BatchItem.status, BatchItem.run_id, BatchItem.input_payload)
+                    .where(BatchItem.batch_id == batch_id, BatchItem.row_num > after)
+                    .order_by(BatchItem.row_num)
+                    .limit(page_size)
+                )
+            ).all()
+            # The page's runs in one lookup, bounded by their UUIDv7 times so
+            # only the partitions they were created in are probed
+            run_ids = list({r.run_id for r in rows if r.run_id is not None})
+            runs: dict[uuid.UUID, Any] = {}
+            if run_ids:
+                res = await s.execute(
+                    select(Run.id, Run.source, Run.output_payload, Run.error_code, Run.error_msg, Run.archive_key).where(
+                        runs_by_ids(run_ids)
+                    )
+                )
+                runs = {r.id: r for r in res.all()}
+        if not rows:
+            return
+
+        # Outputs of archived runs are read back so the export stays complete
+        archived = await load_archived_many([r.archive_key for r in runs.values() if r.archive_key])
+
+        page = []
+        for r in rows:
+            run = runs.get(r.run_id)
+            output = None
+            if run is not None:
+                output = archived[run.archive_key][1] if run.archive_key else run.output_payload
+            page.append(
+                {
+                    "row_num": r.row_num,
+                    "status": r.status.value,
+                    "run_id": str(r.run_id) if r.run_id else None,
+                    "source": run.source if run else None,
+                    "error_code": run.error_code if run else None,
+                    "error_msg": run.error_msg if run else None,
+                    "input": r.input_payload,
+                    "output": output,
+                    "archive_key": run.archive_key if run else None,
+                    # API path listing the run's artifacts. Not presigned here:
+                    # they are chunked (failure.html) and served by reassembly,
+                    # and a link signed at export time would expire in the file
+                    "artifacts_path": f"/runs/{r.run_id}/artifacts" if r.run_id else None,
+                }
+            )
+        yield page
+        if len(rows) < page_size:
+            return
+        after = rows[-1].row_num
+
+
+async def export_results(batch_id: uuid.UUID, fmt: ExportFormat, gzip: bool = False) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 -> gzip container
+
+    def out(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        writer.writerow(CSV_COLUMNS)
+
+    async for page in iter_result_pages(batch_id):
+        if fmt == "csv":
+            for rec in page:
+                writer.writerow(
+                    [
+                        json.dumps(rec[c]) if c in ("input", "output") and rec[c] is not None else rec[c]
+                        for c in CSV_COLUMNS
+                    ]
+                )
+        else:
+            for rec in page:
+                buf.write(json.dumps(rec))
+                buf.write("\n")
+        chunk = out(buf.getvalue().encode())
+        buf.seek(0)
+        buf.truncate()
+        if chunk:
+            yield chunk
+
+    tail = buf.getvalue().encode()
+    if compressor:
+        yield compressor.compress(tail) + compressor.flush()
+    elif tail:
+        yield tail
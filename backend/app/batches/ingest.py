@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Literal
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from ..schemas.claim_status import ClaimStatusInput
+from ..schemas.eligibility import EligibilityInput
+from ..utils.idempotency import idempotency_key
+
+
+Format = Literal["csv", "ndjson"]
+
+INPUT_MODELS: dict[str, type[BaseModel]] = {
+    "eligibility": EligibilityInput,
+    "claim_status": ClaimStatusInput,
+}
+
+# Built once per process; building a TypeAdapter compiles a validator
+_ADAPTERS: dict[str, TypeAdapter] = {purpose: TypeAdapter(list[model]) for purpose, model in INPUT_MODELS.items()}
+
+
+@dataclass
+class RowError:
+    row_num: int
+    errors: list[dict[str, Any]]
+
+    def to_json(self) -> str:
+        return json.dumps({"row": self.row_num, "errors": self.errors}, default=str)
+
+
+@dataclass
+class Chunk:
+    # row_num, idempotency key, validated payload
+    valid: list[tuple[int, str, dict[str, Any]]] = field(default_factory=list)
+    invalid: list[RowError] = field(default_factory=list)
+
+
+async def iter_lines(body: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+    # Incrementally decode the request body; yields the complete lines of each
+    # network chunk and carries any partial trailing line over to the next one.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    carry = ""
+    async for data in body:
+        text = carry + decoder.decode(data)
+        lines = text.split("\n")
+        carry = lines.pop()
+        if lines:
+            yield lines
+    tail = carry + decoder.decode(b"", final=True)
+    if tail:
+        yield [tail]
+
+
+async def iter_rows(body: AsyncIterator[bytes], fmt: Format) -> AsyncIterator[list[tuple[int, dict | None, str | None]]]:
+    # Yields (row_num, raw row, parse error) per chunk; row_num is 1-based over data rows
+    row_num = 0
+    header: list[str] | None = None
+    pending = ""  # CSV record still inside an open quoted field
+    async for lines in iter_lines(body):
+        out: list[tuple[int, dict | None, str | None]] = []
+        if fmt == "ndjson":
+            for line in lines:
+                if not line.strip():
+                    continue
+                row_num += 1
+                try:
+                    obj = json.loads(line)
+                except ValueError as e:
+                    out.append((row_num, None, f"invalid json: {e}"))
+                    continue
+                if not isinstance(obj, dict):
+                    out.append((row_num, None, "row must be a JSON object"))
+                else:
+                    out.append((row_num, obj, None))
+        else:
+            # Reassemble records whose quoted fields contain newlines: a record
+            # is complete once it holds an even number of quote characters.
+            records: list[str] = []
+            for line in lines:
+                pending = f"{pending}\n{line}" if pending else line
+                if pending.count('"') % 2 == 0:
+                    records.append(pending.rstrip("\r"))
+                    pending = ""
+            for values in csv.reader(records):
+                if not values or values == [""]:
+                    continue
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                row_num += 1
+                if len(values) != len(header):
+                    out.append((row_num, None, f"expected {len(header)} columns, got {len(values)}"))
+                    continue
+                # CSV has no null; empty cells mean "not provided"
+                out.append((row_num, {k: v for k, v in zip(header, values) if v != ""}, None))
+        if out:
+            yield out
+    if pending:
+        row_num += 1
+        yield [(row_num, None, "unterminated quoted field")]
+
+
+def validate_chunk(purpose: str, rows: list[tuple[int, dict | None, str | None]]) -> Chunk:
+    adapter = _ADAPTERS[purpose]
+    chunk = Chunk()
+    parsed: list[tuple[int, dict]] = []
+    for row_num, raw, err in rows:
+        if raw is None:
+            chunk.invalid.append(RowError(row_num, [{"msg": err}]))
+        else:
+            parsed.append((row_num, raw))
+    if not parsed:
+        return chunk
+
+    # One validator call for the whole chunk; only a failing chunk pays for a
+    # second pass over its remaining good rows.
+    try:
+        models = adapter.validate_python([raw for _, raw in parsed])
+    except ValidationError as e:
+        bad: dict[int, list[dict[str, Any]]] = {}
+        for err in e.errors(include_url=False, include_input=False):
+            idx, *loc = err["loc"]
+            bad.setdefault(int(idx), []).append({"loc": loc, "msg": err["msg"], "type": err["type"]})
+        for idx, errs in bad.items():
+            chunk.invalid.append(RowError(parsed[idx][0], errs))
+        parsed = [p for i, p in enumerate(parsed) if i not in bad]
+        models = adapter.validate_python([raw for _, raw in parsed])
+
+    for (row_num, _), m in zip(parsed, models):
+        payload = m.model_dump(exclude_none=True)
+        key = idempotency_key(purpose, m.payer_id, m.provider_npi, payload)
+        chunk.valid.append((row_num, key, payload))
+    chunk.invalid.sort(key=lambda r: r.row_num)
+    return chunk
@@ -5,18 +5,40 @@ import json
 from typing import AsyncIterator
 
 import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
 
 from ..settings import get_settings
 
 
+def _decode_entries(entries) -> list[tuple[str, dict]]:
+    out: list[tuple[str, dict]] = []
+    for entry_id, fields in entries:
+        eid = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        out.append((eid, json.loads(fields[b"data"])))
+    return out
+
+
 class EventBus:
     def __init__(self, url: str | None = None) -> None:
-        self.url = url or get_settings().redis_url
+        s = get_settings()
+        self.url = url or s.redis_url
         self._redis = aioredis.from_url(self.url)
         self._channel = "events"
+        # Durable log next to pub/sub; pub/sub stays the low-latency path
+        self._stream = s.events_stream
+        self._maxlen = s.events_stream_maxlen
 
     async def publish(self, message: dict) -> None:
-        await self._redis.publish(self._channel, json.dumps(message))
+        await self.publish_many([message])
+
+    async def publish_many(self, messages: list[dict]) -> None:
+        # Single round trip for a batch of events: XADD + PUBLISH per message
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for message in messages:
+                data = json.dumps(message)
+                pipe.xadd(self._stream, {"data": data}, maxlen=self._maxlen, approximate=True)
+                pipe.publish(self._channel, data)
+            await pipe.execute()
 
     async def subscribe(self) -> AsyncIterator[dict]:
         pubsub = self._redis.pubsub()
@@ -30,6 +52,82 @@ class EventBus:
             await pubsub.unsubscribe(self._channel)
             await pubsub.close()
 
+    # --- Streams -----------------------------------------------------------
+
+    async def tail(self, last_id: str = "$", count: int = 100, block_ms: int = 5000) -> AsyncIterator[tuple[str, dict]]:
+        # Follow the stream from last_id (exclusive); "$" means only new entries
+        while True:
+            resp = await self._redis.xread({self._stream: last_id}, count=count, block=block_ms)
+            for _, entries in resp or []:
+                for eid, evt in _decode_entries(entries):
+                    last_id = eid
+                    yield eid, evt
+
+    async def read_range(self, after_id: str, count: int = 500) -> AsyncIterator[tuple[str, dict]]:
+        # Replay entries strictly after after_id, paging through XRANGE
+        cursor = f"({after_id}"
+        while True:
+            entries = await self._redis.xrange(self._stream, min=cursor, max="+", count=count)
+            if not entries:
+                return
+            decoded = _decode_entries(entries)
+            for eid, evt in decoded:
+                yield eid, evt
+            if len(entries) < count:
+                return
+            cursor = f"({decoded[-1][0]}"
+
+    async def append(self, stream: str, message: dict, maxlen: int) -> None:
+        # XADD to a side stream that is not fanned out over pub/sub
+        await self._redis.xadd(stream, {"data": json.dumps(message)}, maxlen=maxlen, approximate=True)
+
+    async def ensure_group(self, group: str, stream: str | None = None, start_id: str = "$") -> None:
+        try:
+            await self._redis.xgroup_create(stream or self._stream, group, id=start_id, mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def consume(
+        self, group: str, consumer: str, stream: str | None = None, count: int = 100, block_ms: int = 5000
+    ) -> AsyncIterator[list[tuple[str, dict]]]:
+        # Yields batches for a consumer group (on the events stream unless
+        # another is given); a batch is acked (one XACK) once the caller asks
+        # for the next one. Pending entries from a previous crash of this
+        # consumer are redelivered first.
+        stream = stream or self._stream
+        await self.ensure_group(group, stream)
+        read_from = "0"
+        while True:
+            resp = await self._redis.xreadgroup(group, consumer, {stream: read_from}, count=count, block=block_ms)
+            entries = [e for _, es in resp or [] for e in es]
+            if not entries:
+                if read_from == "0":
+                    read_from = ">"
+                continue
+            # A pending entry MAXLEN has since trimmed comes back without fields
+            batch = _decode_entries([e for e in entries if e[1]])
+            if batch:
+                yield batch
+            await self._redis.xack(stream, group, *[eid for eid, _ in entries])
+
+    async def trimmed_after(self, last_id: str) -> bool:
+        # Whether entries after last_id may have been trimmed by MAXLEN.
+        # Trimming drops the oldest entries first, so while last_id itself is
+        # kept, everything after it is too.
+        entries = await self._redis.xrange(self._stream, min=last_id, max="+", count=1)
+        if entries and _decode_entries(entries)[0][0] == last_id:
+            return False
+        if not entries:
+            return False  # nothing newer exists, so nothing newer was lost
+        try:
+            info = await self._redis.xinfo_stream(self._stream)
+        except ResponseError:
+            return True
+        # Redis 7+: a stream that was never trimmed has kept every entry added
+        added = info.get("entries-added")
+        return added is None or added > info["length"]
+
     async def close(self):
         await self._redis.close()
 
@@ -42,4 +140,3 @@ def get_bus() -> EventBus:
     if _bus is None:
         _bus = EventBus()
     return _bus
-
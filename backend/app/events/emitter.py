@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from .bus import EventBus
+
+
+log = logging.getLogger(__name__)
+
+
+class BufferedEmitter:
+    # Coalesces events emitted within flush_interval into one pipelined
+    # publish. emit() resolves once its event has actually been written.
+    def __init__(self, bus: EventBus, flush_interval: float = 0.005, max_batch: int = 256) -> None:
+        self.bus = bus
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buf: list[tuple[dict, asyncio.Future[None]]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.events = 0
+        self.flushes = 0
+        self.latency_total = 0.0
+
+    async def emit(self, event: dict) -> None:
+        self._ensure_started()
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._buf.append((event, fut))
+        if len(self._buf) >= self.max_batch:
+            self._wakeup.set()  # type: ignore[union-attr]
+        t0 = time.perf_counter()
+        await fut
+        self.latency_total += time.perf_counter() - t0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "events": self.events,
+            "flushes": self.flushes,
+            "avg_batch": self.events / self.flushes if self.flushes else 0.0,
+            "avg_latency_ms": 1000 * self.latency_total / self.events if self.events else 0.0,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buf:
+                await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._buf = self._buf, []
+        try:
+            await self.bus.publish_many([evt for evt, _ in batch])
+        except BaseException as e:
+            # The batch has left _buf, so its emitters are woken here even if
+            # the flush itself is cancelled
+            if isinstance(e, Exception):
+                log.warning("event flush of %d events failed: %s", len(batch), e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e if isinstance(e, Exception) else asyncio.CancelledError())
+            if not isinstance(e, Exception):
+                raise
+            return
+        self.events += len(batch)
+        self.flushes += 1
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def close(self) -> None:
+        # Let the loop finish any flush in progress, then write what is left
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()  # type: ignore[union-attr]
+            await self._task
+            self._task = None
+        if self._buf:
+            await self.flush()
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, timezone
 from typing import Any
 
+from ..tracing import current_carrier
+
 
 @dataclass
 class Event:
@@ -12,7 +14,9 @@ class Event:
     run_id: str | None = None
     batch_id: str | None = None
     source: str = "api"
-    ts: str = datetime.now(timezone.utc).isoformat()
+    ts: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    # W3C trace context of the emitting span, continued by the SSE hub
+    trace: dict[str, str] | None = field(default_factory=current_carrier)
 
     def dict(self) -> dict[str, Any]:
         return asdict(self)
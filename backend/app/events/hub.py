@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Literal
+
+from ..metrics import SSE_SUBSCRIBERS
+from ..settings import get_settings
+from ..tracing import RUN_ID, span_from_carrier
+from .bus import EventBus, get_bus
+
+
+log = logging.getLogger(__name__)
+
+SlowPolicy = Literal["drop", "disconnect"]
+
+
+def encode_frame(evt: dict, event_id: str | None = None) -> bytes:
+    # The trace carrier is for our own spans, not for browser clients
+    if "trace" in evt:
+        evt = {k: v for k, v in evt.items() if k != "trace"}
+    data = json.dumps(evt)
+    if event_id:
+        return f"id: {event_id}\ndata: {data}\n\n".encode()
+    return f"data: {data}\n\n".encode()
+
+
+def encode_reset(last_event_id: str) -> bytes:
+    # Replay cannot cover entries trimmed after the client's last id; a named
+    # event so EventSource clients can listen for it
+    data = json.dumps({"type": "stream.reset", "last_event_id": last_event_id})
+    return f"event: reset\ndata: {data}\n\n".encode()
+
+
+def event_time(evt: dict) -> float | None:
+    # Envelope creation time (epoch seconds) for send-lag measurement
+    ts = evt.get("ts")
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_id_key(event_id: str) -> tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class Subscriber:
+    def __init__(self, run_id: str | None, batch_id: str | None, maxsize: int) -> None:
+        self.run_id = run_id
+        self.batch_id = batch_id
+        # Items are (stream id, pre-encoded SSE frame, event time); None means
+        # "closed by the hub"
+        self.queue: asyncio.Queue[tuple[str | None, bytes, float | None] | None] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def matches(self, evt: dict) -> bool:
+        if self.run_id and evt.get("run_id") != self.run_id:
+            return False
+        if self.batch_id and evt.get("batch_id") != self.batch_id:
+            return False
+        return True
+
+
+class EventHub:
+    # One Redis subscription per process, fanned out to in-process SSE clients.
+    def __init__(
+        self,
+        bus: EventBus | None = None,
+        queue_size: int = 256,
+        slow_policy: SlowPolicy = "drop",
+        source: Literal["streams", "pubsub"] = "streams",
+    ) -> None:
+        self.bus = bus or get_bus()
+        self.source = source
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        # Each subscriber is indexed by its most selective filter only
+        self._by_run: dict[str, set[Subscriber]] = {}
+        self._by_batch: dict[str, set[Subscriber]] = {}
+        self._wildcard: set[Subscriber] = set()
+        # In-process consumers (caches, waiters) called synchronously per event
+        self._listeners: list[Callable[[dict], None]] = []
+        self._task: asyncio.Task | None = None
+        self.connections = 0
+        self.events_in = 0
+        self.frames_out = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def subscribe(self, run_id: str | None = None, batch_id: str | None = None) -> Subscriber:
+        self._ensure_started()
+        sub = Subscriber(run_id, batch_id, self.queue_size)
+        self._index(sub).add(sub)
+        self.connections += 1
+        SSE_SUBSCRIBERS.inc()
+        return sub
+
+    def add_listener(self, fn: Callable[[dict], None]) -> None:
+        self._listeners.append(fn)
+        self._ensure_started()
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        # Safe to repeat (the SSE route unsubscribes after a hub disconnect)
+        # without recreating the subscriber's filter entry
+        bucket = self._index(sub, create=False)
+        if sub in bucket:
+            bucket.discard(sub)
+            self.connections -= 1
+            SSE_SUBSCRIBERS.dec()
+            self._prune(sub)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "connections": self.connections,
+            "run_filters": len(self._by_run),
+            "batch_filters": len(self._by_batch),
+            "events_in": self.events_in,
+            "frames_out": self.frames_out,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+    def _index(self, sub: Subscriber, create: bool = True) -> set[Subscriber]:
+        if sub.run_id:
+            return self._by_run.setdefault(sub.run_id, set()) if create else self._by_run.get(sub.run_id, set())
+        if sub.batch_id:
+            return self._by_batch.setdefault(sub.batch_id, set()) if create else self._by_batch.get(sub.batch_id, set())
+        return self._wildcard
+
+    def _prune(self, sub: Subscriber) -> None:
+        if sub.run_id and not self._by_run.get(sub.run_id):
+            self._by_run.pop(sub.run_id, None)
+        elif not sub.run_id and sub.batch_id and not self._by_batch.get(sub.batch_id):
+            self._by_batch.pop(sub.batch_id, None)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        backoff = 0.5
+        last_id = "$"
+        while True:
+            try:
+                if self.source == "streams":
+                    # Resume from the last seen entry after a reconnect
+                    async for eid, evt in self.bus.tail(last_id):
+                        backoff = 0.5
+                        last_id = eid
+                        self.dispatch(evt, eid)
+                else:
+                    async for evt in self.bus.subscribe():
+                        backoff = 0.5
+                        self.dispatch(evt)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("event hub subscription failed; reconnecting in %.1fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    def dispatch(self, evt: dict, event_id: str | None = None) -> None:
+        self.events_in += 1
+        for fn in self._listeners:
+            try:
+                fn(evt)
+            except Exception:
+                log.exception("event listener failed")
+        targets: list[Subscriber] = []
+        run_id = evt.get("run_id")
+        batch_id = evt.get("batch_id")
+        if run_id and run_id in self._by_run:
+            targets.extend(self._by_run[run_id])
+        if batch_id and batch_id in self._by_batch:
+            targets.extend(self._by_batch[batch_id])
+        targets.extend(self._wildcard)
+        if not targets:
+            return
+
+        # Encode once per event, not once per connection
+        frame = encode_frame(evt, event_id)
+        created = event_time(evt)
+        attrs = {"event.type": str(evt.get("type")), RUN_ID: str(run_id or "")}
+        with span_from_carrier("event.deliver", evt.get("trace"), **attrs) as span:
+            offered = 0
+            for sub in targets:
+                if sub.closed or not sub.matches(evt):
+                    continue
+                self._offer(sub, (event_id, frame, created))
+                offered += 1
+            if span is not None:
+                span.set_attribute("sse.subscribers", offered)
+
+    def _offer(self, sub: Subscriber, frame: tuple[str | None, bytes, float | None]) -> None:
+        try:
+            sub.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if self.slow_policy == "disconnect":
+                self._disconnect(sub)
+                return
+            # Drop the oldest frame so the client stays near real time
+            sub.queue.get_nowait()
+            sub.queue.put_nowait(frame)
+            sub.dropped += 1
+            self.dropped += 1
+        else:
+            self.frames_out += 1
+
+    def _disconnect(self, sub: Subscriber) -> None:
+        sub.closed = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+        self.disconnected += 1
+        self.unsubscribe(sub)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_hub: EventHub | None = None
+
+
+def get_hub() -> EventHub:
+    global _hub
+    if _hub is None:
+        s = get_settings()
+        _hub = EventHub(
+            queue_size=s.sse_queue_size,
+            slow_policy=s.sse_slow_policy,  # type: ignore[arg-type]
+            source=s.events_source,  # type: ignore[arg-type]
+        )
+    return _hub
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from typing import Iterator
+
+from .hub import EventHub, get_hub
+
+
+# Workflow events sent just before the workflow returns or fails
+TERMINAL_WORKFLOW_EVENTS = ("run.succeeded", "run.failed")
+
+
+def run_key(run_id: str) -> str:
+    return f"run:{run_id}"
+
+
+def workflow_key(workflow_id: str) -> str:
+    return f"workflow:{workflow_id}"
+
+
+def event_keys(evt: dict) -> list[str]:
+    keys = []
+    if evt.get("run_id") and str(evt.get("type", "")).startswith("run."):
+        keys.append(run_key(evt["run_id"]))
+    workflow_id = (evt.get("payload") or {}).get("workflow_id")
+    if workflow_id:
+        keys.append(workflow_key(workflow_id))
+    return keys
+
+
+class ChangeWaiters:
+    # Long-poll requests park a future here and are woken by the process's
+    # EventHub; waiting costs no Redis, database or Temporal calls. Callers
+    # compare against a version (ETag) read after registering, so a change
+    # that lands before they park is not slept through.
+    def __init__(self, hub: EventHub | None = None) -> None:
+        self._waiting: dict[str, set[asyncio.Future[dict]]] = {}
+        if hub is not None:
+            hub.add_listener(self.on_event)
+
+    @contextmanager
+    def watch(self, key: str) -> Iterator[asyncio.Future[dict]]:
+        # Register before reading current state, so a change between the read
+        # and the wait still wakes the caller
+        fut: asyncio.Future[dict] = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, set()).add(fut)
+        try:
+            yield fut
+        finally:
+            waiting = self._waiting.get(key)
+            if waiting is not None:
+                waiting.discard(fut)
+                if not waiting:
+                    del self._waiting[key]
+
+    def on_event(self, evt: dict) -> None:
+        for key in event_keys(evt):
+            for fut in self._waiting.pop(key, ()):
+                if not fut.done():
+                    fut.set_result(evt)
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._waiting), "waiters": sum(len(w) for w in self._waiting.values())}
+
+
+async def wait_for_change(fut: asyncio.Future[dict], timeout: float) -> dict | None:
+    try:
+        return await asyncio.wait_for(fut, timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+_waiters: ChangeWaiters | None = None
+
+
+def get_waiters() -> ChangeWaiters:
+    global _waiters
+    if _waiters is None:
+        _waiters = ChangeWaiters(get_hub())
+    return _waiters
@@ -5,11 +5,17 @@ import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routes import health, runs, schemas, events, test_portal
+from .metrics import LatencyMiddleware
+from .settings import get_settings
+from .tracing import instrument_app, setup_tracing, shutdown_tracing
+from .routes import health, runs, schemas, events, test_portal, batches, eligibility, metrics
 from .artifacts.client import ensure_bucket
 
 
+setup_tracing(f"{get_settings().app_name}-api")
+
 app = FastAPI(title="RCM OS API", version="0.1.0")
+instrument_app(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,19 +24,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LatencyMiddleware)
 
 
 @app.on_event("startup")
 async def on_startup():
     # Ensure artifact bucket exists (best-effort)
     try:
-        ensure_bucket()
+        await asyncio.to_thread(ensure_bucket)
     except Exception:
         pass
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_tracing()  # flush buffered spans
+
+
 app.include_router(health.router)
 app.include_router(runs.router)
 app.include_router(schemas.router)
 app.include_router(events.router)
 app.include_router(test_portal.router)
+app.include_router(batches.router)
+app.include_router(eligibility.router)
+app.include_router(metrics.router)
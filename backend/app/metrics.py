@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# Shared metric definitions for the API and workers. With several processes
+# (uvicorn --workers, the worker supervisor) set PROMETHEUS_MULTIPROC_DIR to
+# an empty directory before the processes start: every process then writes
+# its samples there and render() aggregates them.
+
+# Sub-second API stages; portal runs use the long buckets below
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+RUN_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300, 600)
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"], buckets=FAST_BUCKETS
+)
+CREATE_RUN_STAGE = Histogram(
+    "create_run_stage_seconds", "POST /runs time per stage", ["stage"], buckets=FAST_BUCKETS
+)  # key_hash|cache_lookup|db_insert|db_lookup|publish
+TEMPORAL_CLIENT = Histogram(
+    "temporal_client_seconds", "Temporal client call latency from the API", ["op"], buckets=FAST_BUCKETS
+)  # start|query|signal|result|describe
+EMIT_EVENT = Histogram("emit_event_seconds", "emit_event activity duration", buckets=FAST_BUCKETS)
+SSE_SUBSCRIBERS = Gauge("sse_subscribers", "Connected SSE clients", multiprocess_mode="livesum")
+SSE_SEND_LAG = Histogram(
+    "sse_send_lag_seconds", "Event creation to SSE frame write", buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+RUN_DURATION = Histogram(
+    "run_duration_seconds", "Portal run duration, start to result", ["payer", "purpose", "outcome"], buckets=RUN_BUCKETS
+)
+FLOW_DURATION = Histogram(
+    "flow_steps_duration_seconds", "run_steps execution per payer and flow", ["payer", "flow", "outcome"], buckets=RUN_BUCKETS
+)
+
+
+@contextmanager
+def timed(hist: Histogram, *labels: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        (hist.labels(*labels) if labels else hist).observe(time.perf_counter() - t0)
+
+
+class LatencyMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request,
+    # and SSE bodies stream through untouched (timed to the response start)
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        started = False
+
+        async def send_wrapper(message: dict[str, Any]) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                self._observe(scope, message["status"], t0)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                self._observe(scope, 500, t0)
+            raise
+
+    @staticmethod
+    def _observe(scope: dict[str, Any], status: int, t0: float) -> None:
+        # Route template, so /runs/{run_id} is one series; unmatched paths
+        # share a label rather than one series per URL
+        route = getattr(scope.get("route"), "path", "unmatched")
+        HTTP_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - t0)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render() -> tuple[bytes, str]:
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int) -> None:
+    # Standalone /metrics for worker processes
+    from prometheus_client import start_http_server
+
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+
+
+def mark_process_dead(pid: int) -> None:
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
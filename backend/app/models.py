@@ -4,11 +4,12 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, DateTime, Enum, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import JSON, DateTime, Enum, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .db import Base
+from .utils.ids import uuid7
 
 
 class RunStatus(str, enum.Enum):
@@ -21,18 +22,33 @@ class RunStatus(str, enum.Enum):
 class Run(Base):
     __tablename__ = "runs"
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Partitioned by created_at month (0004_runs_partitioned); the table's PK is
+    # (id, created_at) but ids are unique UUIDv7s, so the ORM keys on id alone
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     purpose: Mapped[str] = mapped_column(String(64), nullable=False)
     payer_id: Mapped[str] = mapped_column(String(64), nullable=False)
     provider_npi: Mapped[str] = mapped_column(String(20), nullable=True)
     status: Mapped[RunStatus] = mapped_column(Enum(RunStatus), default=RunStatus.queued, nullable=False)
     source: Mapped[str | None] = mapped_column(String(32), nullable=True)  # portal|271|277
-    input_payload: Mapped[dict | None] = mapped_column(JSON, nullable=True)
-    output_payload: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    input_payload: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    output_payload: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     error_code: Mapped[str | None] = mapped_column(String(64), nullable=True)
     error_msg: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set once payloads have been moved to object storage (payload columns are NULL then)
+    archive_key: Mapped[str | None] = mapped_column(String(512), nullable=True)
+
+    # Created by 0003_runs_jsonb_indexes; (created_at, id) is the listing cursor
+    __table_args__ = (
+        Index("ix_runs_payer_status_created", "payer_id", "status", "created_at", "id"),
+        Index("ix_runs_status_created", "status", "created_at", "id"),
+        Index("ix_runs_purpose_created", "purpose", "created_at", "id"),
+        Index("ix_runs_created", "created_at", "id"),
+        Index("ix_runs_input_member_id", text("(input_payload ->> 'member_id')")),
+        Index("ix_runs_input_payload_gin", "input_payload", postgresql_using="gin", postgresql_ops={"input_payload": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
 
 class IdempotentRun(Base):
@@ -42,3 +58,56 @@ class IdempotentRun(Base):
     run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
+
+
+class BatchStatus(str, enum.Enum):
+    ingesting = "ingesting"
+    ready = "ready"
+    failed = "failed"
+
+
+class BatchDriver(str, enum.Enum):
+    executor = "executor"  # python -m backend.workers.batch_executor
+    workflow = "workflow"  # one BatchFlow per batch
+
+
+class Batch(Base):
+    __tablename__ = "batches"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    purpose: Mapped[str] = mapped_column(String(64), nullable=False)
+    filename: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    status: Mapped[BatchStatus] = mapped_column(Enum(BatchStatus), default=BatchStatus.ingesting, nullable=False)
+    # Which of the two drains claims this batch's items; never both
+    driver: Mapped[BatchDriver] = mapped_column(Enum(BatchDriver), default=BatchDriver.executor, nullable=False)
+    total_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    valid_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    invalid_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors_key: Mapped[str | None] = mapped_column(String(512), nullable=True)  # artifact key of row-level errors
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+
+    batch_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True)
+    row_num: Mapped[int] = mapped_column(Integer, primary_key=True)
+    idempotency_key: Mapped[str] = mapped_column(String(512), nullable=False)
+    input_payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[RunStatus] = mapped_column(Enum(RunStatus), default=RunStatus.queued, nullable=False)
+    run_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    # Lease on a running item (0005_batch_item_leases). claimed_at is NULL for
+    # items linked to a run another item drives; those finish with that run.
+    claimed_by: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Created by 0002_batches, 0005_batch_item_leases and 0006_batch_driver
+    __table_args__ = (
+        Index("ix_batch_items_batch_id_status", "batch_id", "status"),
+        Index("ix_batch_items_lease", "claimed_at", postgresql_where=text("status = 'running'")),
+        Index("ix_batch_items_run_id", "run_id"),
+        Index("ix_batch_items_claimed_by", "batch_id", "claimed_by", postgresql_where=text("claimed_by IS NOT NULL")),
+    )
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import json
+import logging
+import tempfile
+import time
+import uuid
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
+
+from ..artifacts.client import presign_get, upload_fileobj
+from ..batches.export import export_results
+from ..batches.ingest import INPUT_MODELS, Format, iter_rows, validate_chunk
+from ..db import session_scope
+from ..events.bus import get_bus
+from ..events.envelope import Event
+from ..models import Batch, BatchDriver, BatchStatus
+from ..services.batches import take_over_batch, wake_executors
+from ..settings import get_settings
+from ...workflows.batch import BatchFlow, BatchParams
+from ...workflows.client import get_temporal_client
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+CHUNK_ROWS = 2000
+_COPY_COLUMNS = ["batch_id", "row_num", "idempotency_key", "input_payload"]
+
+
+def _detect_format(request: Request, fmt: str | None) -> Format:
+    if fmt in ("csv", "ndjson"):
+        return fmt  # type: ignore[return-value]
+    ctype = request.headers.get("content-type", "")
+    if "ndjson" in ctype or "jsonl" in ctype:
+        return "ndjson"
+    if "csv" in ctype:
+        return "csv"
+    raise HTTPException(status_code=415, detail="send text/csv or application/x-ndjson, or pass ?format=")
+
+
+def _batch_out(b: Batch) -> dict:
+    return {
+        "id": str(b.id),
+        "purpose": b.purpose,
+        "filename": b.filename,
+        "status": b.status.value,
+        "driver": b.driver.value,
+        "total_rows": b.total_rows,
+        "valid_rows": b.valid_rows,
+        "invalid_rows": b.invalid_rows,
+    }
+
+
+@router.post("/batches")
+async def create_batch(
+    request: Request,
+    purpose: str = Query(...),
+    format: str | None = Query(default=None),
+    filename: str | None = Query(default=None),
+    driver: BatchDriver = Query(default=BatchDriver.executor),
+):
+    if purpose not in INPUT_MODELS:
+        raise HTTPException(status_code=422, detail=f"purpose must be one of {sorted(INPUT_MODELS)}")
+    fmt = _detect_format(request, format)
+
+    batch_id = uuid.uuid4()
+    valid = invalid = 0
+    t0 = time.perf_counter()
+
+    # The batch row is committed up front as `ingesting` and each COPY chunk in
+    # its own transaction, so a large upload never holds one long transaction
+    # open; executors only pick the batch up once it is marked `ready`.
+    async with session_scope() as s:
+        s.add(Batch(id=batch_id, purpose=purpose, filename=filename, status=BatchStatus.ingesting, driver=driver))
+
+    async def copy_chunk(records: list) -> None:
+        async with session_scope() as s:
+            conn = await s.connection()
+            raw = (await conn.get_raw_connection()).driver_connection
+            await raw.copy_records_to_table("batch_items", records=records, columns=_COPY_COLUMNS)
+
+    # Row errors go to a spooled file (memory up to 1 MiB, then disk) and are
+    # uploaded as a single artifact at the end.
+    with tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+b") as errors:
+
+        async def flush(rows: list) -> None:
+            nonlocal valid, invalid
+            # Pydantic validation is CPU-bound; keep it off the event loop
+            chunk = await asyncio.to_thread(validate_chunk, purpose, rows)
+            if chunk.valid:
+                await copy_chunk([(batch_id, n, key, json.dumps(payload)) for n, key, payload in chunk.valid])
+            for err in chunk.invalid:
+                errors.write(err.to_json().encode() + b"\n")
+            valid += len(chunk.valid)
+            invalid += len(chunk.invalid)
+
+        try:
+            pending: list = []
+            async for rows in iter_rows(request.stream(), fmt):
+                pending.extend(rows)
+                if len(pending) >= CHUNK_ROWS:
+                    await flush(pending)
+                    pending = []
+            if pending:
+                await flush(pending)
+
+            errors_key = None
+            if invalid:
+                errors_key = f"batches/{batch_id}/errors.ndjson"
+                errors.seek(0)
+                await asyncio.to_thread(upload_fileobj, errors_key, errors, "application/x-ndjson")
+        except Exception:
+            # Chunks already committed stay behind a batch that is never ready
+            async with session_scope() as s:
+                await s.execute(
+                    update(Batch)
+                    .where(Batch.id == batch_id)
+                    .values(status=BatchStatus.failed, total_rows=valid + invalid, valid_rows=valid, invalid_rows=invalid)
+                )
+            raise
+
+    async with session_scope() as s:
+        await s.execute(
+            update(Batch)
+            .where(Batch.id == batch_id)
+            .values(
+                status=BatchStatus.ready,
+                total_rows=valid + invalid,
+                valid_rows=valid,
+                invalid_rows=invalid,
+                errors_key=errors_key,
+            )
+        )
+
+    elapsed = time.perf_counter() - t0
+    total = valid + invalid
+    rate = total / elapsed if elapsed > 0 else 0.0
+    log.info("batch %s ingested %d rows (%d invalid) in %.2fs, %.0f rows/s", batch_id, total, invalid, elapsed, rate)
+    await get_bus().publish(
+        Event(type="batch.created", batch_id=str(batch_id), payload={"valid_rows": valid, "invalid_rows": invalid}).dict()
+    )
+    if driver is BatchDriver.executor and valid:
+        await wake_executors(batch_id)
+    return {
+        "id": str(batch_id),
+        "total_rows": total,
+        "valid_rows": valid,
+        "invalid_rows": invalid,
+        "errors_key": errors_key,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(rate, 1),
+    }
+
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: uuid.UUID):
+    async with session_scope() as s:
+        b = await s.get(Batch, batch_id)
+        if not b:
+            raise HTTPException(status_code=404, detail="batch not found")
+        return _batch_out(b)
+
+
+@router.post("/batches/{batch_id}/workflow")
+async def start_batch_workflow(batch_id: uuid.UUID, body: dict | None = None):
+    # Alternative to the batch executor: one BatchFlow drives the whole batch.
+    # The batch is handed over first so the executor stops claiming it.
+    s = get_settings()
+    body = body or {}
+    async with session_scope() as sess:
+        b = await sess.get(Batch, batch_id)
+        if not b:
+            raise HTTPException(status_code=404, detail="batch not found")
+        if b.status != BatchStatus.ready:
+            raise HTTPException(status_code=409, detail=f"batch is {b.status.value}")
+    if not await take_over_batch(batch_id):
+        raise HTTPException(
+            status_code=409, detail="the batch executor is already running this batch; upload with ?driver=workflow"
+        )
+    params = BatchParams(
+        batch_id=str(batch_id),
+        window=int(body.get("window", s.batch_flow_window)),
+        page_size=int(body.get("page_size", s.batch_flow_page_size)),
+        continue_every=int(body.get("continue_every", s.batch_flow_continue_every)),
+    )
+    client = await get_temporal_client()
+    workflow_id = f"batch-{batch_id}"
+    try:
+        await client.start_workflow(BatchFlow.run, params, id=workflow_id, task_queue=s.temporal_task_queue)
+    except WorkflowAlreadyStartedError:
+        pass
+    return {"workflow_id": workflow_id}
+
+
+@router.get("/batches/{batch_id}/progress")
+async def get_batch_progress(batch_id: uuid.UUID):
+    client = await get_temporal_client()
+    handle = client.get_workflow_handle(f"batch-{batch_id}")
+    try:
+        progress = await handle.query(BatchFlow.get_progress)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"no batch workflow: {type(e).__name__}")
+    return dataclasses.asdict(progress) if dataclasses.is_dataclass(progress) else progress
+
+
+@router.get("/batches/{batch_id}/errors")
+async def get_batch_errors(batch_id: uuid.UUID):
+    async with session_scope() as s:
+        b = await s.get(Batch, batch_id)
+        if not b:
+            raise HTTPException(status_code=404, detail="batch not found")
+        if not b.errors_key:
+            return {"invalid_rows": 0, "url": None}
+        return {"invalid_rows": b.invalid_rows, "url": presign_get(b.errors_key)}
+
+
+@router.get("/batches/{batch_id}/results")
+async def get_batch_results(batch_id: uuid.UUID, format: str = Query(default="csv"), gzip: bool = False):
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=422, detail="format must be csv or ndjson")
+    async with session_scope() as s:
+        if not await s.get(Batch, batch_id):
+            raise HTTPException(status_code=404, detail="batch not found")
+
+    filename = f"batch-{batch_id}-results.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        export_results(batch_id, format, gzip=gzip),  # type: ignore[arg-type]
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from ..schemas.eligibility import EligibilityInput
+from ..services.eligibility_cache import get_eligibility_cache
+
+
+router = APIRouter(prefix="/eligibility", tags=["eligibility"])
+
+
+@router.post("/cache:invalidate")
+async def invalidate_result(body: EligibilityInput):
+    return {"invalidated": await get_eligibility_cache().invalidate(body)}
+
+
+@router.delete("/cache/{payer_id}")
+async def invalidate_payer(payer_id: str):
+    return {"invalidated": await get_eligibility_cache().invalidate_payer(payer_id)}
@@ -1,32 +1,72 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import re
+import time
 from typing import AsyncIterator
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
 from fastapi import Request
 from fastapi.responses import StreamingResponse
 
 from ..events.bus import get_bus
+from ..events.hub import encode_frame, encode_reset, get_hub, stream_id_key
+from ..metrics import SSE_SEND_LAG
+from ..settings import get_settings
 
 
 router = APIRouter()
 
+_STREAM_ID = re.compile(r"^\d+-\d+$")
 
-async def _event_stream(run_id: str | None = None, batch_id: str | None = None) -> AsyncIterator[bytes]:
-    bus = get_bus()
-    async for evt in bus.subscribe():
-        if run_id and evt.get("run_id") != run_id:
-            continue
-        if batch_id and evt.get("batch_id") != batch_id:
-            continue
-        data = json.dumps(evt)
-        yield f"data: {data}\n\n".encode()
-        await asyncio.sleep(0)  # cooperative
+
+async def _event_stream(
+    run_id: str | None = None, batch_id: str | None = None, last_event_id: str | None = None
+) -> AsyncIterator[bytes]:
+    hub = get_hub()
+    heartbeat = get_settings().sse_heartbeat_s
+    # Subscribe before replaying so nothing falls between backlog and live
+    sub = hub.subscribe(run_id=run_id, batch_id=batch_id)
+    try:
+        replayed: tuple[int, int] | None = None
+        if last_event_id and _STREAM_ID.match(last_event_id):
+            # Entries after last_event_id may have been trimmed by MAXLEN; the
+            # client then gets a reset and should reload state, not trust replay
+            if await get_bus().trimmed_after(last_event_id):
+                yield encode_reset(last_event_id)
+            async for eid, evt in get_bus().read_range(last_event_id):
+                if sub.matches(evt):
+                    yield encode_frame(evt, eid)
+                replayed = stream_id_key(eid)
+
+        while True:
+            try:
+                item = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if item is None:  # slow consumer disconnected by the hub
+                return
+            eid, frame, created = item
+            if replayed is not None and eid and stream_id_key(eid) <= replayed:
+                continue  # already sent from the backlog
+            yield frame
+            if created is not None:
+                SSE_SEND_LAG.observe(max(0.0, time.time() - created))
+    finally:
+        hub.unsubscribe(sub)
 
 
 @router.get("/events")
-async def events(request: Request, run_id: str | None = None, batch_id: str | None = None):
-    return StreamingResponse(_event_stream(run_id, batch_id), media_type="text/event-stream")
+async def events(
+    request: Request,
+    run_id: str | None = None,
+    batch_id: str | None = None,
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+):
+    return StreamingResponse(_event_stream(run_id, batch_id, last_event_id), media_type="text/event-stream")
+
 
+@router.get("/events/stats")
+async def events_stats():
+    return get_hub().stats()
@@ -1,98 +1,283 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
 import uuid
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, String, cast, insert, literal, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from ..db import session_scope
+from ..metrics import CREATE_RUN_STAGE, timed
+from ..tracing import annotate
 from ..models import IdempotentRun, Run, RunStatus
-from ..schemas.base import RunCreate, RunOut
+from ..schemas.base import RunCreate, RunOut, RunPage
+from ..services.eligibility_cache import REVALIDATIONS, CachedResult, eligibility_input, get_eligibility_cache
+from ..services.archive import load_archived_many, load_archived_payloads
+from ..services.dispatch import start_run
+from ..services.run_cache import get_run_cache
+from ..services.runs import RunFilters, claim_runs, list_runs, run_by_id, run_out
+from ..utils.ids import uuid7
 from ..utils.idempotency import idempotency_key
+from ..utils.singleflight import SingleFlight
 from ..events.bus import get_bus
 from ..events.envelope import Event
-from ..artifacts.client import list_prefix, presign_get
+from ..events.waiters import get_waiters, run_key, wait_for_change
+from ..artifacts.cas import MANIFEST_SUFFIX, get_chunk_store
+from ..artifacts.client import list_prefix, presign_many
 
 
 router = APIRouter()
+log = logging.getLogger(__name__)
 
+MAX_BULK_RUNS = 1000
+MAX_PAGE_SIZE = 500
+MAX_WAIT_S = 60.0  # long-poll ceiling; keep below proxy idle timeouts
 
-@router.post("/runs", response_model=RunOut)
-async def create_run(body: RunCreate):
+
+def _key_for(body: RunCreate) -> str:
     # Build idempotency key from hints + inputs
     hints = body.idempotency_hints or {}
     business = {k: body.input.get(k) for k in sorted(body.input.keys())}
-    key = idempotency_key(body.purpose, body.payer_id, body.provider_npi, {**business, **hints})
+    return idempotency_key(body.purpose, body.payer_id, body.provider_npi, {**business, **hints})
 
-    async with session_scope() as s:
-        # Dedupe
-        existing = await s.get(IdempotentRun, key)
-        if existing:
-            run = await s.get(Run, existing.run_id)
-            assert run
-            return RunOut(
-                id=str(run.id),
-                purpose=run.purpose,
-                payer_id=run.payer_id,
-                provider_npi=run.provider_npi,
-                status=run.status.value,
-                source=run.source,
-                input=run.input_payload,
-                output=run.output_payload,
-                error_code=run.error_code,
-                error_msg=run.error_msg,
-            )
-
-        # Create new run
-        run = Run(
-            purpose=body.purpose,
-            payer_id=body.payer_id,
-            provider_npi=body.provider_npi,
-            status=RunStatus.queued,
-            input_payload=body.input,
+
+_inflight = SingleFlight()
+_revalidating: set[asyncio.Task] = set()
+
+
+async def _create_or_get(key: str, body: RunCreate) -> RunOut:
+    run_id = uuid7()
+    now = datetime.utcnow()
+    # Claim the key and insert the run in one statement; a concurrent
+    # claimant (other replica) gets no row back instead of a PK violation.
+    claimed = (
+        pg_insert(IdempotentRun)
+        .values(key=key, run_id=run_id, created_at=now)
+        .on_conflict_do_nothing(index_elements=[IdempotentRun.key])
+        .returning(IdempotentRun.run_id)
+        .cte("claimed")
+    )
+    stmt = (
+        insert(Run)
+        .from_select(
+            ["id", "purpose", "payer_id", "provider_npi", "status", "input_payload", "created_at", "updated_at"],
+            select(
+                claimed.c.run_id,
+                literal(body.purpose, String),
+                literal(body.payer_id, String),
+                literal(body.provider_npi, String),
+                cast(literal(RunStatus.queued.value), Run.__table__.c.status.type),
+                literal(body.input, JSONB),
+                literal(now, DateTime(timezone=True)),
+                literal(now, DateTime(timezone=True)),
+            ),
         )
-        s.add(run)
-        await s.flush()
-
-        s.add(IdempotentRun(key=key, run_id=run.id))
-
-        # Emit event
-        await get_bus().publish(Event(type="run.created", run_id=str(run.id), payload={"purpose": run.purpose}).dict())
-
-        return RunOut(
-            id=str(run.id),
-            purpose=run.purpose,
-            payer_id=run.payer_id,
-            provider_npi=run.provider_npi,
-            status=run.status.value,
-            source=run.source,
-            input=run.input_payload,
-            output=run.output_payload,
-            error_code=run.error_code,
-            error_msg=run.error_msg,
+        .returning(*Run.__table__.c)
+    )
+
+    async with session_scope() as s:
+        with timed(CREATE_RUN_STAGE, "db_insert"):
+            row = (await s.execute(stmt)).first()
+        if row is not None:
+            run = Run(**row._mapping)
+        else:
+            # Resolve the key to its run id first, so the run itself is read
+            # through the id's created_at window rather than every partition
+            with timed(CREATE_RUN_STAGE, "db_lookup"):
+                run_id = (await s.execute(select(IdempotentRun.run_id).where(IdempotentRun.key == key))).scalar_one()
+                run = (await s.execute(select(Run).where(run_by_id(run_id)))).scalar_one()
+
+    # Only announce runs this request actually created, and only once committed
+    if row is not None:
+        with timed(CREATE_RUN_STAGE, "publish"):
+            await get_bus().publish(Event(type="run.created", run_id=str(run.id), payload={"purpose": run.purpose}).dict())
+    return run_out(run)
+
+
+def _cached_out(body: RunCreate, hit: CachedResult) -> RunOut:
+    return RunOut(
+        id=hit.run_id,
+        purpose=body.purpose,
+        payer_id=body.payer_id,
+        provider_npi=body.provider_npi,
+        status=RunStatus.succeeded.value,
+        source="cache",
+        input=body.input,
+        output=hit.output,
+        as_of=hit.as_of_iso,
+    )
+
+
+async def _refresh(key: str, body: RunCreate) -> None:
+    # Starts the refresh run and returns; its workflow records the result,
+    # which replaces the stale cache entry when it succeeds. A run another
+    # replica already started is joined, not counted.
+    try:
+        out = await _create_or_get(key, body)
+        started = out.status == RunStatus.queued.value and await start_run(
+            uuid.UUID(out.id), body.payer_id, body.purpose, body.input
         )
+        if started:
+            REVALIDATIONS.labels(get_eligibility_cache().payer_label(body.payer_id)).inc()
+    except Exception as e:
+        # The run stays queued; the next stale hit on this entry retries it
+        log.warning("eligibility refresh for %s failed to start: %s: %s", body.payer_id, type(e).__name__, e)
 
 
-@router.get("/runs/{run_id}", response_model=RunOut)
-async def get_run(run_id: uuid.UUID):
+def _revalidate(body: RunCreate, hit: CachedResult) -> None:
+    # Keyed on the stale entry's as_of, so every replica serving the same
+    # stale entry collapses onto one refresh run via idempotency
+    refresh = body.model_copy(update={"idempotency_hints": {**(body.idempotency_hints or {}), "revalidate": hit.as_of}})
+    key = _key_for(refresh)
+    task = asyncio.ensure_future(_inflight.do(key, lambda: _refresh(key, refresh)))
+    _revalidating.add(task)
+    task.add_done_callback(_revalidating.discard)
+
+
+@router.post("/runs", response_model=RunOut)
+async def create_run(body: RunCreate, cache: bool = True):
+    # Eligibility checks are answered from recent results when possible;
+    # ?cache=false forces a new run
+    elig = eligibility_input(body.purpose, body.payer_id, body.provider_npi, body.input) if cache else None
+    if elig is not None:
+        with timed(CREATE_RUN_STAGE, "cache_lookup"):
+            hit = await get_eligibility_cache().get(elig)
+        if hit is not None:
+            if hit.stale:
+                _revalidate(body, hit)
+            annotate(run_id=hit.run_id, payer=body.payer_id)
+            return _cached_out(body, hit)
+
+    with timed(CREATE_RUN_STAGE, "key_hash"):
+        key = _key_for(body)
+    # Identical concurrent requests in this process share one DB operation
+    out = await _inflight.do(key, lambda: _create_or_get(key, body))
+    annotate(run_id=out.id, payer=body.payer_id)
+    return out
+
+
+@router.post("/runs:bulk", response_model=list[RunOut])
+async def create_runs_bulk(bodies: list[RunCreate]):
+    if len(bodies) > MAX_BULK_RUNS:
+        raise HTTPException(status_code=413, detail=f"at most {MAX_BULK_RUNS} runs per request")
+    keys = [_key_for(b) for b in bodies]
+
     async with session_scope() as s:
-        run = await s.get(Run, run_id)
-        if not run:
-            raise HTTPException(status_code=404, detail="run not found")
-        return RunOut(
-            id=str(run.id),
-            purpose=run.purpose,
-            payer_id=run.payer_id,
-            provider_npi=run.provider_npi,
-            status=run.status.value,
-            source=run.source,
-            input=run.input_payload,
-            output=run.output_payload,
-            error_code=run.error_code,
-            error_msg=run.error_msg,
+        runs, new_runs = await claim_runs(s, list(zip(keys, bodies)))
+
+    if new_runs:
+        await get_bus().publish_many(
+            [Event(type="run.created", run_id=str(r.id), payload={"purpose": r.purpose}).dict() for r in new_runs]
         )
 
+    return [run_out(runs[k]) for k in keys]
+
+
+@router.get("/runs", response_model=RunPage)
+async def get_runs(
+    status: RunStatus | None = None,
+    payer_id: str | None = None,
+    purpose: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    member_id: str | None = None,
+    input_contains: str | None = Query(default=None, description='JSON object matched with @>, e.g. {"claim_id":"C1"}'),
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    archived_payloads: bool = Query(default=False, description="load input/output of archived runs on the page"),
+):
+    contains = None
+    if input_contains:
+        try:
+            contains = json.loads(input_contains)
+        except ValueError:
+            contains = None
+        if not isinstance(contains, dict):
+            raise HTTPException(status_code=422, detail="input_contains must be a JSON object")
+    filters = RunFilters(status, payer_id, purpose, created_after, created_before, member_id, contains)
+    async with session_scope() as s:
+        try:
+            runs, next_cursor = await list_runs(s, filters, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    # Archived runs list with input/output null and archive_key set, unless
+    # the caller asks for their payloads to be read back from the archive
+    archived = {}
+    if archived_payloads:
+        archived = await load_archived_many([r.archive_key for r in runs if r.archive_key])
+    return RunPage(
+        items=[run_out(r, *archived.get(r.archive_key, (None, None))) for r in runs],
+        next_cursor=next_cursor,
+    )
+
+
+async def _load_run_json(run_id: uuid.UUID) -> bytes | None:
+    async with session_scope() as s:
+        run = (await s.execute(select(Run).where(run_by_id(run_id)))).scalar_one_or_none()
+    if run is None:
+        return None
+    archived = await load_archived_payloads(run.archive_key) if run.archive_key else (None, None)
+    return run_out(run, *archived).model_dump_json().encode()
+
+
+@router.get("/runs/{run_id}", response_model=RunOut)
+async def get_run(
+    run_id: uuid.UUID,
+    wait: float = Query(default=0, ge=0, le=MAX_WAIT_S),
+    since: str | None = None,
+    if_none_match: str | None = Header(default=None),
+):
+    # Polls are served from the status cache; an unchanged run answers 304
+    # without touching Postgres. With ?wait=N&since=<ETag> the request parks
+    # until a run.* event for this run arrives (or N seconds pass).
+    cache = get_run_cache()
+    load = lambda: _load_run_json(run_id)  # noqa: E731
+    if wait and since:
+        since = since.strip('"')
+        with get_waiters().watch(run_key(str(run_id))) as changed:
+            hit = await cache.get_or_load(str(run_id), load)
+            if hit is not None and hit[0].strip('"') == since:
+                if await wait_for_change(changed, wait) is None:
+                    return Response(status_code=304, headers={"ETag": hit[0]})
+                hit = await cache.get_or_load(str(run_id), load)
+    else:
+        hit = await cache.get_or_load(str(run_id), load)
+    if hit is None:
+        raise HTTPException(status_code=404, detail="run not found")
+    etag, body = hit
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 
 @router.get("/runs/{run_id}/artifacts")
 async def list_artifacts(run_id: uuid.UUID):
     prefix = f"runs/{run_id}/"
-    keys = list_prefix(prefix)
-    return {"artifacts": [{"key": k, "url": presign_get(k)} for k in keys]}
+    # Listing is network I/O (paginated); presigning is local and cached
+    keys = await asyncio.to_thread(list_prefix, prefix)
+    # Chunked (content-addressed) artifacts are served by reassembly, not S3
+    plain = [k for k in keys if not k.endswith(MANIFEST_SUFFIX)]
+    chunked = [k[len(prefix) : -len(MANIFEST_SUFFIX)] for k in keys if k.endswith(MANIFEST_SUFFIX)]
+    artifacts = [{"key": k, "url": u} for k, u in zip(plain, presign_many(plain))]
+    artifacts += [{"key": f"{prefix}{name}", "url": f"/runs/{run_id}/artifacts/{name}"} for name in chunked]
+    return {"artifacts": artifacts}
+
+
+@router.get("/runs/{run_id}/artifacts/{name:path}")
+async def get_chunked_artifact(run_id: uuid.UUID, name: str):
+    store = get_chunk_store()
+    try:
+        manifest = await asyncio.to_thread(store.read_manifest, str(run_id), name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="artifact not found")
+    return StreamingResponse(
+        store.iter_object(manifest),
+        media_type=manifest.content_type,
+        headers={"Content-Length": str(manifest.size)},
+    )
@@ -1,45 +1,77 @@
 from __future__ import annotations
 
+import json
 from dataclasses import asdict, is_dataclass
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+import yaml
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 
+from ...dsl.compiler import FlowError, get_registry
+from ..metrics import TEMPORAL_CLIENT, timed
+from ..tracing import annotate
+from ..events.waiters import TERMINAL_WORKFLOW_EVENTS, get_waiters, wait_for_change, workflow_key
+from ..services.workflow_cache import get_workflow_cache
 from ...workflows.client import get_temporal_client
 from ...workflows.portal import PortalFlow
 from ...app.settings import get_settings
 import asyncio
+import time
 from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.client import WorkflowExecutionStatus
 from temporalio.common import WorkflowIDReusePolicy
 
 
 router = APIRouter(prefix="/test/portal", tags=["test-portal"])
 
+MAX_WAIT_S = 60.0
+
 
 @router.post("/run")
 async def start_portal_flow(body: dict[str, Any] | None = None):
     s = get_settings()
     body = body or {}
     flow_id: str = body.get("flow_id", "test-flow")
-    steps: list[dict] = body.get("steps") or [{"op": "noop"}]
+    flow_yaml: str = body.get("flow_yaml") or yaml.safe_dump(
+        {"steps": body.get("steps") or [{"op": "navigate", "url": "about:blank"}]}
+    )
     workflow_id: str = body.get("workflow_id", "wf-test-1")
+    try:
+        flow = await get_registry().register(flow_yaml)
+    except FlowError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
+    annotate(payer=body.get("payer_id"), flow=flow_id)
     client = await get_temporal_client()
     try:
-        handle = await client.start_workflow(
-            PortalFlow.run,
-            id=workflow_id,
-            task_queue=s.temporal_task_queue,
-            args=[flow_id, steps],
-            id_reuse_policy=WorkflowIDReusePolicy.ALLOW_DUPLICATE_FAILED_ONLY,
-        )
+        with timed(TEMPORAL_CLIENT, "start"):
+            handle = await client.start_workflow(
+                PortalFlow.run,
+                id=workflow_id,
+                task_queue=s.temporal_task_queue,
+                # payer_id + credential_id opt into the encrypted session cache;
+                # input fills the flow's {{...}} templates
+                args=[
+                    flow_id,
+                    flow.hash,
+                    s.emit_local_activity,
+                    body.get("payer_id"),
+                    body.get("credential_id"),
+                    None,
+                    body.get("input"),
+                ],
+                id_reuse_policy=WorkflowIDReusePolicy.ALLOW_DUPLICATE_FAILED_ONLY,
+            )
     except WorkflowAlreadyStartedError:
         handle = client.get_workflow_handle(workflow_id)
+    # The id may be reused by a new run
+    get_workflow_cache().invalidate(workflow_id)
 
     # Best-effort state query (may race with start)
     state_dict: dict[str, Any] = {}
     try:
-        state = await handle.query(PortalFlow.get_state)
+        with timed(TEMPORAL_CLIENT, "query"):
+            state = await handle.query(PortalFlow.get_state)
         state_dict = asdict(state) if is_dataclass(state) else dict(state)
     except Exception:
         pass
@@ -52,12 +84,22 @@ async def get_state(workflow_id: str):
     client = await get_temporal_client()
     handle = client.get_workflow_handle(workflow_id)
     try:
-        state = await handle.query(PortalFlow.get_state)
+        with timed(TEMPORAL_CLIENT, "query"):
+            state = await handle.query(PortalFlow.get_state)
         return asdict(state) if is_dataclass(state) else dict(state)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def _timed_result(handle: Any, timeout: float) -> Any:
+    # Only results that arrive are timed; a wait_for timeout measures our own
+    # deadline, not Temporal, and would pile up at exactly `timeout`
+    t0 = time.perf_counter()
+    result = await asyncio.wait_for(handle.result(), timeout=timeout)
+    TEMPORAL_CLIENT.labels("result").observe(time.perf_counter() - t0)
+    return result
+
+
 @router.post("/{workflow_id}/mfa")
 async def provide_mfa(workflow_id: str, body: dict[str, Any]):
     code = body.get("code")
@@ -66,13 +108,16 @@ async def provide_mfa(workflow_id: str, body: dict[str, Any]):
     client = await get_temporal_client()
     handle = client.get_workflow_handle(workflow_id)
     try:
-        await handle.signal(PortalFlow.provide_mfa, str(code))
+        with timed(TEMPORAL_CLIENT, "signal"):
+            await handle.signal(PortalFlow.provide_mfa, str(code))
     except Exception as e:
         raise HTTPException(status_code=409, detail=f"Signal failed: {type(e).__name__}: {e}")
+    # The signal changes the workflow's state without sending an event
+    get_workflow_cache().invalidate(workflow_id)
 
     # Try to await result briefly; if not done, return 202
     try:
-        result = await asyncio.wait_for(handle.result(), timeout=10)
+        result = await _timed_result(handle, timeout=10)
         return {"result": result}
     except asyncio.TimeoutError:
         return {"status": "signal_sent", "message": "Workflow still running; check state later"}
@@ -80,16 +125,75 @@ async def provide_mfa(workflow_id: str, body: dict[str, Any]):
         raise HTTPException(status_code=400, detail=f"Workflow error: {type(e).__name__}: {e}")
 
 
-@router.get("/{workflow_id}/result")
-async def get_result(workflow_id: str):
-    client = await get_temporal_client()
-    handle = client.get_workflow_handle(workflow_id)
+async def _fetch_result(handle: Any) -> dict[str, Any]:
     try:
-        result = await asyncio.wait_for(handle.result(), timeout=1)
+        result = await _timed_result(handle, timeout=1)
         return {"status": "completed", "result": result}
     except asyncio.TimeoutError:
         return {"status": "running"}
     except Exception as e:
         return {"status": "error", "error": f"{type(e).__name__}: {e}"}
-    except asyncio.TimeoutError:
-        return {"status": "signal_sent", "message": "Workflow still running; check state later"}
+
+
+async def _snapshot(workflow_id: str, finishing: bool = False) -> tuple[bytes, bool]:
+    # The workflow's status plus its queryable state while it runs. Only
+    # blocks (briefly) on a running workflow's result when it just sent its
+    # terminal event and is about to finish.
+    client = await get_temporal_client()
+    handle = client.get_workflow_handle(workflow_id)
+    try:
+        with timed(TEMPORAL_CLIENT, "describe"):
+            desc = await handle.describe()
+        running = desc.status == WorkflowExecutionStatus.RUNNING
+    except Exception as e:
+        running = False
+        out: dict[str, Any] = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    else:
+        out = {"status": "running"} if running and not finishing else await _fetch_result(handle)
+    if out["status"] == "running":
+        try:
+            with timed(TEMPORAL_CLIENT, "query"):
+                state = await handle.query(PortalFlow.get_state)
+            out["state"] = asdict(state) if is_dataclass(state) else dict(state)
+        except Exception:
+            pass
+    return json.dumps(out, sort_keys=True, default=str).encode(), out["status"] == "running"
+
+
+@router.get("/{workflow_id}/result")
+async def get_result(
+    workflow_id: str,
+    wait: float = Query(default=0, ge=0, le=MAX_WAIT_S),
+    since: str | None = None,
+    if_none_match: str | None = Header(default=None),
+):
+    # Same contract as GET /runs/{id}: with ?wait=N&since=<ETag> the request
+    # parks on the in-process event stream until the workflow's snapshot
+    # changes (or N seconds pass, answered with 304). `since` is compared
+    # against the cached snapshot, so parking costs no Temporal calls.
+    cache = get_workflow_cache()
+
+    def load(finishing: bool = False):
+        return cache.get_or_load(workflow_id, lambda: _snapshot(workflow_id, finishing), fresh=finishing)
+
+    if wait and since:
+        since = since.strip('"')
+        deadline = time.monotonic() + wait
+        finishing = False
+        while True:
+            with get_waiters().watch(workflow_key(workflow_id)) as changed:
+                etag, body = await load(finishing)
+                if etag.strip('"') != since:
+                    break
+                # Unchanged (e.g. woken by an event that did not alter the
+                # snapshot): keep waiting out the rest of the budget
+                remaining = deadline - time.monotonic()
+                evt = await wait_for_change(changed, remaining) if remaining > 0 else None
+                if evt is None:
+                    return Response(status_code=304, headers={"ETag": etag})
+                finishing = evt.get("type") in TERMINAL_WORKFLOW_EVENTS
+    else:
+        etag, body = await load()
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
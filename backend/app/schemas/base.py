@@ -27,4 +27,11 @@ class RunOut(APIModel):
     output: dict | None = None
     error_code: str | None = None
     error_msg: str | None = None
+    as_of: str | None = None  # set when answered from the result cache
+    archive_key: str | None = None  # payloads moved to the object store by the archiver
 
+
+
+class RunPage(APIModel):
+    items: list[RunOut]
+    next_cursor: str | None = None
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Any
+
+import zstandard as zstd
+
+from ..artifacts.client import get_bytes, put_bytes
+
+
+# Cold run payloads: one zstd-compressed JSON object per run, grouped by
+# creation month so a whole month can be lifecycled/expired by prefix.
+ARCHIVE_PREFIX = "archive/runs/"
+
+
+def archive_key(run_id: str, created_at: datetime) -> str:
+    return f"{ARCHIVE_PREFIX}{created_at:%Y-%m}/{run_id}.json.zst"
+
+
+def pack(input_payload: dict | None, output_payload: dict | None) -> bytes:
+    raw = json.dumps({"input": input_payload, "output": output_payload}, separators=(",", ":")).encode()
+    return zstd.ZstdCompressor(level=10).compress(raw)
+
+
+def unpack(blob: bytes) -> tuple[dict | None, dict | None]:
+    doc: dict[str, Any] = json.loads(zstd.ZstdDecompressor().decompress(blob))
+    return doc.get("input"), doc.get("output")
+
+
+def store_archive(key: str, input_payload: dict | None, output_payload: dict | None) -> None:
+    put_bytes(key, pack(input_payload, output_payload), content_type="application/zstd")
+
+
+async def load_archived_payloads(key: str) -> tuple[dict | None, dict | None]:
+    return unpack(await asyncio.to_thread(get_bytes, key))
+
+
+async def load_archived_many(keys: list[str]) -> dict[str, tuple[dict | None, dict | None]]:
+    # Fetched concurrently; the default thread pool bounds the fan-out
+    unique = list(dict.fromkeys(keys))
+    return dict(zip(unique, await asyncio.gather(*(load_archived_payloads(k) for k in unique))))
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import and_, select, tuple_, update
+
+from ..db import session_scope
+from ..events.bus import get_bus
+from ..events.envelope import Event
+from ..models import Batch, BatchDriver, BatchItem, Run, RunStatus
+from ..schemas.base import RunCreate
+from ..settings import get_settings
+from .dispatch import remember_result, update_run
+from .runs import claim_runs
+
+
+# Claiming and result recording for batch items, shared by the batch
+# executor and BatchFlow so both can drain the same batch safely.
+
+
+_FINISHED = (RunStatus.succeeded, RunStatus.failed)
+
+# Claimant id prefix of batch executors. Only their claims expire: BatchFlow
+# keeps its claimed items in workflow history and never loses them.
+EXECUTOR_CLAIMANT = "executor:"
+
+
+@dataclass
+class Item:
+    batch_id: uuid.UUID
+    row_num: int
+    purpose: str
+    payer_id: str
+    run_id: uuid.UUID
+    # False when another item (or an earlier request) drives the run; the
+    # item is linked to it and finishes when the run does
+    owner: bool = True
+    input: dict | None = None  # the row's input, rendered into the flow's templates
+
+
+async def claim_batch_items(
+    batch_id: uuid.UUID, purpose: str, limit: int, claimed_by: str, driver: BatchDriver = BatchDriver.executor
+) -> list[Item]:
+    # Claimed rows are leased to `claimed_by` (see renew_leases). Rows that
+    # must drive their run come back as owners (see link_rows); every other
+    # row shares an existing run by idempotency key and copies its status.
+    now = datetime.utcnow()
+    async with session_scope() as s:
+        # Nothing is claimed for the other driver; the share lock orders this
+        # claim against a concurrent hand-over (take_over_batch)
+        owned = await s.execute(
+            select(Batch.id).where(Batch.id == batch_id, Batch.driver == driver).with_for_update(read=True)
+        )
+        if owned.first() is None:
+            return []
+        picked = (
+            select(BatchItem.batch_id, BatchItem.row_num)
+            .where(BatchItem.batch_id == batch_id, BatchItem.status == RunStatus.queued)
+            .order_by(BatchItem.row_num)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await s.execute(
+            update(BatchItem)
+            .where(tuple_(BatchItem.batch_id, BatchItem.row_num).in_(picked))
+            .values(status=RunStatus.running, claimed_by=claimed_by, claimed_at=now)
+            .returning(BatchItem.row_num, BatchItem.idempotency_key, BatchItem.input_payload, BatchItem.run_id)
+        )
+        # RETURNING order is unspecified; the first row of a duplicated key drives it
+        rows = sorted(res.all(), key=lambda r: r.row_num)
+        if not rows:
+            return []
+        bodies = [
+            (
+                key,
+                RunCreate(
+                    purpose=purpose,
+                    payer_id=payload["payer_id"],
+                    provider_npi=payload.get("provider_npi"),
+                    input=payload,
+                ),
+            )
+            for _, key, payload, _ in rows
+        ]
+        runs, new_runs = await claim_runs(s, bodies)
+        # Queued runs that some other live claim is about to drive; any other
+        # queued run (e.g. from a plain POST /runs, which starts no workflow)
+        # would never finish unless a row linked to it drives it
+        queued = [r.id for r in runs.values() if r.status is RunStatus.queued]
+        driven: set[uuid.UUID] = set()
+        if queued:
+            res = await s.execute(
+                select(BatchItem.run_id)
+                .where(
+                    BatchItem.run_id.in_(queued),
+                    BatchItem.status == RunStatus.running,
+                    BatchItem.claimed_at.is_not(None),
+                    ~and_(BatchItem.batch_id == batch_id, BatchItem.row_num.in_([r.row_num for r in rows])),
+                )
+                .distinct()
+            )
+            driven = set(res.scalars())
+        items: list[Item] = []
+        values: list[dict] = []
+        for (n, key, payload, prev_run_id), (run, status, owner) in zip(
+            rows, link_rows(rows, runs, {r.id for r in new_runs}, driven)
+        ):
+            items.append(Item(batch_id, n, purpose, run.payer_id, run.id, owner, payload))
+            values.append(
+                {
+                    "batch_id": batch_id,
+                    "row_num": n,
+                    "run_id": run.id,
+                    "status": status,
+                    "claimed_at": now if owner else None,
+                }
+            )
+        await s.execute(update(BatchItem), values)
+    if new_runs:
+        await get_bus().publish_many(
+            [
+                Event(type="run.created", run_id=str(r.id), batch_id=str(batch_id), payload={"purpose": r.purpose}).dict()
+                for r in new_runs
+            ]
+        )
+    return items
+
+
+def link_rows(
+    rows: Sequence[Any], runs: dict[str, Run], created: set[uuid.UUID], driven: set[uuid.UUID]
+) -> list[tuple[Run, RunStatus, bool]]:
+    # (run, item status, owner) for each claimed (row_num, key, payload,
+    # prev_run_id) row, in row order. The first row of a run that nothing
+    # drives yet owns it: a run this claim created, a queued run outside
+    # `driven`, or the run the row already drove under an expired lease.
+    out = []
+    for _, key, _, prev_run_id in rows:
+        run = runs[key]
+        status = RunStatus.running
+        owner = False
+        if run.status in _FINISHED:
+            status = run.status
+        elif run.id in created or (run.status is RunStatus.queued and run.id not in driven) or prev_run_id == run.id:
+            owner = run.id not in driven
+        if owner:
+            created.discard(run.id)
+            driven.add(run.id)
+        out.append((run, status, owner))
+    return out
+
+
+async def wake_executors(batch_id: uuid.UUID) -> None:
+    # One entry per ready batch; an idle executor claims it right away
+    s = get_settings()
+    await get_bus().append(s.batch_wake_stream, {"batch_id": str(batch_id)}, s.batch_wake_stream_maxlen)
+
+
+async def claimed_items(batch_id: uuid.UUID, purpose: str, claimed_by: str) -> list[tuple[Item, RunStatus]]:
+    # What an earlier attempt with the same claimant already claimed, so a
+    # retried claim returns the same rows instead of claiming more
+    async with session_scope() as s:
+        res = await s.execute(
+            select(BatchItem.row_num, BatchItem.run_id, BatchItem.status, BatchItem.claimed_at, BatchItem.input_payload)
+            .where(BatchItem.batch_id == batch_id, BatchItem.claimed_by == claimed_by)
+            .order_by(BatchItem.row_num)
+        )
+        return [
+            (Item(batch_id, n, purpose, payload["payer_id"], run_id, claimed_at is not None, payload), status)
+            for n, run_id, status, claimed_at, payload in res.all()
+        ]
+
+
+async def take_over_batch(batch_id: uuid.UUID) -> bool:
+    # Hands a ready batch to BatchFlow. Only possible while the executor has
+    # claimed none of its items; from then on the executor skips it.
+    async with session_scope() as s:
+        b = (await s.execute(select(Batch).where(Batch.id == batch_id).with_for_update())).scalar_one_or_none()
+        if b is None:
+            raise LookupError(batch_id)
+        if b.driver is BatchDriver.workflow:
+            return True
+        started = await s.execute(
+            select(BatchItem.row_num).where(BatchItem.batch_id == batch_id, BatchItem.status != RunStatus.queued).limit(1)
+        )
+        if started.first() is not None:
+            return False
+        b.driver = BatchDriver.workflow
+        return True
+
+
+async def renew_leases(claimed_by: str) -> int:
+    # Called by a live claimant well within BATCH_LEASE_TTL_S
+    async with session_scope() as s:
+        res = await s.execute(
+            update(BatchItem)
+            .where(
+                BatchItem.status == RunStatus.running,
+                BatchItem.claimed_by == claimed_by,
+                BatchItem.claimed_at.is_not(None),
+            )
+            .values(claimed_at=datetime.utcnow())
+        )
+        return res.rowcount
+
+
+async def release_expired_leases(ttl_s: float) -> int:
+    # Items whose claimant died (crash, redeploy) go back to queued; the next
+    # claim finds the run already linked and drives it again
+    async with session_scope() as s:
+        res = await s.execute(
+            update(BatchItem)
+            .where(
+                BatchItem.status == RunStatus.running,
+                BatchItem.claimed_at < datetime.utcnow() - timedelta(seconds=ttl_s),
+                BatchItem.claimed_by.startswith(EXECUTOR_CLAIMANT),
+            )
+            .values(status=RunStatus.queued, claimed_by=None, claimed_at=None)
+        )
+        return res.rowcount
+
+
+async def set_item_status(
+    item: Item,
+    status: RunStatus,
+    output: dict | None = None,
+    error: str | None = None,
+    error_code: str = "portal_error",
+) -> None:
+    async with session_scope() as s:
+        run = await update_run(s, item.run_id, status, output, error, error_code)
+        await s.execute(
+            update(BatchItem)
+            .where(BatchItem.batch_id == item.batch_id, BatchItem.row_num == item.row_num)
+            .values(status=status)
+        )
+        if status in _FINISHED:
+            # Items linked to this run by idempotency key finish with it
+            await s.execute(
+                update(BatchItem)
+                .where(
+                    BatchItem.run_id == item.run_id,
+                    BatchItem.status == RunStatus.running,
+                    BatchItem.claimed_at.is_(None),
+                )
+                .values(status=status)
+            )
+    await remember_result(run, item.run_id, status, output)
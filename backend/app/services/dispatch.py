@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import pathlib
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from temporalio.client import WorkflowHandle
+from temporalio.common import WorkflowIDConflictPolicy, WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from ...dsl.compiler import get_registry
+from ...workflows.client import get_temporal_client
+from ...workflows.portal import PortalFlow
+from ..db import session_scope
+from ..events.bus import get_bus
+from ..events.envelope import Event
+from ..models import BatchItem, Run, RunStatus
+from ..settings import get_settings
+from .eligibility_cache import eligibility_input, get_eligibility_cache
+from .runs import run_by_id
+
+
+# Driving one run through PortalFlow and recording its result. The batch
+# executor and API-side refreshes (stale eligibility entries) share this
+# path, so a run is started, deduplicated and cached the same way everywhere.
+
+@dataclass(frozen=True)
+class PortalTarget:
+    flow_hash: str
+    credential_id: str
+
+
+_flow_hashes: dict[str, str] = {}
+
+
+async def portal_target(payer_id: str, purpose: str) -> PortalTarget:
+    # The flow (BATCH_FLOWS) and credential (PAYER_CREDENTIALS) a run uses.
+    # Raises ValueError when either is missing: such a run could only stop
+    # at the login breakpoint and wait for a person.
+    s = get_settings()
+    path = s.batch_flows.get(f"{payer_id}:{purpose}") or s.batch_flows.get(purpose)
+    if path is None:
+        raise ValueError(f"no flow configured for {payer_id}:{purpose} (BATCH_FLOWS)")
+    credential_id = s.payer_credentials.get(payer_id)
+    if credential_id is None:
+        raise ValueError(f"no credential configured for {payer_id} (PAYER_CREDENTIALS)")
+    # Registered once per process so every worker resolves the hash
+    flow_hash = _flow_hashes.get(path)
+    if flow_hash is None:
+        text = await asyncio.to_thread(pathlib.Path(path).read_text)
+        flow_hash = _flow_hashes[path] = (await get_registry().register(text)).hash
+    return PortalTarget(flow_hash, credential_id)
+
+
+async def start_portal_flow(
+    run_id: uuid.UUID, payer_id: str, purpose: str, inputs: dict[str, Any] | None = None, record: bool = False
+) -> WorkflowHandle:
+    # One PortalFlow per run: a second caller joins the running workflow, or
+    # reads back its result if it already finished, instead of starting it
+    # again. inputs is the run's input, rendered into the flow's templates.
+    # With record, the workflow writes the run's result itself.
+    target = await portal_target(payer_id, purpose)
+    s = get_settings()
+    client = await get_temporal_client()
+    workflow_id = f"run-{run_id}"
+    try:
+        return await client.start_workflow(
+            PortalFlow.run,
+            id=workflow_id,
+            task_queue=s.temporal_task_queue,
+            id_reuse_policy=WorkflowIDReusePolicy.REJECT_DUPLICATE,
+            id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+            args=[
+                f"{payer_id}:{purpose}",
+                target.flow_hash,
+                s.emit_local_activity,
+                payer_id,
+                target.credential_id,
+                str(run_id) if record else None,
+                inputs,
+            ],
+        )
+    except WorkflowAlreadyStartedError:
+        return client.get_workflow_handle(workflow_id)
+
+
+async def run_portal_flow(
+    run_id: uuid.UUID, payer_id: str, purpose: str, inputs: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    return await (await start_portal_flow(run_id, payer_id, purpose, inputs)).result()
+
+
+async def update_run(
+    s: AsyncSession,
+    run_id: uuid.UUID,
+    status: RunStatus,
+    output: dict | None = None,
+    error: str | None = None,
+    error_code: str = "portal_error",
+) -> Any:
+    # Inside the caller's transaction; returns the columns remember_result needs
+    values: dict = {"status": status}
+    if output is not None:
+        values["output_payload"] = output
+    if error is not None:
+        values["error_code"] = error_code
+        values["error_msg"] = error
+    return (
+        await s.execute(
+            update(Run)
+            .where(run_by_id(run_id))
+            .values(**values)
+            .returning(Run.purpose, Run.payer_id, Run.provider_npi, Run.input_payload, Run.source)
+        )
+    ).one()
+
+
+async def remember_result(run: Any, run_id: uuid.UUID, status: RunStatus, output: dict | None) -> None:
+    # Successful eligibility results answer later identical checks from cache
+    if status is RunStatus.succeeded and output is not None:
+        elig = eligibility_input(run.purpose, run.payer_id, run.provider_npi, run.input_payload)
+        if elig is not None:
+            await get_eligibility_cache().put(elig, output, str(run_id), source=run.source)
+
+
+async def record_run_result(run_id: uuid.UUID, status: RunStatus, **result: Any) -> None:
+    async with session_scope() as s:
+        run = await update_run(s, run_id, status, **result)
+        if status in (RunStatus.succeeded, RunStatus.failed):
+            # Batch rows linked to this run by idempotency key finish with it
+            await s.execute(
+                update(BatchItem)
+                .where(BatchItem.run_id == run_id, BatchItem.status == RunStatus.running, BatchItem.claimed_at.is_(None))
+                .values(status=status)
+            )
+    await remember_result(run, run_id, status, result.get("output"))
+    await get_bus().publish(Event(type=f"run.{status.value}", run_id=str(run_id), payload={}).dict())
+
+
+async def start_run(run_id: uuid.UUID, payer_id: str, purpose: str, inputs: dict[str, Any] | None = None) -> bool:
+    # A standalone run (not a batch item): start its workflow and return; the
+    # workflow records the result (record_run activity), so nothing waits on
+    # it here. True only for the caller that moved the run out of queued.
+    try:
+        await start_portal_flow(run_id, payer_id, purpose, inputs, record=True)
+    except ValueError as e:
+        await record_run_result(run_id, RunStatus.failed, error=str(e), error_code="not_configured")
+        return False
+    # Guarded on queued: a fast workflow may already have recorded its result
+    async with session_scope() as s:
+        res = await s.execute(
+            update(Run).where(run_by_id(run_id), Run.status == RunStatus.queued).values(status=RunStatus.running)
+        )
+    if res.rowcount != 1:
+        return False
+    await get_bus().publish(Event(type="run.running", run_id=str(run_id), payload={}).dict())
+    return True
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as aioredis
+from prometheus_client import Counter
+
+from ..schemas.eligibility import EligibilityInput
+from ..settings import get_settings
+
+
+log = logging.getLogger(__name__)
+
+LOOKUPS = Counter("eligibility_cache_lookups_total", "Eligibility cache lookups", ["payer", "result"])  # fresh|stale|miss|error
+REVALIDATIONS = Counter("eligibility_cache_revalidations_total", "Background refreshes of stale entries", ["payer"])
+
+_DATE_FORMATS = ("%Y-%m-%d", "%Y%m%d", "%m/%d/%Y", "%m-%d-%Y")
+
+
+def _norm_date(value: str) -> str:
+    value = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return value
+
+
+def normalize_payer(payer_id: str) -> str:
+    return payer_id.strip().lower()
+
+
+def normalize(inp: EligibilityInput) -> dict[str, str]:
+    # The same member/payer/date of service must map to one key regardless of
+    # casing, whitespace or date format in the request
+    fields = {
+        "payer_id": normalize_payer(inp.payer_id),
+        "provider_npi": inp.provider_npi.strip(),
+        "member_id": "".join(inp.member_id.split()).upper(),
+        "patient_last_name": inp.patient_last_name.strip().casefold(),
+        "patient_first_name": (inp.patient_first_name or "").strip().casefold(),
+        "patient_dob": _norm_date(inp.patient_dob),
+        "service_date": _norm_date(inp.service_date),
+        "service_type_code": (inp.service_type_code or "30").strip().upper(),  # 30 = health benefit plan coverage
+    }
+    return {k: v for k, v in fields.items() if v}
+
+
+@dataclass
+class CachedResult:
+    run_id: str
+    output: dict[str, Any]
+    as_of: float  # epoch seconds the result was produced
+    source: str | None
+    stale: bool
+
+    @property
+    def as_of_iso(self) -> str:
+        return datetime.fromtimestamp(self.as_of, tz=timezone.utc).isoformat()
+
+
+class EligibilityCache:
+    # Fresh for the payer's TTL, then served stale (while the caller refreshes
+    # it) for a further SWR window; Redis expires the entry after both. Payer
+    # ids are normalized before TTL lookups and metric labels; metrics label
+    # payers outside `payers` (the configured ones) as "other".
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        ttl_s: int = 3600,
+        swr_s: int = 900,
+        payer_ttls: dict[str, int] | None = None,
+        payers: set[str] | None = None,
+    ) -> None:
+        self.redis = redis
+        self.ttl_s = ttl_s
+        self.swr_s = swr_s
+        self.payer_ttls = {normalize_payer(p): ttl for p, ttl in (payer_ttls or {}).items()}
+        self.payers = {normalize_payer(p) for p in payers} if payers is not None else set(self.payer_ttls)
+
+    def ttl_for(self, payer: str) -> int:
+        return self.payer_ttls.get(normalize_payer(payer), self.ttl_s)
+
+    def payer_label(self, payer: str) -> str:
+        # Payer ids come from clients: keep the label set bounded
+        payer = normalize_payer(payer)
+        return payer if payer in self.payers else "other"
+
+    @staticmethod
+    def _key(fields: dict[str, str]) -> str:
+        digest = hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+        return f"elig:{fields['payer_id']}:{digest}"
+
+    @classmethod
+    def cache_key(cls, inp: EligibilityInput) -> str:
+        return cls._key(normalize(inp))
+
+    async def get(self, inp: EligibilityInput) -> CachedResult | None:
+        fields = normalize(inp)
+        label = self.payer_label(fields["payer_id"])
+        # An unreachable Redis is a miss: the caller runs the check instead
+        try:
+            raw = await self.redis.get(self._key(fields))
+        except aioredis.RedisError as e:
+            LOOKUPS.labels(label, "error").inc()
+            log.warning("eligibility cache unavailable: %s", e)
+            return None
+        if raw is None:
+            LOOKUPS.labels(label, "miss").inc()
+            return None
+        entry = json.loads(raw)
+        stale = time.time() - entry["as_of"] > self.ttl_for(fields["payer_id"])
+        LOOKUPS.labels(label, "stale" if stale else "fresh").inc()
+        return CachedResult(entry["run_id"], entry["output"], entry["as_of"], entry.get("source"), stale)
+
+    async def put(
+        self,
+        inp: EligibilityInput,
+        output: dict[str, Any],
+        run_id: str,
+        source: str | None = None,
+        as_of: float | None = None,
+    ) -> None:
+        fields = normalize(inp)
+        entry = {"run_id": run_id, "output": output, "as_of": as_of or time.time(), "source": source}
+        ttl = self.ttl_for(fields["payer_id"]) + self.swr_s
+        await self.redis.set(self._key(fields), json.dumps(entry, separators=(",", ":")), ex=ttl)
+
+    async def invalidate(self, inp: EligibilityInput) -> bool:
+        return bool(await self.redis.delete(self.cache_key(inp)))
+
+    async def invalidate_payer(self, payer_id: str) -> int:
+        removed = 0
+        batch: list[bytes] = []
+        async for key in self.redis.scan_iter(match=f"elig:{normalize_payer(payer_id)}:*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                removed += await self.redis.unlink(*batch)
+                batch.clear()
+        if batch:
+            removed += await self.redis.unlink(*batch)
+        return removed
+
+
+def eligibility_input(purpose: str, payer_id: str, provider_npi: str | None, payload: dict | None) -> EligibilityInput | None:
+    # Runs carry payer/NPI at the top level and the rest in input; anything
+    # that is not a complete eligibility request is simply not cacheable
+    if purpose != "eligibility":
+        return None
+    try:
+        return EligibilityInput(**{**(payload or {}), "payer_id": payer_id, "provider_npi": provider_npi})
+    except Exception:
+        return None
+
+
+_cache: EligibilityCache | None = None
+
+
+def get_eligibility_cache() -> EligibilityCache:
+    global _cache
+    if _cache is None:
+        s = get_settings()
+        _cache = EligibilityCache(
+            aioredis.from_url(s.redis_url),
+            ttl_s=s.eligibility_cache_ttl_s,
+            swr_s=s.eligibility_cache_swr_s,
+            payer_ttls={p: int(c["eligibility_ttl_s"]) for p, c in s.payer_limits.items() if "eligibility_ttl_s" in c},
+            payers={*s.payer_limits, *s.payer_credentials},
+        )
+    return _cache
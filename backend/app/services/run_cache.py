@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import redis.asyncio as aioredis
+from prometheus_client import Counter
+
+from ..events.hub import EventHub, get_hub
+from ..settings import get_settings
+from ..utils.singleflight import SingleFlight
+
+
+log = logging.getLogger(__name__)
+
+LOOKUPS = Counter("run_cache_lookups_total", "GET /runs/{id} cache lookups", ["layer"])  # lru|redis|db
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class RunStatusCache:
+    # Serialized RunOut bytes (with their ETag) in Redis, fronted by a small
+    # per-process LRU. Entries are dropped when a run.* event for the run goes
+    # through the process's EventHub, so both layers follow status changes;
+    # the TTLs only bound staleness if the event feed is down.
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        hub: EventHub | None = None,
+        ttl_s: int = 300,
+        lru_size: int = 10_000,
+        lru_ttl_s: float = 2.0,
+    ) -> None:
+        self.redis = redis
+        self.ttl_s = ttl_s
+        self.lru_size = lru_size
+        self.lru_ttl_s = lru_ttl_s
+        self._lru: OrderedDict[str, tuple[float, str, bytes]] = OrderedDict()
+        # Invalidation epochs: a load that started before the run's last event
+        # must not write its (possibly older) result back
+        self._epoch = 0
+        self._touched: OrderedDict[str, int] = OrderedDict()
+        self._pending_deletes: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._loads = SingleFlight()
+        if hub is not None:
+            hub.add_listener(self.on_event)
+
+    @staticmethod
+    def _key(run_id: str) -> str:
+        return f"runs:view:{run_id}"
+
+    def _lru_get(self, run_id: str) -> tuple[str, bytes] | None:
+        hit = self._lru.get(run_id)
+        if hit is None:
+            return None
+        expires, etag, body = hit
+        if expires < time.monotonic():
+            del self._lru[run_id]
+            return None
+        self._lru.move_to_end(run_id)
+        return etag, body
+
+    def _lru_put(self, run_id: str, etag: str, body: bytes) -> None:
+        self._lru[run_id] = (time.monotonic() + self.lru_ttl_s, etag, body)
+        self._lru.move_to_end(run_id)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def get_or_load(self, run_id: str, load: Callable[[], Awaitable[bytes | None]]) -> tuple[str, bytes] | None:
+        hit = self._lru_get(run_id)
+        if hit is not None:
+            LOOKUPS.labels("lru").inc()
+            return hit
+        # Skip Redis while this run's delete is still queued: its entry is stale
+        if run_id not in self._pending_deletes:
+            try:
+                raw = await self.redis.get(self._key(run_id))
+            except aioredis.RedisError as e:
+                # The cache is an optimization: without Redis, polls go to Postgres
+                log.warning("run cache read failed, loading from the database: %s", e)
+                raw = None
+            if raw is not None:
+                LOOKUPS.labels("redis").inc()
+                etag, _, body = raw.partition(b"\n")
+                self._lru_put(run_id, etag.decode(), body)
+                return etag.decode(), body
+        # Concurrent misses for one run (e.g. long-poll waiters woken by the
+        # same event) share a single database load; keyed by the run's last
+        # invalidation so nobody joins a load that started before it
+        flight = (run_id, self._touched.get(run_id))
+        return await self._loads.do(flight, lambda: self._load(run_id, load))
+
+    async def _load(self, run_id: str, load: Callable[[], Awaitable[bytes | None]]) -> tuple[str, bytes] | None:
+        LOOKUPS.labels("db").inc()
+        epoch = self._epoch
+        body = await load()
+        if body is None:
+            return None
+        etag = etag_for(body)
+        if self._touched.get(run_id, -1) <= epoch:
+            self._lru_put(run_id, etag, body)
+            try:
+                await self.redis.set(self._key(run_id), etag.encode() + b"\n" + body, ex=self.ttl_s)
+            except aioredis.RedisError as e:
+                log.warning("run cache write failed: %s", e)
+        return etag, body
+
+    def on_event(self, evt: dict) -> None:
+        run_id = evt.get("run_id")
+        if not run_id or not str(evt.get("type", "")).startswith("run."):
+            return
+        self._epoch += 1
+        self._touched[run_id] = self._epoch
+        self._touched.move_to_end(run_id)
+        while len(self._touched) > self.lru_size:
+            self._touched.popitem(last=False)
+        self._lru.pop(run_id, None)
+        # Redis deletes are batched per loop iteration; every replica sees
+        # the same event, so the delete is idempotent across them
+        self._pending_deletes.add(run_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_deletes())
+
+    async def invalidate(self, run_id: str) -> None:
+        self.on_event({"type": "run.invalidated", "run_id": run_id})
+        await self._flush_deletes()
+
+    async def _flush_deletes(self) -> None:
+        await asyncio.sleep(0)
+        while self._pending_deletes:
+            run_ids = set(self._pending_deletes)
+            try:
+                await self.redis.delete(*(self._key(r) for r in run_ids))
+            except Exception:
+                log.exception("run cache invalidation failed for %d runs", len(run_ids))
+            self._pending_deletes.difference_update(run_ids)
+
+
+_cache: RunStatusCache | None = None
+
+
+def get_run_cache() -> RunStatusCache:
+    global _cache
+    if _cache is None:
+        s = get_settings()
+        _cache = RunStatusCache(
+            aioredis.from_url(s.redis_url),
+            hub=get_hub(),
+            ttl_s=s.run_cache_ttl_s,
+            lru_size=s.run_cache_lru_size,
+            lru_ttl_s=s.run_cache_lru_ttl_s,
+        )
+    return _cache
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import ColumnElement, String, and_, any_, bindparam, insert, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import IdempotentRun, Run, RunStatus
+from ..schemas.base import RunCreate, RunOut
+from ..utils.ids import uuid7, uuid7_time
+
+
+# Spelled with a constant key so the planner matches ix_runs_input_member_id
+_MEMBER_ID = Run.input_payload.op("->>")(literal_column("'member_id'"))
+
+# created_at is set by the same process that mints the id; this only has to
+# absorb clock differences, and keeps lookups within one or two partitions
+_ID_CLOCK_SLACK = timedelta(days=1)
+
+_RUN_INSERT_COLS = ("id", "purpose", "payer_id", "provider_npi", "status", "input_payload", "created_at", "updated_at")
+
+
+def run_out(run: Run, input_payload: dict | None = None, output_payload: dict | None = None) -> RunOut:
+    # The one Run -> RunOut path. Columns are already typed, so skip
+    # validation; payload overrides are for runs whose payloads are archived.
+    return RunOut.model_construct(
+        id=str(run.id),
+        purpose=run.purpose,
+        payer_id=run.payer_id,
+        provider_npi=run.provider_npi,
+        status=run.status.value,
+        source=run.source,
+        input=run.input_payload if input_payload is None else input_payload,
+        output=run.output_payload if output_payload is None else output_payload,
+        error_code=run.error_code,
+        error_msg=run.error_msg,
+        as_of=None,
+        archive_key=run.archive_key,
+    )
+
+
+def run_by_id(run_id: uuid.UUID) -> ColumnElement[bool]:
+    # runs is partitioned by created_at month: bounding created_at from the
+    # UUIDv7 timestamp lets the planner prune to the partitions around it.
+    # Legacy v4 ids fall back to probing every partition's index.
+    clause = Run.id == run_id
+    ts = uuid7_time(run_id)
+    if ts is not None:
+        clause = and_(clause, Run.created_at.between(ts - _ID_CLOCK_SLACK, ts + _ID_CLOCK_SLACK))
+    return clause
+
+
+def runs_by_ids(run_ids: list[uuid.UUID]) -> ColumnElement[bool]:
+    # run_by_id for a set of ids: bounded to the partitions between the
+    # oldest and newest UUIDv7 timestamp (unbounded if any id is legacy v4)
+    clause = Run.id.in_(run_ids)
+    times = [uuid7_time(i) for i in run_ids]
+    if times and None not in times:
+        clause = and_(clause, Run.created_at.between(min(times) - _ID_CLOCK_SLACK, max(times) + _ID_CLOCK_SLACK))  # type: ignore[type-var]
+    return clause
+
+
+async def claim_runs(s: AsyncSession, items: list[tuple[str, RunCreate]]) -> tuple[dict[str, Run], list[Run]]:
+    # Set-based create-or-get inside the caller's transaction. Returns the run
+    # for every distinct key plus the runs this call created; duplicate keys
+    # collapse onto one run.
+    now = datetime.utcnow()
+    candidates: dict[str, Run] = {}
+    for key, body in items:
+        if key not in candidates:
+            candidates[key] = Run(
+                id=uuid7(),
+                purpose=body.purpose,
+                payer_id=body.payer_id,
+                provider_npi=body.provider_npi,
+                status=RunStatus.queued,
+                input_payload=body.input,
+                created_at=now,
+                updated_at=now,
+            )
+    if not candidates:
+        return {}, []
+
+    # Claim all keys with one multi-row insert; the rows that come back are ours.
+    # Rows go in key order so concurrent requests with overlapping keys wait
+    # on each other's unique-index entries in the same order, never in a cycle.
+    res = await s.execute(
+        pg_insert(IdempotentRun)
+        .values([{"key": k, "run_id": candidates[k].id, "created_at": now} for k in sorted(candidates)])
+        .on_conflict_do_nothing(index_elements=[IdempotentRun.key])
+        .returning(IdempotentRun.key)
+    )
+    won = set(res.scalars())
+    new_runs = [candidates[k] for k in candidates if k in won]
+    if new_runs:
+        await s.execute(
+            insert(Run),
+            [{c: getattr(r, c) for c in _RUN_INSERT_COLS} for r in new_runs],
+        )
+
+    # Everything else already existed; resolve the keys with one ANY(array)
+    # lookup, then load their runs within the ids' created_at window
+    lost = [k for k in candidates if k not in won]
+    if lost:
+        res = await s.execute(
+            select(IdempotentRun.key, IdempotentRun.run_id).where(
+                IdempotentRun.key == any_(bindparam("keys", lost, type_=ARRAY(String)))
+            )
+        )
+        run_ids = dict(res.all())
+        runs = {r.id: r for r in (await s.execute(select(Run).where(runs_by_ids(list(run_ids.values()))))).scalars()}
+        # A run whose created_at drifted outside the window is still there;
+        # look the stragglers up without the partition bound
+        missing = [i for i in run_ids.values() if i not in runs]
+        if missing:
+            runs.update((r.id, r) for r in (await s.execute(select(Run).where(Run.id.in_(missing)))).scalars())
+        for key in lost:
+            # Never hand back the unsaved candidate: a claimed key always
+            # has a run, like scalar_one() in routes/runs.py:_create_or_get
+            run_id = run_ids.get(key)
+            if run_id not in runs:
+                raise NoResultFound(f"idempotency key {key!r} has no run")
+            candidates[key] = runs[run_id]
+
+    return candidates, new_runs
+
+
+@dataclass
+class RunFilters:
+    status: RunStatus | None = None
+    payer_id: str | None = None
+    purpose: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    member_id: str | None = None
+    input_contains: dict | None = None
+
+
+def encode_cursor(run: Run) -> str:
+    raw = json.dumps([run.created_at.isoformat(), str(run.id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    # Raises ValueError on anything that is not a cursor we issued
+    try:
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), uuid.UUID(run_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+async def list_runs(s: AsyncSession, f: RunFilters, limit: int, cursor: str | None = None) -> tuple[list[Run], str | None]:
+    # Newest first, keyset-paginated on (created_at, id) so page N costs the
+    # same as page 1; every filter combination is served by an index ending
+    # in (created_at, id) (see 0003_runs_jsonb_indexes).
+    q = select(Run)
+    if f.status is not None:
+        q = q.where(Run.status == f.status)
+    if f.payer_id is not None:
+        q = q.where(Run.payer_id == f.payer_id)
+    if f.purpose is not None:
+        q = q.where(Run.purpose == f.purpose)
+    if f.created_after is not None:
+        q = q.where(Run.created_at >= f.created_after)
+    if f.created_before is not None:
+        q = q.where(Run.created_at < f.created_before)
+    if f.member_id is not None:
+        q = q.where(_MEMBER_ID == f.member_id)
+    if f.input_contains:
+        q = q.where(Run.input_payload.contains(f.input_contains))
+    if cursor is not None:
+        created_at, run_id = decode_cursor(cursor)
+        q = q.where(tuple_(Run.created_at, Run.id) < tuple_(created_at, run_id))
+
+    # One extra row tells us whether there is a next page without a COUNT
+    rows = list((await s.execute(q.order_by(Run.created_at.desc(), Run.id.desc()).limit(limit + 1))).scalars())
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
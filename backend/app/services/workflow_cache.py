@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from ..events.hub import EventHub, get_hub
+from ..utils.singleflight import SingleFlight
+from .run_cache import etag_for
+
+
+# What a workflow snapshot loader returns: the serialized body and whether
+# the workflow was still running when it was read
+Snapshot = tuple[bytes, bool]
+
+
+class WorkflowSnapshotCache:
+    # Last snapshot (status + queried state) per workflow with its ETag, kept
+    # in process. An event tagged with the workflow id drops its entry, so
+    # long-poll waiters compare `since` here instead of asking Temporal each
+    # time one arrives. Running workflows also expire after running_ttl_s:
+    # not every state change (an MFA signal) sends an event.
+    def __init__(self, hub: EventHub | None = None, size: int = 10_000, running_ttl_s: float = 5.0) -> None:
+        self.size = size
+        self.running_ttl_s = running_ttl_s
+        self._entries: OrderedDict[str, tuple[float | None, str, bytes]] = OrderedDict()
+        # Same epoch scheme as RunStatusCache: a load that started before the
+        # workflow's last event must not store its older snapshot
+        self._epoch = 0
+        self._touched: OrderedDict[str, int] = OrderedDict()
+        self._loads = SingleFlight()
+        if hub is not None:
+            hub.add_listener(self.on_event)
+
+    def peek(self, workflow_id: str) -> tuple[str, bytes] | None:
+        hit = self._entries.get(workflow_id)
+        if hit is None:
+            return None
+        expires, etag, body = hit
+        if expires is not None and expires < time.monotonic():
+            del self._entries[workflow_id]
+            return None
+        self._entries.move_to_end(workflow_id)
+        return etag, body
+
+    async def get_or_load(
+        self, workflow_id: str, load: Callable[[], Awaitable[Snapshot]], fresh: bool = False
+    ) -> tuple[str, bytes]:
+        if not fresh:
+            hit = self.peek(workflow_id)
+            if hit is not None:
+                return hit
+        flight = (workflow_id, self._touched.get(workflow_id), fresh)
+        return await self._loads.do(flight, lambda: self._load(workflow_id, load))
+
+    async def _load(self, workflow_id: str, load: Callable[[], Awaitable[Snapshot]]) -> tuple[str, bytes]:
+        epoch = self._epoch
+        body, running = await load()
+        etag = etag_for(body)
+        if self._touched.get(workflow_id, -1) <= epoch:
+            expires = time.monotonic() + self.running_ttl_s if running else None
+            self._entries[workflow_id] = (expires, etag, body)
+            self._entries.move_to_end(workflow_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def on_event(self, evt: dict) -> None:
+        workflow_id = (evt.get("payload") or {}).get("workflow_id")
+        if workflow_id:
+            self.invalidate(workflow_id)
+
+    def invalidate(self, workflow_id: str) -> None:
+        self._epoch += 1
+        self._touched[workflow_id] = self._epoch
+        self._touched.move_to_end(workflow_id)
+        while len(self._touched) > self.size:
+            self._touched.popitem(last=False)
+        self._entries.pop(workflow_id, None)
+
+
+_cache: WorkflowSnapshotCache | None = None
+
+
+def get_workflow_cache() -> WorkflowSnapshotCache:
+    global _cache
+    if _cache is None:
+        _cache = WorkflowSnapshotCache(get_hub())
+    return _cache
@@ -23,6 +23,80 @@ class Settings(BaseSettings):
     temporal_namespace: str = Field(default="default", alias="TEMPORAL_NAMESPACE")
     temporal_task_queue: str = Field(default="portal", alias="TEMPORAL_TASK_QUEUE")
 
+    events_stream: str = Field(default="events:stream", alias="EVENTS_STREAM")
+    events_stream_maxlen: int = Field(default=100_000, alias="EVENTS_STREAM_MAXLEN")
+    events_source: str = Field(default="streams", alias="EVENTS_SOURCE")  # streams|pubsub, feeds the SSE hub
+
+    emit_flush_interval_ms: float = Field(default=5.0, alias="EMIT_FLUSH_INTERVAL_MS")
+    emit_local_activity: bool = Field(default=True, alias="EMIT_LOCAL_ACTIVITY")
+
+    # Per-payer portal limits, e.g. {"availity": {"rate": 2, "burst": 5, "max_concurrency": 8}}
+    payer_limits: dict[str, dict[str, float]] = Field(default_factory=dict, alias="PAYER_LIMITS")
+    payer_default_rate: float = Field(default=1.0, alias="PAYER_DEFAULT_RATE")  # workflow starts/sec
+    payer_default_burst: float = Field(default=5.0, alias="PAYER_DEFAULT_BURST")
+    payer_lockout_cooldown_s: float = Field(default=300.0, alias="PAYER_LOCKOUT_COOLDOWN_S")
+
+    browser_pool_size: int = Field(default=0, alias="BROWSER_POOL_SIZE")  # 0 = enough for WORKER_BROWSER_SLOTS
+    browser_contexts_per_browser: int = Field(default=4, alias="BROWSER_CONTEXTS_PER_BROWSER")
+    browser_max_contexts: int = Field(default=200, alias="BROWSER_MAX_CONTEXTS")  # recycle after this many
+    browser_max_rss_mb: int = Field(default=1500, alias="BROWSER_MAX_RSS_MB")
+
+    # Worker supervisor: processes and slots per role (processes 0 = one per core)
+    worker_workflow_processes: int = Field(default=1, alias="WORKER_WORKFLOW_PROCESSES")
+    worker_browser_processes: int = Field(default=0, alias="WORKER_BROWSER_PROCESSES")
+    worker_io_processes: int = Field(default=1, alias="WORKER_IO_PROCESSES")
+    worker_workflow_slots: int = Field(default=200, alias="WORKER_WORKFLOW_SLOTS")  # workflow tasks
+    worker_browser_slots: int = Field(default=4, alias="WORKER_BROWSER_SLOTS")  # concurrent portal steps
+    worker_io_slots: int = Field(default=200, alias="WORKER_IO_SLOTS")
+    worker_metrics_port: int = Field(default=9100, alias="WORKER_METRICS_PORT")  # 0 disables
+
+    # Batch executor: claimed items are leased and go back to queued if not renewed
+    batch_lease_ttl_s: float = Field(default=300.0, alias="BATCH_LEASE_TTL_S")
+    # Ready batches are announced on their own small stream, read by the
+    # executors' consumer group, so they never scan the shared events stream
+    batch_wake_stream: str = Field(default="batches:wake", alias="BATCH_WAKE_STREAM")
+    batch_wake_stream_maxlen: int = Field(default=10_000, alias="BATCH_WAKE_STREAM_MAXLEN")
+
+    # BatchFlow (one workflow per batch, child PortalFlows)
+    batch_flow_window: int = Field(default=50, alias="BATCH_FLOW_WINDOW")
+    batch_flow_page_size: int = Field(default=100, alias="BATCH_FLOW_PAGE_SIZE")
+    batch_flow_continue_every: int = Field(default=2000, alias="BATCH_FLOW_CONTINUE_EVERY")
+
+    # runs partitions / cold payload archival (python -m backend.workers.archiver)
+    runs_archive_after_days: int = Field(default=90, alias="RUNS_ARCHIVE_AFTER_DAYS")
+    runs_archive_batch: int = Field(default=500, alias="RUNS_ARCHIVE_BATCH")
+    runs_archive_interval_s: float = Field(default=3600.0, alias="RUNS_ARCHIVE_INTERVAL_S")
+    runs_partitions_ahead: int = Field(default=3, alias="RUNS_PARTITIONS_AHEAD")  # months
+
+    # GET /runs/{id} status cache (Redis + per-process LRU, invalidated by run.* events)
+    run_cache_ttl_s: int = Field(default=300, alias="RUN_CACHE_TTL_S")
+    run_cache_lru_size: int = Field(default=10_000, alias="RUN_CACHE_LRU_SIZE")
+    run_cache_lru_ttl_s: float = Field(default=2.0, alias="RUN_CACHE_LRU_TTL_S")
+
+    # Eligibility result cache (per-payer TTL via PAYER_LIMITS "eligibility_ttl_s")
+    eligibility_cache_ttl_s: int = Field(default=3600, alias="ELIGIBILITY_CACHE_TTL_S")
+    eligibility_cache_swr_s: int = Field(default=900, alias="ELIGIBILITY_CACHE_SWR_S")  # serve stale while refreshing
+
+    session_encryption_key: str | None = Field(default=None, alias="SESSION_ENCRYPTION_KEY")  # base64, 32 bytes
+    session_ttl_s: int = Field(default=1800, alias="SESSION_TTL_S")
+    session_lock_ttl_s: int = Field(default=900, alias="SESSION_LOCK_TTL_S")
+    # Credential id used by batch runs per payer, e.g. {"availity": "svc-availity-1"}
+    payer_credentials: dict[str, str] = Field(default_factory=dict, alias="PAYER_CREDENTIALS")
+    # Flow YAML run for batch items, keyed "<payer_id>:<purpose>" or "<purpose>",
+    # e.g. {"eligibility": "flows/eligibility.yaml"}
+    batch_flows: dict[str, str] = Field(default_factory=dict, alias="BATCH_FLOWS")
+    # Logged-in probes, e.g. {"availity": {"url": "https://apps.availity.com/...", "selector": "#user-menu"}}
+    payer_session_probes: dict[str, dict[str, str]] = Field(default_factory=dict, alias="PAYER_SESSION_PROBES")
+
+    # Tracing: none|memory|file; sampling applies to new traces, children follow their parent
+    tracing_exporter: str = Field(default="none", alias="TRACING_EXPORTER")
+    tracing_sample_ratio: float = Field(default=1.0, alias="TRACING_SAMPLE_RATIO")
+    tracing_file: str = Field(default="traces.jsonl", alias="TRACING_FILE")
+
+    sse_queue_size: int = Field(default=256, alias="SSE_QUEUE_SIZE")
+    sse_slow_policy: str = Field(default="drop", alias="SSE_SLOW_POLICY")  # drop|disconnect
+    sse_heartbeat_s: float = Field(default=15.0, alias="SSE_HEARTBEAT_S")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
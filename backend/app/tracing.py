@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Sequence
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.propagate import extract, inject
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SimpleSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from .settings import get_settings
+
+
+# Tracing is off unless TRACING_EXPORTER is set. Trace context crosses
+# process boundaries three ways: W3C headers on HTTP, Temporal headers on
+# workflow/activity calls (TracingInterceptor), and the "trace" carrier on
+# event envelopes (Redis -> hub -> SSE).
+
+_provider: TracerProvider | None = None
+_memory: InMemorySpanExporter | None = None
+
+# Span attribute names shared by API and workers
+RUN_ID = "rcm.run_id"
+PAYER = "rcm.payer"
+FLOW = "rcm.flow"
+
+
+class FileSpanExporter(SpanExporter):
+    # One JSON object per line; processes sharing a file append whole lines
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(_span_record(s), separators=(",", ":")) + "\n" for s in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _span_record(span: ReadableSpan) -> dict[str, Any]:
+    ctx = span.get_span_context()
+    return {
+        "name": span.name,
+        "trace_id": format(ctx.trace_id, "032x"),
+        "span_id": format(ctx.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "start_ns": span.start_time,
+        "end_ns": span.end_time,
+        "service": span.resource.attributes.get("service.name"),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+def tracing_enabled() -> bool:
+    return _provider is not None
+
+
+def setup_tracing(service: str) -> None:
+    # Once per process, before clients/instrumentation are created
+    global _provider, _memory
+    s = get_settings()
+    if _provider is not None or s.tracing_exporter == "none":
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service, "process.pid": os.getpid()}),
+        # Follow the caller's decision so a trace is never half-recorded
+        sampler=ParentBased(TraceIdRatioBased(s.tracing_sample_ratio)),
+    )
+    if s.tracing_exporter == "memory":
+        _memory = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_memory))
+    elif s.tracing_exporter == "file":
+        provider.add_span_processor(BatchSpanProcessor(FileSpanExporter(s.tracing_file)))
+    else:
+        raise ValueError(f"unknown TRACING_EXPORTER {s.tracing_exporter!r} (none|memory|file)")
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+
+def shutdown_tracing() -> None:
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def finished_spans() -> list[ReadableSpan]:
+    # Spans recorded by the in-memory exporter (TRACING_EXPORTER=memory)
+    return list(_memory.get_finished_spans()) if _memory is not None else []
+
+
+def get_tracer() -> trace.Tracer:
+    return trace.get_tracer("rcm")
+
+
+def temporal_interceptors() -> list[Any]:
+    if not tracing_enabled():
+        return []
+    from temporalio.contrib.opentelemetry import TracingInterceptor
+
+    return [TracingInterceptor(get_tracer())]
+
+
+def instrument_app(app: Any) -> None:
+    if not tracing_enabled():
+        return
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    # The SSE stream would add a send span per frame; event delivery is
+    # traced by the hub instead
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="/events$,/metrics$,/healthz$")
+
+
+def annotate(run_id: str | None = None, payer: str | None = None, flow: str | None = None) -> None:
+    span = trace.get_current_span()
+    if not span.is_recording():
+        return
+    if run_id:
+        span.set_attribute(RUN_ID, str(run_id))
+    if payer:
+        span.set_attribute(PAYER, payer)
+    if flow:
+        span.set_attribute(FLOW, flow)
+
+
+def run_id_from_workflow_id(workflow_id: str) -> str | None:
+    # Batch and BatchFlow runs use "run-{run_id}" workflow ids
+    return workflow_id[4:] if workflow_id.startswith("run-") else None
+
+
+def current_carrier() -> dict[str, str] | None:
+    # W3C traceparent/tracestate for the active span, for event envelopes
+    if not tracing_enabled() or not trace.get_current_span().get_span_context().is_valid:
+        return None
+    carrier: dict[str, str] = {}
+    inject(carrier)
+    return carrier or None
+
+
+@contextmanager
+def span_from_carrier(name: str, carrier: dict[str, str] | None, **attrs: Any) -> Iterator[trace.Span | None]:
+    # Continues the envelope's trace; untraced events cost nothing
+    if not tracing_enabled() or not carrier:
+        yield None
+        return
+    token = otel_context.attach(extract(carrier))
+    try:
+        with get_tracer().start_as_current_span(name, attributes=attrs) as span:
+            yield span
+    finally:
+        otel_context.detach(token)
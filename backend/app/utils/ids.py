@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+def uuid7(ts: float | None = None) -> uuid.UUID:
+    # RFC 9562 UUIDv7: 48-bit unix ms timestamp, then random bits. Run ids are
+    # time-ordered, so a run's creation month (its partition) is known from
+    # the id alone.
+    ms = int((time.time() if ts is None else ts) * 1000) & ((1 << 48) - 1)
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (ms << 80) | (0x7 << 76) | ((rand >> 62) & 0xFFF) << 64 | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(u: uuid.UUID) -> datetime | None:
+    # None for ids minted before UUIDv7 (random v4)
+    if u.version != 7:
+        return None
+    return datetime.fromtimestamp((u.int >> 80) / 1000, tz=timezone.utc)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+
+import redis.asyncio as aioredis
+
+
+# Token bucket shared by every process through one Redis hash per key. Uses the
+# Redis clock so hosts with skewed clocks still agree. Returns the seconds to
+# wait before a token is available (0 when one was taken); a live cooldown key
+# blocks the bucket entirely.
+_TOKEN_BUCKET_LUA = """
+local cooldown = redis.call('PTTL', KEYS[2])
+if cooldown > 0 then
+  return tostring(cooldown / 1000)
+end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    def __init__(self, redis: aioredis.Redis, name: str, rate: float, burst: float) -> None:
+        self.redis = redis
+        self.key = f"ratelimit:{name}"
+        self.cooldown_key = f"ratelimit:{name}:cooldown"
+        self.rate = rate
+        self.burst = burst
+        self._script = redis.register_script(_TOKEN_BUCKET_LUA)
+
+    async def try_acquire(self) -> float:
+        wait = await self._script(keys=[self.key, self.cooldown_key], args=[self.rate, self.burst])
+        return float(wait)
+
+    async def acquire(self) -> None:
+        while True:
+            wait = await self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def cooldown(self, seconds: float) -> None:
+        # Pause this bucket for every process, e.g. after a portal lockout
+        await self.redis.set(self.cooldown_key, 1, px=int(seconds * 1000))
+
+
+class AIMDLimiter:
+    # Additive-increase / multiplicative-decrease concurrency limit: grows by
+    # about one slot per limit's worth of healthy completions, halves on
+    # errors or lockouts, backs off gently when latency exceeds the target.
+    def __init__(
+        self,
+        initial: float = 2,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        latency_target_s: float = 60.0,
+        decrease: float = 0.5,
+        slow_decrease: float = 0.9,
+    ) -> None:
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_s = latency_target_s
+        self.decrease = decrease
+        self.slow_decrease = slow_decrease
+        self.inflight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    async def release(self, latency_s: float, ok: bool, lockout: bool = False) -> None:
+        async with self._cond:
+            self.inflight -= 1
+            if lockout or not ok:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            elif latency_s > self.latency_target_s:
+                self.limit = max(self.min_limit, self.limit * self.slow_decrease)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    async def cancel(self) -> None:
+        # Give back a slot whose work never started; the limit is unchanged
+        async with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+
+class RateMeter:
+    # Completions per second over a sliding window
+    def __init__(self, window_s: float = 60.0) -> None:
+        self.window_s = window_s
+        self._ts: deque[float] = deque()
+
+    def mark(self) -> None:
+        self._ts.append(time.monotonic())
+
+    def rate(self) -> float:
+        cutoff = time.monotonic() - self.window_s
+        while self._ts and self._ts[0] < cutoff:
+            self._ts.popleft()
+        return len(self._ts) / self.window_s
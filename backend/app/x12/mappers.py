@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+from itertools import islice
+from typing import Any, Iterator, Union
+
+from ..schemas.claim_status import ClaimStatusResponse
+from ..schemas.eligibility import EligibilityResponse
+from .tokenizer import Buffer, Segment, Transaction, iter_transactions
+
+
+# Streaming 271/277 -> response schema mapping. Each transaction set is
+# walked once, segment by segment, and a response is emitted as soon as its
+# subscriber/dependent (271) or claim (277) loop ends, so memory stays at one
+# transaction set regardless of interchange size.
+
+Response = Union[EligibilityResponse, ClaimStatusResponse]
+
+SUPPORTED = frozenset({"271", "277"})
+
+# HL03 hierarchical level codes
+_SUBSCRIBER, _DEPENDENT = "22", "23"
+
+# EB01 eligibility/benefit codes
+_ACTIVE = {"1", "2", "3", "4", "5"}
+_INACTIVE = {"6", "7", "8"}
+_COINSURANCE, _COPAY, _DEDUCTIBLE, _OUT_OF_POCKET = "A", "B", "C", "G"
+
+# EB06 time period qualifiers used for deductible/out-of-pocket buckets
+_PERIODS = {
+    "6": "hour",
+    "7": "day",
+    "21": "years",
+    "22": "service_year",
+    "23": "calendar_year",
+    "24": "year_to_date",
+    "25": "contract",
+    "26": "episode",
+    "27": "visit",
+    "29": "remaining",
+    "32": "lifetime",
+    "33": "lifetime_remaining",
+}
+
+_REFS_271 = {"6P": "group_number", "18": "plan_number", "1L": "group_policy_number", "IG": "policy_number"}
+
+# STC01-1 claim status category -> ClaimStatusResponse.status
+_CATEGORY_STATUS = {
+    "A": "acknowledged",
+    "P": "pending",
+    "R": "information_requested",
+    "E": "error",
+    "D": "not_found",
+    "F": "finalized",
+}
+_FINALIZED_STATUS = {"F1": "paid", "F2": "denied"}
+_DENIAL_CATEGORIES = {"F2"}
+
+
+def x12_date(fmt: str, value: str) -> str | None:
+    # D8 CCYYMMDD -> YYYY-MM-DD; RD8 ranges -> ISO interval
+    if not value:
+        return None
+    if fmt == "RD8" and "-" in value:
+        start, _, end = value.partition("-")
+        return f"{x12_date('D8', start)}/{x12_date('D8', end)}"
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def x12_datetime(date: str, time: str) -> str:
+    day = x12_date("D8", date) or ""
+    if len(time) >= 4 and time[:4].isdigit():
+        return f"{day}T{time[:2]}:{time[2:4]}:{time[4:6] or '00'}"
+    return day
+
+
+def _amount(value: str) -> float | None:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _as_of(tx: Transaction, bht: Segment | None) -> str:
+    if bht is not None and bht[4]:
+        return x12_datetime(bht[4], bht[5])
+    return x12_datetime(tx.date, tx.time)
+
+
+class _Member:
+    # Accumulates one 2000C/2000D loop of a 271
+    __slots__ = ("member_id", "trace", "plan_name", "coverage", "copay", "deductible", "seen_benefit")
+
+    def __init__(self, member_id: str) -> None:
+        self.member_id = member_id
+        self.trace: str | None = None
+        self.plan_name: str | None = None
+        self.coverage: dict[str, Any] = {}
+        self.copay: dict[str, Any] | None = None
+        self.deductible: dict[str, Any] | None = None
+        self.seen_benefit = False
+
+    def benefit(self, eb: Segment) -> None:
+        self.seen_benefit = True
+        code = eb[1]
+        service_types = eb.repeats(3)
+        if code in _ACTIVE or code in _INACTIVE:
+            if "active" not in self.coverage:
+                self.coverage["active"] = code in _ACTIVE
+                self.coverage["status_code"] = code
+                if eb[4]:
+                    self.coverage["insurance_type"] = eb[4]
+            if service_types:
+                self.coverage.setdefault("service_types", []).extend(service_types)
+            if eb[5] and self.plan_name is None:
+                self.plan_name = eb[5]
+            return
+        amount = _amount(eb[7])
+        in_network = {"Y": True, "N": False}.get(eb[12])
+        if code == _COPAY and amount is not None:
+            self.copay = self.copay or {}
+            for stc in service_types or ["30"]:  # 30 = health benefit plan coverage
+                self.copay.setdefault(stc, {"amount": amount, "in_network": in_network})
+        elif code in (_DEDUCTIBLE, _OUT_OF_POCKET) and amount is not None:
+            level = eb[2] or "IND"
+            period = _PERIODS.get(eb[6], eb[6] or "total")
+            if code == _DEDUCTIBLE:
+                self.deductible = self.deductible or {}
+                self.deductible.setdefault(level, {}).setdefault(period, amount)
+            else:
+                self.coverage.setdefault("out_of_pocket", {}).setdefault(level, {}).setdefault(period, amount)
+        elif code == _COINSURANCE and eb[8]:
+            percent = _amount(eb[8])
+            for stc in service_types or ["30"]:
+                self.coverage.setdefault("coinsurance", {}).setdefault(stc, percent)
+
+
+def map_271(tx: Transaction) -> Iterator[EligibilityResponse]:
+    bht: Segment | None = None
+    payer = ""
+    level = ""
+    subscriber_id = ""
+    errors: list[dict[str, str]] = []  # payer/receiver-level AAA, shared by every member
+    member: _Member | None = None
+
+    def emit(m: _Member) -> EligibilityResponse:
+        if errors:
+            m.coverage.setdefault("errors", []).extend(errors)
+        return EligibilityResponse.model_construct(
+            correlation_id=m.trace or (bht[3] if bht is not None else "") or tx.control,
+            member_id=m.member_id,
+            payer=payer,
+            plan_name=m.plan_name,
+            coverage=m.coverage,
+            copay=m.copay,
+            deductible=m.deductible,
+            as_of=_as_of(tx, bht),
+            source="271",
+            trace_id=tx.trace_id,
+        )
+
+    for seg in tx.segments:
+        tag = seg.tag
+        if tag == "EB":
+            if member is not None:
+                member.benefit(seg)
+        elif tag == "HL":
+            if member is not None:
+                yield emit(member)
+                member = None
+            level = seg[3]
+            if level in (_SUBSCRIBER, _DEPENDENT):
+                member = _Member(subscriber_id if level == _DEPENDENT else "")
+        elif tag == "NM1":
+            entity = seg[1]
+            if entity == "PR":
+                payer = seg[9] or seg[3]
+            elif member is not None and entity in ("IL", "03") and seg[9]:
+                member.member_id = seg[9]
+                if level == _SUBSCRIBER:
+                    subscriber_id = seg[9]
+        elif tag == "TRN":
+            # TRN01 2 = the requester's trace echoed back; prefer it
+            if member is not None and (member.trace is None or seg[1] == "2"):
+                member.trace = seg[2]
+        elif tag == "DTP":
+            if member is not None and not member.seen_benefit:
+                member.coverage.setdefault("dates", {})[seg[1]] = x12_date(seg[2], seg[3])
+        elif tag == "REF":
+            name = _REFS_271.get(seg[1])
+            if member is not None and name and not member.seen_benefit:
+                member.coverage[name] = seg[2]
+        elif tag == "AAA":
+            err = {"reject_reason": seg[3], "follow_up": seg[4]}
+            if member is not None:
+                member.coverage.setdefault("errors", []).append(err)
+            else:
+                errors.append(err)
+        elif tag == "BHT":
+            bht = seg
+    if member is not None:
+        yield emit(member)
+
+
+class _Claim:
+    # Accumulates one 2200D/2200E loop (and its 2220 service lines) of a 277
+    __slots__ = ("trace", "status", "paid_amount", "denials", "last_update", "line")
+
+    def __init__(self, trace: str) -> None:
+        self.trace = trace
+        self.status: str | None = None
+        self.paid_amount: float | None = None
+        self.denials: list[dict[str, Any]] = []
+        self.last_update: str | None = None
+        self.line: str | None = None  # SVC01 procedure while inside a service line
+
+    def status_info(self, stc: Segment) -> None:
+        effective = x12_date("D8", stc[2])
+        if effective and (self.last_update is None or effective > self.last_update):
+            self.last_update = effective
+        # STC01, STC10 and STC11 each carry category:status[:entity]
+        for pos in (1, 10, 11):
+            parts = stc.components(pos) if stc[pos] else []
+            if not parts or not parts[0]:
+                continue
+            category = parts[0]
+            if self.line is None and self.status is None:
+                self.status = _FINALIZED_STATUS.get(category) or _CATEGORY_STATUS.get(category[:1], category.lower())
+            if category in _DENIAL_CATEGORIES:
+                self.denials.append(
+                    {
+                        "category": category,
+                        "status_code": parts[1] if len(parts) > 1 else None,
+                        "entity": parts[2] if len(parts) > 2 else None,
+                        "date": effective,
+                        "message": stc[12] or None,
+                        "line": self.line,
+                    }
+                )
+        if self.line is None and self.paid_amount is None:
+            self.paid_amount = _amount(stc[5])
+
+
+def map_277(tx: Transaction) -> Iterator[ClaimStatusResponse]:
+    claim: _Claim | None = None
+    level = ""
+
+    def emit(c: _Claim) -> ClaimStatusResponse:
+        return ClaimStatusResponse.model_construct(
+            correlation_id=c.trace or tx.control,
+            status=c.status or "unknown",
+            paid_amount=c.paid_amount,
+            denials=c.denials or None,
+            last_update=c.last_update,
+            source="277",
+            trace_id=tx.trace_id,
+        )
+
+    for seg in tx.segments:
+        tag = seg.tag
+        if tag == "STC":
+            if claim is not None:
+                claim.status_info(seg)
+        elif tag == "SVC":
+            if claim is not None:
+                procedure = seg.components(1)  # e.g. HC:99213
+                claim.line = procedure[1] if len(procedure) > 1 else procedure[0]
+        elif tag == "TRN":
+            # Claim tracking numbers live under the subscriber/dependent
+            # levels; each one starts a claim
+            if level in (_SUBSCRIBER, _DEPENDENT):
+                if claim is not None:
+                    yield emit(claim)
+                claim = _Claim(seg[2])
+        elif tag in ("HL", "SE"):
+            if claim is not None:
+                yield emit(claim)
+                claim = None
+            if tag == "HL":
+                level = seg[3]
+    if claim is not None:
+        yield emit(claim)
+
+
+_MAPPERS = {"271": map_271, "277": map_277}
+
+
+def map_transaction(tx: Transaction) -> Iterator[Response]:
+    mapper = _MAPPERS.get(tx.code)
+    if mapper is not None:
+        yield from mapper(tx)
+
+
+def parse_responses(data: Buffer, codes: frozenset[str] = SUPPORTED) -> Iterator[Response]:
+    # One response per subscriber/dependent (271) or claim (277), in file order
+    for tx in iter_transactions(data, codes=set(codes)):
+        yield from map_transaction(tx)
+
+
+def iter_response_batches(data: Buffer, size: int = 500) -> Iterator[list[Response]]:
+    # Fixed-size batches for bulk writes; only one batch is held at a time
+    responses = parse_responses(data)
+    while batch := list(islice(responses, size)):
+        yield batch
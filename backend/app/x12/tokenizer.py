@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import mmap
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, Union
+
+
+# Anything exposing the buffer protocol as bytes: file contents, an mmap of
+# a multi-megabyte interchange, or a memoryview into either. Segments are
+# views into it; only the segments a mapper reads are copied.
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+_ISA_LEN = 106  # fixed-width header, through the segment terminator
+_WHITESPACE = b" \t\r\n"
+_I = ord("I")
+
+# Segment ids repeat constantly; decode each distinct one once
+_TAGS: dict[bytes, str] = {}
+
+
+class X12Error(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Delimiters:
+    element: int
+    component: int
+    segment: int
+    repetition: int | None = None  # 5010+ (ISA11); earlier versions have none
+
+
+def detect_delimiters(buf: Buffer, start: int = 0) -> tuple[Delimiters, int]:
+    # ISA is fixed width: the byte after "ISA" is the element separator,
+    # ISA16 (one byte) the component separator and the byte after it the
+    # segment terminator. Returns the delimiters and the ISA offset.
+    view = memoryview(buf)
+    pos = start
+    while pos < len(view) and view[pos] in _WHITESPACE:
+        pos += 1
+    if pos == 0 and bytes(view[:3]) == b"\xef\xbb\xbf":
+        pos = 3  # UTF-8 BOM from some clearinghouse exports
+    if bytes(view[pos : pos + 3]) != b"ISA" or len(view) < pos + _ISA_LEN:
+        raise X12Error(f"no ISA header at offset {pos}")
+    header = bytes(view[pos : pos + _ISA_LEN])
+    element = header[3]
+    seps = [i for i, b in enumerate(header) if b == element]
+    if len(seps) < 16:
+        raise X12Error("ISA header has fewer than 16 elements")
+    component = header[seps[15] + 1]
+    segment = header[seps[15] + 2]
+    version = header[seps[11] + 1 : seps[12]]
+    repetition = header[seps[10] + 1] if version >= b"00501" else None
+    if len({element, component, segment}) != 3:
+        raise X12Error("ISA delimiters are not distinct")
+    return Delimiters(element, component, segment, repetition), pos
+
+
+class Segment:
+    # One segment as offsets into the interchange buffer. The tag is read on
+    # creation; elements are split (and decoded) only when a mapper asks.
+    __slots__ = ("buf", "start", "end", "delims", "tag", "_elements")
+
+    def __init__(self, buf: Buffer, start: int, end: int, delims: Delimiters, tag: str) -> None:
+        self.buf = buf
+        self.start = start
+        self.end = end
+        self.delims = delims
+        self.tag = tag
+        self._elements: list[str] | None = None
+
+    def raw(self) -> bytes:
+        return bytes(self.buf[self.start : self.end])
+
+    def elements(self) -> list[str]:
+        # The one copy of this segment's bytes, decoded and split once
+        if self._elements is None:
+            self._elements = self.raw().decode("latin-1").split(chr(self.delims.element))
+        return self._elements
+
+    def __getitem__(self, i: int) -> str:
+        # X12 positions: seg[1] is the first element after the tag; missing
+        # trailing elements read as ""
+        els = self.elements()
+        return els[i] if i < len(els) else ""
+
+    def components(self, i: int) -> list[str]:
+        return self[i].split(chr(self.delims.component))
+
+    def repeats(self, i: int) -> list[str]:
+        value = self[i]
+        if self.delims.repetition is None or not value:
+            return [value] if value else []
+        return value.split(chr(self.delims.repetition))
+
+    def __repr__(self) -> str:
+        return f"Segment({self.raw().decode('latin-1')!r})"
+
+
+def _finder(buf: Buffer, terminator: int):
+    # bytes, bytearray and mmap search in place; a bare memoryview has no
+    # find(), so it goes through a (equally C-level) compiled regex
+    if hasattr(buf, "find"):
+        sep = bytes((terminator,))
+        return lambda pos: buf.find(sep, pos)
+    search = re.compile(re.escape(bytes((terminator,)))).search
+
+    def find(pos: int) -> int:
+        m = search(buf, pos)
+        return m.start() if m is not None else -1
+
+    return find
+
+
+def iter_segments(data: Buffer) -> Iterator[Segment]:
+    # Lazily walks the buffer one terminator at a time (no whole-file split
+    # or decode). Concatenated interchanges may use different delimiters;
+    # each ISA re-detects them.
+    buf: Buffer = data
+    if isinstance(data, memoryview) and data.format != "B":
+        buf = data.cast("B")
+    size = len(buf)
+    delims, pos = detect_delimiters(buf)
+    find = _finder(buf, delims.segment)
+    element = delims.element
+    tags = _TAGS
+    while pos < size:
+        while pos < size and buf[pos] in _WHITESPACE and buf[pos] != delims.segment:
+            pos += 1
+        if pos >= size:
+            return
+        if buf[pos] == _I and bytes(buf[pos : pos + 3]) == b"ISA":
+            found, pos = detect_delimiters(buf, pos)
+            if found != delims:
+                delims, element = found, found.element
+                find = _finder(buf, delims.segment)
+        end = find(pos)
+        if end < 0:
+            end = size
+        if end > pos:
+            # Segment ids are two or three characters
+            raw_tag = bytes(buf[pos : pos + 2 if end - pos > 2 and buf[pos + 2] == element else pos + 3])
+            tag = tags.get(raw_tag)
+            if tag is None:
+                tag = tags.setdefault(raw_tag, raw_tag.decode("ascii", "replace"))
+            yield Segment(buf, pos, end, delims, tag)
+        pos = end + 1
+
+
+@dataclass
+class Transaction:
+    # One ST..SE set with its envelope ids; holds only its own segments
+    code: str  # ST01, e.g. "271"
+    control: str  # ST02
+    interchange: str  # ISA13
+    group: str  # GS06
+    sender: str  # ISA06
+    date: str  # GS04 CCYYMMDD
+    time: str  # GS05 HHMM[SS]
+    segments: list[Segment] = field(default_factory=list)
+
+    @property
+    def trace_id(self) -> str:
+        return f"{self.interchange}-{self.group}-{self.control}"
+
+
+def iter_transactions(data: Buffer, codes: set[str] | None = None) -> Iterator[Transaction]:
+    # Groups segments into transaction sets as the buffer is read. Sets whose
+    # code is not in `codes` are skipped without splitting their segments.
+    isa: Segment | None = None
+    gs: Segment | None = None
+    tx: Transaction | None = None
+    skipping = False
+    for seg in iter_segments(data):
+        tag = seg.tag
+        if tx is not None:
+            tx.segments.append(seg)
+            if tag == "SE":
+                yield tx
+                tx = None
+            continue
+        if skipping:
+            skipping = tag != "SE"
+            continue
+        if tag == "ST":
+            if isa is None or gs is None:
+                raise X12Error("ST outside of an ISA/GS envelope")
+            code = seg[1]
+            if codes is not None and code not in codes:
+                skipping = True
+                continue
+            tx = Transaction(code, seg[2], isa[13].strip(), gs[6], isa[6].strip(), gs[4], gs[5], [seg])
+        elif tag == "ISA":
+            isa, gs = seg, None
+        elif tag == "GS":
+            gs = seg
+        elif tag in ("GE", "IEA"):
+            if tag == "IEA":
+                isa = None
+            gs = None
+    if tx is not None:
+        raise X12Error(f"transaction {tx.control} has no SE")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+# Workflows started per second: N client-side PortalFlow starts (what the
+# batch executor does per row) vs. one BatchFlow fanning out N children.
+# PortalFlow and the batch activities are replaced by no-op stand-ins, so
+# this measures Temporal start/complete throughput only (no DB, no browser).
+# Usage: python -m backend.bench.batch_starts -n 2000 [--target localhost:7233]
+# Without --target a local dev server is started (downloaded on first use).
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from typing import Any
+
+from temporalio import activity, workflow
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from ..workflows.batch import BatchFlow, BatchParams
+from ..workflows.queues import IO, queue_name
+
+
+@workflow.defn(name="PortalFlow")
+class StubPortalFlow:
+    @workflow.run
+    async def run(
+        self,
+        flow_id: str,
+        flow_hash: str | None = None,
+        local_emit: bool = True,
+        payer_id: str | None = None,
+        credential_id: str | None = None,
+    ) -> dict:
+        return {"flow_id": flow_id, "status": "ok"}
+
+
+class StubItems:
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.next = 0
+
+    @activity.defn(name="get_batch_info")
+    async def get_batch_info(self, batch_id: str) -> dict[str, Any]:
+        return {"purpose": "eligibility", "valid_rows": self.total}
+
+    @activity.defn(name="claim_batch_page")
+    async def claim_batch_page(self, batch_id: str, purpose: str, limit: int) -> list[dict[str, Any]]:
+        n = min(limit, self.total - self.next)
+        page = [
+            {
+                "batch_id": batch_id,
+                "row_num": self.next + i,
+                "payer_id": "bench",
+                "run_id": str(uuid.uuid4()),
+                "credential_id": None,
+                "local_emit": True,
+            }
+            for i in range(n)
+        ]
+        self.next += n
+        return page
+
+    @activity.defn(name="record_batch_item")
+    async def record_batch_item(self, item: dict[str, Any], output: dict | None, error: str | None) -> None:
+        return None
+
+
+async def _per_row(client: Client, queue: str, n: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with sem:
+            await client.execute_workflow(
+                StubPortalFlow.run,
+                args=[f"bench:{i}", None, True, None, None],
+                id=f"bench-row-{uuid.uuid4()}",
+                task_queue=queue,
+                run_timeout=timedelta(minutes=5),
+            )
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - t0
+
+
+async def _batch_flow(client: Client, queue: str, n: int, window: int, continue_every: int) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    progress = await client.execute_workflow(
+        BatchFlow.run,
+        BatchParams(batch_id=str(uuid.uuid4()), window=window, page_size=min(window * 2, 500), continue_every=continue_every),
+        id=f"bench-batch-{uuid.uuid4()}",
+        task_queue=queue,
+    )
+    return time.perf_counter() - t0, progress.generations
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=50, help="in-flight per-row starts")
+    ap.add_argument("--window", type=int, default=50, help="BatchFlow child window")
+    ap.add_argument("--continue-every", type=int, default=1000)
+    ap.add_argument("--target", default=None, help="existing Temporal frontend (host:port)")
+    args = ap.parse_args()
+
+    env = None
+    if args.target:
+        client = await Client.connect(args.target)
+    else:
+        env = await WorkflowEnvironment.start_local()
+        client = env.client
+
+    queue = f"bench-{uuid.uuid4().hex[:8]}"
+    stubs = StubItems(args.n)
+    try:
+        async with Worker(
+            client,
+            task_queue=queue,
+            workflows=[StubPortalFlow, BatchFlow],
+            max_concurrent_workflow_tasks=200,
+        ), Worker(
+            client,
+            task_queue=queue_name(queue, IO),
+            activities=[stubs.get_batch_info, stubs.claim_batch_page, stubs.record_batch_item],
+        ):
+            per_row = await _per_row(client, queue, args.n, args.concurrency)
+            batch, generations = await _batch_flow(client, queue, args.n, args.window, args.continue_every)
+    finally:
+        if env is not None:
+            await env.shutdown()
+
+    print(f"per-row:   {args.n} workflows in {per_row:.2f}s ({args.n / per_row:.0f}/s, concurrency {args.concurrency})")
+    print(
+        f"BatchFlow: {args.n} children in {batch:.2f}s ({args.n / batch:.0f}/s, window {args.window},"
+        f" {generations} runs via continue_as_new)"
+    )
+    print(f"ratio: {per_row / batch:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+# Compare N single POST /runs calls against one POST /runs:bulk.
+# Usage: python -m backend.bench.bulk_runs --url http://localhost:8000 -n 500
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+def _bodies(n: int, tag: str) -> list[dict]:
+    return [
+        {
+            "purpose": "eligibility",
+            "payer_id": "bench",
+            "provider_npi": "1234567890",
+            "input": {"member_id": f"{tag}-{i}", "service_date": "2024-01-01"},
+        }
+        for i in range(n)
+    ]
+
+
+async def _singles(client: httpx.AsyncClient, bodies: list[dict], concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(body: dict) -> None:
+        async with sem:
+            r = await client.post("/runs", json=body)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(b) for b in bodies))
+    return time.perf_counter() - t0
+
+
+async def _bulk(client: httpx.AsyncClient, bodies: list[dict], chunk: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(0, len(bodies), chunk):
+        r = await client.post("/runs:bulk", json=bodies[i : i + chunk])
+        r.raise_for_status()
+    return time.perf_counter() - t0
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("-n", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--chunk", type=int, default=500)
+    args = ap.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        single = await _singles(client, _bodies(args.n, f"s-{tag}"), args.concurrency)
+        bulk = await _bulk(client, _bodies(args.n, f"b-{tag}"), args.chunk)
+
+    print(f"single: {args.n} runs in {single:.3f}s ({args.n / single:.0f} runs/s)")
+    print(f"bulk:   {args.n} runs in {bulk:.3f}s ({args.n / bulk:.0f} runs/s)")
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+# Dedupe ratio and bytes saved for a directory of DOM snapshots / HAR files,
+# stored in memory (nothing is uploaded).
+# Usage: python -m backend.bench.cas_dedupe path/to/snapshots [--train]
+
+import argparse
+import pathlib
+import time
+import zlib
+
+from ..app.artifacts.cas import ChunkStore, MemoryStore, StoreStats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path")
+    ap.add_argument("--glob", default="**/*")
+    ap.add_argument("--train", action="store_true", help="train a zstd dictionary on the first 100 files")
+    args = ap.parse_args()
+
+    files = sorted(p for p in pathlib.Path(args.path).glob(args.glob) if p.is_file())
+    if not files:
+        raise SystemExit("no files found")
+    store = ChunkStore(MemoryStore())
+    dict_key = store.train_dictionary("bench", [p.read_bytes() for p in files[:100]]) if args.train else None
+
+    total = StoreStats()
+    gzip_bytes = 0
+    t0 = time.perf_counter()
+    for p in files:
+        data = p.read_bytes()
+        _, stats = store.put(p.name, data, dict_key=dict_key)
+        total.add(stats)
+        gzip_bytes += len(zlib.compress(data, 6))
+    elapsed = time.perf_counter() - t0
+
+    mb = total.logical_bytes / 1e6
+    print(f"files:            {len(files)}")
+    print(f"logical:          {mb:.1f} MB ({mb / elapsed:.1f} MB/s)")
+    print(f"chunks:           {total.chunks} ({total.new_chunks} unique)")
+    print(f"dedupe ratio:     {total.dedupe_ratio:.2f}x")
+    print(f"stored (zstd):    {total.new_stored_bytes / 1e6:.2f} MB")
+    print(f"per-file gzip:    {gzip_bytes / 1e6:.2f} MB")
+    print(f"bytes saved:      {total.bytes_saved / 1e6:.2f} MB ({100 * total.bytes_saved / total.logical_bytes:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+# Per-event latency and Redis connections/sec: per-call client vs pooled,
+# buffered emitter. Needs a reachable Redis (REDIS_URL).
+# Usage: python -m backend.bench.emit_events -n 2000 --concurrency 50
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import redis.asyncio as aioredis
+
+from ..app.events.bus import EventBus
+from ..app.events.emitter import BufferedEmitter
+from ..app.settings import get_settings
+
+
+async def _connections(r: aioredis.Redis) -> int:
+    info = await r.info("stats")
+    return int(info["total_connections_received"])
+
+
+async def _per_call(url: str, event: dict) -> None:
+    # Previous emit_event behaviour: new client per event
+    r = aioredis.from_url(url)
+    try:
+        await r.publish("events", json.dumps(event))
+    finally:
+        await r.close()
+
+
+async def _measure(name: str, emit, n: int, concurrency: int, probe: aioredis.Redis) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            await emit({"type": "bench", "payload": {"i": i}})
+            latencies.append(time.perf_counter() - t0)
+
+    c0 = await _connections(probe)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - t0
+    conns = await _connections(probe) - c0
+
+    latencies.sort()
+    p50 = 1000 * statistics.median(latencies)
+    p99 = 1000 * latencies[int(0.99 * (len(latencies) - 1))]
+    print(f"{name:>9}: {n / elapsed:8.0f} events/s  p50 {p50:6.2f}ms  p99 {p99:6.2f}ms  {conns / elapsed:8.1f} conn/s")
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    args = ap.parse_args()
+
+    url = get_settings().redis_url
+    probe = aioredis.from_url(url)
+    await _measure("per-call", lambda e: _per_call(url, e), args.n, args.concurrency, probe)
+
+    emitter = BufferedEmitter(EventBus(url))
+    await _measure("buffered", emitter.emit, args.n, args.concurrency, probe)
+    print(f"buffered emitter: {emitter.stats()}")
+    await emitter.close()
+    await emitter.bus.close()
+    await probe.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
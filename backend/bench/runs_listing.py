@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+# Seed the runs table (default 10M rows) and time GET /runs query shapes:
+# first page and deep keyset pages per filter, against OFFSET for comparison.
+# Usage: python -m backend.bench.runs_listing --rows 10000000 [--skip-seed]
+# Run against a scratch database migrated to head; seeding is additive.
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+from ..app.db import session_scope
+from ..app.models import RunStatus
+from ..app.services.runs import RunFilters, list_runs
+
+
+PAYERS = 50
+SEED_CHUNK = 1_000_000
+
+# Server-side generation: ~15% of runs are recent, the rest spread over a year
+_SEED_SQL = text(
+    """
+    INSERT INTO runs (id, purpose, payer_id, provider_npi, status, source, input_payload, output_payload, created_at, updated_at)
+    SELECT
+        gen_random_uuid(),
+        CASE WHEN g % 3 = 0 THEN 'claim_status' ELSE 'eligibility' END,
+        'payer-' || (g % :payers),
+        '1234567890',
+        (ARRAY['queued','running','succeeded','succeeded','succeeded','failed'])[1 + g % 6]::runstatus,
+        'portal',
+        jsonb_build_object('member_id', 'M' || g, 'claim_id', 'C' || (g / 3), 'service_date', '2024-01-01'),
+        CASE WHEN g % 6 BETWEEN 2 AND 4 THEN jsonb_build_object('plan_name', 'PPO', 'active', true) END,
+        now() - (random() * CASE WHEN g % 7 = 0 THEN interval '1 day' ELSE interval '365 days' END),
+        now()
+    FROM generate_series(:start, :stop) AS g
+    """
+)
+
+
+async def seed(rows: int) -> None:
+    for start in range(0, rows, SEED_CHUNK):
+        stop = min(start + SEED_CHUNK, rows) - 1
+        t0 = time.perf_counter()
+        async with session_scope() as s:
+            await s.execute(_SEED_SQL, {"start": start, "stop": stop, "payers": PAYERS})
+        print(f"seeded {stop + 1:>10} rows ({SEED_CHUNK / (time.perf_counter() - t0):,.0f} rows/s)", flush=True)
+    async with session_scope() as s:
+        await s.execute(text("ANALYZE runs"))
+
+
+async def _time_pages(f: RunFilters, pages: int, limit: int) -> tuple[float, float, int]:
+    # Returns (first page ms, median deep page ms, rows seen)
+    cursor = None
+    timings: list[float] = []
+    seen = 0
+    for _ in range(pages):
+        t0 = time.perf_counter()
+        async with session_scope() as s:
+            runs, cursor = await list_runs(s, f, limit, cursor)
+        timings.append((time.perf_counter() - t0) * 1000)
+        seen += len(runs)
+        if cursor is None:
+            break
+    return timings[0], statistics.median(timings[len(timings) // 2 :]), seen
+
+
+async def _time_offset(where: str, params: dict, offset: int, limit: int) -> float:
+    sql = text(f"SELECT * FROM runs {where} ORDER BY created_at DESC, id DESC OFFSET :offset LIMIT :limit")
+    t0 = time.perf_counter()
+    async with session_scope() as s:
+        (await s.execute(sql, {**params, "offset": offset, "limit": limit})).all()
+    return (time.perf_counter() - t0) * 1000
+
+
+async def _plan(where: str, params: dict, limit: int) -> str:
+    sql = text(f"EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM runs {where} ORDER BY created_at DESC, id DESC LIMIT {limit}")
+    async with session_scope() as s:
+        lines = [r[0] for r in (await s.execute(sql, params)).all()]
+    scans = [ln.strip() for ln in lines if "Scan" in ln]
+    return scans[0] if scans else lines[0]
+
+
+CASES: list[tuple[str, RunFilters, str, dict]] = [
+    ("all", RunFilters(), "", {}),
+    ("payer+status", RunFilters(status=RunStatus.failed, payer_id="payer-7"), "WHERE payer_id = :p AND status = 'failed'", {"p": "payer-7"}),
+    ("status", RunFilters(status=RunStatus.running), "WHERE status = 'running'", {}),
+    ("purpose", RunFilters(purpose="claim_status"), "WHERE purpose = 'claim_status'", {}),
+    ("member_id", RunFilters(member_id="M4242"), "WHERE input_payload ->> 'member_id' = :m", {"m": "M4242"}),
+    ("claim_id @>", RunFilters(input_contains={"claim_id": "C1414"}), "WHERE input_payload @> '{\"claim_id\": \"C1414\"}'", {}),
+]
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--skip-seed", action="store_true")
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args()
+
+    if not args.skip_seed:
+        await seed(args.rows)
+
+    deep = args.pages * args.limit
+    print(f"{'case':<14} {'first ms':>9} {'keyset ms':>10} {'offset ms':>10}  plan")
+    for name, f, where, params in CASES:
+        first, keyset, _ = await _time_pages(f, args.pages, args.limit)
+        offset = await _time_offset(where, params, deep, args.limit)
+        plan = await _plan(where, params, args.limit)
+        print(f"{name:<14} {first:>9.1f} {keyset:>10.1f} {offset:>10.1f}  {plan}")
+    print(f"(keyset = median of pages {args.pages // 2}..{args.pages}; offset = OFFSET {deep})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+# X12 parse throughput (MB/s) and peak memory: the streaming tokenizer and
+# 271/277 mapping vs. a naive decode + split('~') + split('*') of the whole
+# interchange. Synthetic input unless --file (mmap'd, read in place).
+# Usage: python -m backend.bench.x12_parse --transactions 20000 [--file big.x12]
+
+import argparse
+import gc
+import mmap
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from ..app.x12.mappers import parse_responses
+from ..app.x12.tokenizer import iter_segments
+
+
+_ISA = "ISA*00*          *00*          *ZZ*PAYER          *ZZ*RECEIVER       *240115*1230*^*00501*000000905*0*P*:~\n"
+
+_271 = (
+    "ST*271*{n:04d}*005010X279A1~\nBHT*0022*11*REQ{n}*20240115*1230~\nHL*1**20*1~\n"
+    "NM1*PR*2*ACME HEALTH*****PI*ACME01~\nHL*2*1*21*1~\nNM1*1P*2*CLINIC*****XX*1234567890~\n"
+    "HL*3*2*22*0~\nTRN*2*TRACE{n}*9877281234~\nNM1*IL*1*DOE*JOHN****MI*M{n}~\nREF*6P*GRP9~\n"
+    "DTP*346*D8*20240101~\nEB*1*IND*30^1^33*HM*GOLD PPO~\nEB*B*IND*98*HM**27*25*****Y~\n"
+    "EB*C*IND*30*HM**23*1500~\nEB*C*IND*30*HM**29*750.50~\nEB*A*IND*30*HM****0.2***Y~\n"
+    "MSG*PLEASE CONTACT MEMBER SERVICES FOR DETAILS~\nSE*17*{n:04d}~\n"
+)
+_277 = (
+    "ST*277*{n:04d}*005010X212~\nBHT*0010*08*REF{n}*20240116*0800*DG~\nHL*1**20*1~\n"
+    "NM1*PR*2*ACME*****PI*ACME01~\nHL*2*1*21*1~\nNM1*41*2*CLINIC*****46*X~\nHL*3*2*19*1~\n"
+    "NM1*1P*2*CLINIC*****XX*1234567890~\nHL*4*3*22*0~\nNM1*IL*1*DOE*JOHN****MI*M{n}~\n"
+    "TRN*2*CLM{n}~\nSTC*F2:85:PR*20240112**300*0*******DENIED FOR AUTH~\nREF*1K*PCN{n}~\n"
+    "SVC*HC:99213*300*0~\nSTC*F2:96*20240113~\nSE*15*{n:04d}~\n"
+)
+
+
+def synthetic(transactions: int) -> bytes:
+    # One interchange, half 271 and half 277, in two functional groups
+    half = transactions // 2
+    parts = [_ISA, "GS*HB*PAYER*RCV*20240115*1230*1*X*005010X279A1~\n"]
+    parts += [_271.format(n=n) for n in range(half)]
+    parts += ["GE*%d*1~\n" % half, "GS*HN*PAYER*RCV*20240116*0800*2*X*005010X212~\n"]
+    parts += [_277.format(n=n) for n in range(transactions - half)]
+    parts += ["GE*%d*2~\n" % (transactions - half), "IEA*2*000000905~\n"]
+    return "".join(parts).encode()
+
+
+def naive_tokenize(data: Any) -> int:
+    # The usual first implementation: whole-file string, then split twice
+    text = bytes(data).decode("latin-1")
+    segments = [s.strip().split("*") for s in text.split("~") if s.strip()]
+    return len(segments)
+
+
+def stream_tokenize(data: Any) -> int:
+    return sum(1 for _ in iter_segments(data))
+
+
+def stream_parse(data: Any) -> int:
+    return sum(1 for _ in parse_responses(data))
+
+
+def measure(fn: Callable[[Any], int], data: Any, size: int, repeat: int) -> dict[str, float]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        count = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    # Separate pass for memory: tracemalloc slows allocation-heavy code
+    gc.collect()
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"items": count, "mb_per_s": size / 1e6 / best, "peak_mb": peak / 1e6}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transactions", type=int, default=20_000)
+    ap.add_argument("--file", default=None, help="parse this interchange instead of synthetic input")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    f = None
+    if args.file:
+        f = open(args.file, "rb")
+        data: Any = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        data = synthetic(args.transactions)
+    size = len(data)
+    print(f"input: {size / 1e6:.1f} MB")
+    try:
+        for name, fn in (
+            ("naive split", naive_tokenize),
+            ("stream tokenize", stream_tokenize),
+            ("stream + map", stream_parse),
+        ):
+            r = measure(fn, data, size, args.repeat)
+            print(f"{name:<16} {r['mb_per_s']:7.1f} MB/s  peak {r['peak_mb']:7.1f} MB  ({r['items']} items)")
+    finally:
+        if f is not None:
+            data.close()
+            f.close()
+
+
+if __name__ == "__main__":
+    main()
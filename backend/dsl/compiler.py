@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import hashlib
+import pathlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import yaml
+
+
+SPEC_PATH = pathlib.Path(__file__).with_name("spec.yaml")
+
+_TEMPLATE = re.compile(r"\{\{\s*([\w.]+)\s*\}\}")
+# Quoted strings (kept verbatim) or a run of whitespace, as in the replay
+# selector tokenizer
+_SELECTOR_WS = re.compile(r"""("[^"]*"|'[^']*')|\s+""")
+
+
+class FlowError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class OpSpec:
+    name: str
+    params: frozenset[str]
+    required: frozenset[str]
+
+
+@lru_cache(maxsize=1)
+def load_spec() -> dict[str, OpSpec]:
+    raw = yaml.safe_load(SPEC_PATH.read_text())
+    ops: dict[str, OpSpec] = {}
+    for op in raw["ops"]:
+        params = frozenset(op.get("params") or [])
+        ops[op["name"]] = OpSpec(op["name"], params, params - frozenset(op.get("optional") or []))
+    return ops
+
+
+@dataclass(frozen=True)
+class Template:
+    # "{{member_id}}" style string pre-split into literal and variable parts
+    parts: tuple[str, ...]  # even index: literal, odd index: variable name
+    variables: frozenset[str]
+
+    @property
+    def source(self) -> str:
+        return "".join(f"{{{{{p}}}}}" if i % 2 else p for i, p in enumerate(self.parts))
+
+    def render(self, params: dict[str, Any]) -> str:
+        out = []
+        for i, part in enumerate(self.parts):
+            if i % 2:
+                if part not in params:
+                    raise KeyError(f"missing flow parameter {part!r}")
+                out.append(str(params[part]))
+            else:
+                out.append(part)
+        return "".join(out)
+
+
+def _lower_value(v: Any) -> Any:
+    # Strings with placeholders become Templates; containers become tuples so
+    # the IR stays immutable and hashable.
+    if isinstance(v, str):
+        pieces = _TEMPLATE.split(v)
+        if len(pieces) == 1:
+            return v
+        # render() looks parameters up by flat name, so a dotted path would
+        # only ever fail at run time
+        if dotted := sorted({p for p in pieces[1::2] if "." in p}):
+            raise FlowError(f"template variables must be plain names, got {dotted}")
+        return Template(tuple(pieces), frozenset(pieces[1::2]))
+    if isinstance(v, dict):
+        return tuple((k, _lower_value(x)) for k, x in v.items())
+    if isinstance(v, list):
+        return tuple(_lower_value(x) for x in v)
+    return v
+
+
+def _variables(v: Any) -> set[str]:
+    if isinstance(v, Template):
+        return set(v.variables)
+    if isinstance(v, tuple):
+        out: set[str] = set()
+        for x in v:
+            out |= _variables(x)
+        return out
+    return set()
+
+
+def _normalize_selector(sel: str) -> str:
+    # Collapse whitespace outside quotes only; [aria-label="a  b"] must keep
+    # its value as written
+    return _SELECTOR_WS.sub(lambda m: m.group(1) or " ", sel.strip())
+
+
+@dataclass(frozen=True)
+class Step:
+    op: str
+    selector: str | None
+    params: tuple[tuple[str, Any], ...]
+
+    def param(self, name: str, default: Any = None) -> Any:
+        for k, v in self.params:
+            if k == name:
+                return v
+        return default
+
+
+@dataclass(frozen=True)
+class FlowIR:
+    hash: str
+    version: int
+    steps: tuple[Step, ...]
+    variables: frozenset[str]
+
+
+def flow_hash(flow_yaml: str) -> str:
+    return hashlib.sha256(flow_yaml.encode()).hexdigest()
+
+
+def compile_flow(flow_yaml: str) -> FlowIR:
+    try:
+        data = yaml.safe_load(flow_yaml)
+    except yaml.YAMLError as e:
+        raise FlowError(f"Invalid flow: {e}") from e
+    if not isinstance(data, dict) or "steps" not in data:
+        raise FlowError("Invalid flow: missing steps")
+    raw_steps = data["steps"]
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise FlowError("Invalid flow: steps must be non-empty list")
+
+    spec = load_spec()
+    steps: list[Step] = []
+    variables: set[str] = set()
+    for n, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict) or "op" not in raw:
+            raise FlowError(f"Invalid flow: step {n} must be a mapping with 'op'")
+        op = raw["op"]
+        op_spec = spec.get(op)
+        if op_spec is None:
+            raise FlowError(f"Invalid flow: step {n} has unknown op {op!r}")
+        given = set(raw) - {"op"}
+        if unknown := given - op_spec.params:
+            raise FlowError(f"Invalid flow: step {n} ({op}) has unknown params {sorted(unknown)}")
+        if missing := op_spec.required - given:
+            raise FlowError(f"Invalid flow: step {n} ({op}) is missing params {sorted(missing)}")
+
+        selector = raw.get("selector")
+        if selector is not None:
+            if not isinstance(selector, str) or not selector.strip():
+                raise FlowError(f"Invalid flow: step {n} ({op}) selector must be a non-empty string")
+            selector = _normalize_selector(selector)
+        if op == "extract":
+            mappings = raw["mappings"]
+            if not isinstance(mappings, dict) or not mappings:
+                raise FlowError(f"Invalid flow: step {n} (extract) mappings must be a non-empty mapping")
+            normalized: dict[str, Any] = {}
+            for k, v in mappings.items():
+                if isinstance(v, str):
+                    normalized[k] = _normalize_selector(v)
+                elif isinstance(v, dict) and isinstance(v.get("selector"), str):
+                    normalized[k] = {**v, "selector": _normalize_selector(v["selector"])}
+                else:
+                    raise FlowError(f"Invalid flow: step {n} (extract) mapping {k!r} needs a selector")
+            raw = {**raw, "mappings": normalized}
+
+        try:
+            params = tuple(sorted((k, _lower_value(v)) for k, v in raw.items() if k not in ("op", "selector")))
+        except FlowError as e:
+            raise FlowError(f"Invalid flow: step {n} ({op}) {e}") from None
+        for _, v in params:
+            variables |= _variables(v)
+        steps.append(Step(op, selector, params))
+
+    return FlowIR(flow_hash(flow_yaml), int(data.get("version", 1)), tuple(steps), frozenset(variables))
+
+
+class FlowCache:
+    # Per-process LRU of compiled flows keyed by content hash
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, FlowIR] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, h: str) -> FlowIR | None:
+        with self._lock:
+            ir = self._items.get(h)
+            if ir is not None:
+                self._items.move_to_end(h)
+            return ir
+
+    def put(self, ir: FlowIR) -> FlowIR:
+        with self._lock:
+            self._items[ir.hash] = ir
+            self._items.move_to_end(ir.hash)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return ir
+
+
+_cache = FlowCache()
+
+
+def compile_cached(flow_yaml: str) -> FlowIR:
+    return _cache.get(flow_hash(flow_yaml)) or _cache.put(compile_flow(flow_yaml))
+
+
+class FlowRegistry:
+    # Flow sources live in Redis under their content hash so the API and every
+    # worker resolve the same hash; each process compiles a flow at most once
+    # while it stays in the LRU.
+    def __init__(self, url: str | None = None, cache: FlowCache | None = None) -> None:
+        import redis.asyncio as aioredis
+
+        from ..app.settings import get_settings
+
+        self._redis = aioredis.from_url(url or get_settings().redis_url)
+        self.cache = cache or _cache
+
+    @staticmethod
+    def _key(h: str) -> str:
+        return f"dsl:flow:{h}"
+
+    async def register(self, flow_yaml: str) -> FlowIR:
+        ir = compile_cached(flow_yaml)
+        await self._redis.set(self._key(ir.hash), flow_yaml, nx=True)
+        return ir
+
+    async def get(self, h: str) -> FlowIR:
+        ir = self.cache.get(h)
+        if ir is not None:
+            return ir
+        text = await self._redis.get(self._key(h))
+        if text is None:
+            raise FlowError(f"unknown flow hash {h}")
+        ir = compile_flow(text.decode())
+        if ir.hash != h:
+            raise FlowError(f"flow hash mismatch for {h}")
+        return self.cache.put(ir)
+
+
+_registry: FlowRegistry | None = None
+
+
+def get_registry() -> FlowRegistry:
+    global _registry
+    if _registry is None:
+        _registry = FlowRegistry()
+    return _registry
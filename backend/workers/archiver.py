@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from prometheus_client import Counter
+from sqlalchemy import bindparam, select, text, tuple_, update
+
+from ..app.db import session_scope
+from ..app.models import Run, RunStatus
+from ..app.services.archive import archive_key, store_archive
+from ..app.settings import get_settings
+
+
+log = logging.getLogger(__name__)
+
+ARCHIVED = Counter("runs_archived_total", "Runs whose payloads were moved to object storage")
+
+_FINISHED = (RunStatus.succeeded, RunStatus.failed)
+
+# Core (not ORM) update: executemany over (id, created_at) so each row is
+# addressed within its own partition
+_MARK_ARCHIVED = (
+    update(Run.__table__)
+    .where(Run.__table__.c.id == bindparam("b_id"), Run.__table__.c.created_at == bindparam("b_created_at"))
+    .values(archive_key=bindparam("b_key"), input_payload=None, output_payload=None)
+)
+
+
+async def ensure_partitions(months_ahead: int) -> None:
+    async with session_scope() as s:
+        await s.execute(
+            text("SELECT runs_ensure_partitions(date_trunc('month', now())::date, :ahead)"), {"ahead": months_ahead}
+        )
+
+
+async def archive_before(cutoff: datetime, batch_size: int = 500, io_threads: int = 16) -> int:
+    # Upload first, then null the columns: a crash in between only means the
+    # same object is written again on the next pass.
+    loop = asyncio.get_running_loop()
+    total = 0
+    after: tuple[datetime, object] | None = None
+    with ThreadPoolExecutor(max_workers=io_threads) as pool:
+        while True:
+            q = (
+                select(Run.id, Run.created_at, Run.input_payload, Run.output_payload)
+                .where(Run.created_at < cutoff, Run.archive_key.is_(None), Run.status.in_(_FINISHED))
+                .order_by(Run.created_at, Run.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                q = q.where(tuple_(Run.created_at, Run.id) > tuple_(*after))
+            async with session_scope() as s:
+                rows = (await s.execute(q)).all()
+            if not rows:
+                return total
+
+            keys = [archive_key(str(r.id), r.created_at) for r in rows]
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, store_archive, key, r.input_payload, r.output_payload)
+                    for key, r in zip(keys, rows)
+                )
+            )
+            async with session_scope() as s:
+                await s.execute(
+                    _MARK_ARCHIVED,
+                    [{"b_id": r.id, "b_created_at": r.created_at, "b_key": key} for key, r in zip(keys, rows)],
+                )
+            total += len(rows)
+            ARCHIVED.inc(len(rows))
+            after = (rows[-1].created_at, rows[-1].id)
+            log.info("archived %d runs (through %s)", total, rows[-1].created_at.isoformat())
+
+
+async def run_once() -> int:
+    s = get_settings()
+    await ensure_partitions(s.runs_partitions_ahead)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=s.runs_archive_after_days)
+    return await archive_before(cutoff, s.runs_archive_batch)
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="run one pass and exit (e.g. from cron)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    s = get_settings()
+    print("Archiver started", flush=True)
+    while True:
+        n = await run_once()
+        log.info("archival pass done: %d runs", n)
+        if args.once:
+            return
+        await asyncio.sleep(s.runs_archive_interval_s)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
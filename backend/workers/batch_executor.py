@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import socket
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any
+
+import redis.asyncio as aioredis
+from prometheus_client import Counter, Gauge
+from sqlalchemy import exists, select
+
+from ..app.db import session_scope
+from ..app.events.bus import get_bus
+from ..app.events.envelope import Event
+from ..app.metrics import RUN_DURATION
+from ..app.models import Batch, BatchDriver, BatchItem, BatchStatus, RunStatus
+from ..app.services.batches import (
+    EXECUTOR_CLAIMANT,
+    Item,
+    claim_batch_items,
+    release_expired_leases,
+    renew_leases,
+    set_item_status,
+)
+from ..app.services.dispatch import portal_target, run_portal_flow
+from ..app.settings import get_settings
+from ..app.tracing import PAYER, RUN_ID, get_tracer, setup_tracing, shutdown_tracing
+from ..app.utils.ratelimit import AIMDLimiter, RateMeter, RedisTokenBucket
+
+
+log = logging.getLogger(__name__)
+
+QUEUE_DEPTH = Gauge("batch_executor_queue_depth", "Claimed items waiting for a payer slot", ["payer"])
+CONCURRENCY_LIMIT = Gauge("batch_executor_concurrency_limit", "Current AIMD concurrency limit", ["payer"])
+INFLIGHT = Gauge("batch_executor_inflight", "Portal flows in flight", ["payer"])
+EFFECTIVE_RATE = Gauge("batch_executor_effective_rate", "Completed items/sec over the last minute", ["payer"])
+ITEMS = Counter("batch_executor_items_total", "Batch items finished", ["payer", "outcome"])
+
+# Executors share one consumer group on the batch wake stream: each ready
+# batch wakes one executor, which claims its first items without waiting
+# for a poll
+WAKE_GROUP = "batch-executor"
+
+# Word-bounded so digits inside claim numbers, NPIs or ports never count as
+# a 429: a false match cools the whole payer down
+_LOCKOUT_RE = re.compile(
+    r"\block(?:ed)?[ -]?out\b|\baccount locked\b|\btoo many requests\b|\b(?:http|status(?:[ _]?code)?)[ =:/]*429\b",
+    re.IGNORECASE,
+)
+
+
+class PayerLane:
+    # Per-payer queue of claimed items, one sub-queue per batch served round
+    # robin so a huge batch cannot starve the others on the same payer.
+    def __init__(self, payer_id: str, bucket: RedisTokenBucket, limiter: AIMDLimiter) -> None:
+        self.payer_id = payer_id
+        self.bucket = bucket
+        self.limiter = limiter
+        self.meter = RateMeter()
+        self.queues: OrderedDict[uuid.UUID, deque[Item]] = OrderedDict()
+        self.depth = 0
+        self.ready = asyncio.Event()
+
+    def push(self, item: Item) -> None:
+        self.queues.setdefault(item.batch_id, deque()).append(item)
+        self.depth += 1
+        self.ready.set()
+
+    def pop(self) -> Item | None:
+        while self.queues:
+            batch_id, q = next(iter(self.queues.items()))
+            if not q:
+                del self.queues[batch_id]
+                continue
+            item = q.popleft()
+            self.queues.move_to_end(batch_id)
+            self.depth -= 1
+            return item
+        self.ready.clear()
+        return None
+
+    def report(self) -> None:
+        QUEUE_DEPTH.labels(self.payer_id).set(self.depth)
+        CONCURRENCY_LIMIT.labels(self.payer_id).set(self.limiter.limit)
+        INFLIGHT.labels(self.payer_id).set(self.limiter.inflight)
+        EFFECTIVE_RATE.labels(self.payer_id).set(self.meter.rate())
+
+
+def _is_lockout(exc: BaseException) -> bool:
+    # Walks the cause chain (workflow failure -> activity error -> portal
+    # error); a structured 429 status wins over the message text
+    seen: BaseException | None = exc
+    for _ in range(8):
+        if seen is None:
+            break
+        if 429 in (getattr(seen, "status", None), getattr(seen, "status_code", None)):
+            return True
+        if _LOCKOUT_RE.search(str(seen)):
+            return True
+        seen = seen.__cause__
+    return False
+
+
+class BatchExecutor:
+    def __init__(self, quantum: int = 50, max_buffer: int = 2000, poll_interval: float = 1.0) -> None:
+        self.s = get_settings()
+        self.quantum = quantum  # items claimed per batch per dispatch round
+        self.max_buffer = max_buffer
+        self.poll_interval = poll_interval
+        self.redis = aioredis.from_url(self.s.redis_url)
+        self.lanes: dict[str, PayerLane] = {}
+        self._lane_tasks: set[asyncio.Task] = set()
+        self._runs: set[asyncio.Task] = set()
+        # Lease holder id for every item this process claims
+        self.claimant = f"{EXECUTOR_CLAIMANT}{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leases_checked = 0.0
+        self._next_batch = 0  # round-robin position in the active batch list
+        self._wake = asyncio.Event()
+
+    def _lane(self, payer_id: str) -> PayerLane:
+        lane = self.lanes.get(payer_id)
+        if lane is None:
+            cfg = self.s.payer_limits.get(payer_id, {})
+            bucket = RedisTokenBucket(
+                self.redis,
+                f"payer:{payer_id}",
+                rate=cfg.get("rate", self.s.payer_default_rate),
+                burst=cfg.get("burst", self.s.payer_default_burst),
+            )
+            limiter = AIMDLimiter(
+                initial=cfg.get("initial_concurrency", 2),
+                max_limit=cfg.get("max_concurrency", 32),
+                latency_target_s=cfg.get("latency_target_s", 60.0),
+            )
+            lane = self.lanes[payer_id] = PayerLane(payer_id, bucket, limiter)
+            self._start_lane(lane)
+        return lane
+
+    def _start_lane(self, lane: PayerLane) -> None:
+        task = asyncio.create_task(self._lane_loop(lane))
+        self._lane_tasks.add(task)
+        task.add_done_callback(lambda t: self._lane_stopped(lane, t))
+
+    def _lane_stopped(self, lane: PayerLane, task: asyncio.Task) -> None:
+        self._lane_tasks.discard(task)
+        if task.cancelled():
+            return
+        # A dead lane would strand every item queued for its payer
+        log.error("payer %s lane stopped; restarting", lane.payer_id, exc_info=task.exception())
+        self._start_lane(lane)
+
+    def buffered(self) -> int:
+        return sum(lane.depth for lane in self.lanes.values())
+
+    async def run(self) -> None:
+        follower = asyncio.create_task(self._follow_wakeups())
+        try:
+            while True:
+                self._wake.clear()
+                try:
+                    await self._maintain_leases()
+                    await self._dispatch_round()
+                except Exception:
+                    log.exception("batch dispatch round failed")
+                for lane in self.lanes.values():
+                    lane.report()
+                # The poll only backstops missed events and requeued leases
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            follower.cancel()
+
+    async def _follow_wakeups(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                # Named by host, not claimant, so a restarted executor picks
+                # up the entries its predecessor read but never acked
+                async for _ in get_bus().consume(WAKE_GROUP, socket.gethostname(), stream=self.s.batch_wake_stream):
+                    backoff = 0.5
+                    self._wake.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("batch wake consumer failed; reconnecting in %.1fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    async def _dispatch_round(self) -> None:
+        async with session_scope() as s:
+            res = await s.execute(
+                select(Batch.id, Batch.purpose)
+                .where(Batch.status == BatchStatus.ready, Batch.driver == BatchDriver.executor)
+                .where(exists().where(BatchItem.batch_id == Batch.id, BatchItem.status == RunStatus.queued))
+                .order_by(Batch.created_at)
+            )
+            active = res.all()
+        room = self.max_buffer - self.buffered()
+        if not active or room <= 0:
+            return
+        # Every batch gets an equal share of the room left, starting where the
+        # last round stopped, so newer batches are refilled even when slow
+        # lanes keep the buffer near its cap
+        share = min(self.quantum, max(1, room // len(active)))
+        start = self._next_batch % len(active)
+        for i in range(len(active)):
+            if room <= 0:
+                break
+            batch_id, purpose = active[(start + i) % len(active)]
+            self._next_batch = start + i + 1
+            for item in await claim_batch_items(batch_id, purpose, min(share, room), self.claimant):
+                if not item.owner:
+                    continue
+                try:
+                    await portal_target(item.payer_id, item.purpose)
+                except ValueError as e:
+                    # Fail now rather than park a run at the login breakpoint
+                    await self._record(item, RunStatus.failed, error=str(e), error_code="not_configured")
+                    continue
+                self._lane(item.payer_id).push(item)
+                room -= 1
+
+    async def _maintain_leases(self) -> None:
+        ttl = self.s.batch_lease_ttl_s
+        if time.monotonic() - self._leases_checked < ttl / 3:
+            return
+        self._leases_checked = time.monotonic()
+        await renew_leases(self.claimant)
+        released = await release_expired_leases(ttl)
+        if released:
+            log.warning("requeued %d batch items with expired leases", released)
+
+    async def _lane_loop(self, lane: PayerLane) -> None:
+        backoff = 0.5
+        while True:
+            item = lane.pop()
+            if item is None:
+                await lane.ready.wait()
+                continue
+            await lane.limiter.acquire()
+            try:
+                await lane.bucket.acquire()
+            except Exception:
+                # Redis is unreachable: hand back the slot and the item, retry
+                await lane.limiter.cancel()
+                lane.push(item)
+                log.exception("payer %s rate limiter failed; retrying in %.1fs", lane.payer_id, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+                continue
+            backoff = 0.5
+            task = asyncio.create_task(self._execute(lane, item))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+
+    async def _execute(self, lane: PayerLane, item: Item) -> None:
+        # One trace per run: the workflow, its activities and the result event
+        # all hang off this span
+        attrs = {RUN_ID: str(item.run_id), PAYER: item.payer_id, "rcm.purpose": item.purpose}
+        with get_tracer().start_as_current_span("run.execute", attributes=attrs):
+            t0 = time.perf_counter()
+            ok = lockout = False
+            output: dict | None = None
+            error: str | None = None
+            try:
+                await set_item_status(item, RunStatus.running)
+                # Status caches drop their queued view of the run on this event
+                await get_bus().publish(
+                    Event(type="run.running", run_id=str(item.run_id), batch_id=str(item.batch_id), payload={}).dict()
+                )
+                output = await run_portal_flow(item.run_id, item.payer_id, item.purpose, item.input)
+                ok = True
+            except Exception as e:
+                lockout = _is_lockout(e)
+                error = f"{type(e).__name__}: {e}"
+            latency = time.perf_counter() - t0
+
+            # The result is recorded whatever happens here: an item left
+            # running keeps its lease renewed and is never retried
+            try:
+                await lane.limiter.release(latency, ok, lockout)
+                if lockout:
+                    log.warning("payer %s lockout signal; cooling down %.0fs", lane.payer_id, self.s.payer_lockout_cooldown_s)
+                    try:
+                        await lane.bucket.cooldown(self.s.payer_lockout_cooldown_s)
+                    except Exception:
+                        log.exception("failed to cool down payer %s", lane.payer_id)
+                lane.meter.mark()
+                outcome = "succeeded" if ok else "lockout" if lockout else "failed"
+                ITEMS.labels(lane.payer_id, outcome).inc()
+                RUN_DURATION.labels(lane.payer_id, item.purpose, outcome).observe(latency)
+            finally:
+                await self._record(item, RunStatus.succeeded if ok else RunStatus.failed, output=output, error=error)
+
+    async def _record(self, item: Item, status: RunStatus, **result: Any) -> None:
+        try:
+            await set_item_status(item, status, **result)
+            await get_bus().publish(
+                Event(type=f"run.{status.value}", run_id=str(item.run_id), batch_id=str(item.batch_id), payload={}).dict()
+            )
+        except Exception:
+            log.exception("failed to record result for run %s", item.run_id)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    setup_tracing(f"{get_settings().app_name}-batch-executor")
+    print("Batch executor started", flush=True)
+    try:
+        await BatchExecutor().run()
+    finally:
+        shutdown_tracing()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,28 +1,117 @@
 from __future__ import annotations
 
+import argparse
 import asyncio
+import os
+from typing import Any, Callable
 
-from temporalio.worker import Worker
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor, Worker
 
-from ..app.settings import get_settings
+from ..app.metrics import start_exporter
+from ..app.settings import Settings, get_settings
+from ..app.tracing import setup_tracing, shutdown_tracing
 from ..workflows.client import get_temporal_client
+from ..workflows.batch import BatchFlow
 from ..workflows.portal import PortalFlow
+from ..workflows.queues import BROWSER, IO, ROLES, WORKFLOW, queue_name
 from ..activities.runner import run_steps
-from ..activities.events import emit_event
+from ..activities.events import close_emitter, emit_event
+from ..activities.sessions import session_checkout, session_refresh, session_release
+from ..activities.batches import claim_batch_page, get_batch_info, record_batch_item
+from ..activities.runs import record_run
+from ..agents.playwright_executor import close_pool
 
 
-async def main():
-    s = get_settings()
-    client = await get_temporal_client()
-    worker = Worker(
+# What each role hosts. The workflow role also registers emit_event so
+# workflows can run it as a local activity.
+ROLE_WORKFLOWS: dict[str, list[type]] = {WORKFLOW: [PortalFlow, BatchFlow], BROWSER: [], IO: []}
+ROLE_ACTIVITIES: dict[str, list[Callable[..., Any]]] = {
+    WORKFLOW: [emit_event],
+    BROWSER: [run_steps, session_checkout],
+    IO: [emit_event, session_refresh, session_release, get_batch_info, claim_batch_page, record_batch_item, record_run],
+}
+
+
+def role_slots(s: Settings, role: str) -> int:
+    return {WORKFLOW: s.worker_workflow_slots, BROWSER: s.worker_browser_slots, IO: s.worker_io_slots}[role]
+
+
+class SlotUsage(Interceptor):
+    # Counts activities executing in this worker; the supervisor reads it
+    # through the report callback to show slot usage per role.
+    def __init__(self) -> None:
+        self.inflight = 0
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _CountingActivity(next, self)
+
+
+class _CountingActivity(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, usage: SlotUsage) -> None:
+        super().__init__(next)
+        self.usage = usage
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        self.usage.inflight += 1
+        try:
+            return await self.next.execute_activity(input)
+        finally:
+            self.usage.inflight -= 1
+
+
+def build_worker(client, s: Settings, role: str, usage: SlotUsage) -> Worker:
+    slots = role_slots(s, role)
+    kwargs: dict[str, Any] = {}
+    if role == WORKFLOW:
+        kwargs["max_concurrent_workflow_tasks"] = slots
+        kwargs["max_concurrent_local_activities"] = slots
+    else:
+        kwargs["max_concurrent_activities"] = slots
+    return Worker(
         client,
-        task_queue=s.temporal_task_queue,
-        workflows=[PortalFlow],
-        activities=[run_steps, emit_event],
+        task_queue=queue_name(s.temporal_task_queue, role),
+        workflows=ROLE_WORKFLOWS[role],
+        activities=ROLE_ACTIVITIES[role],
+        interceptors=[usage],
+        **kwargs,
     )
-    print("Worker started", flush=True)
-    await worker.run()
+
+
+async def _report_loop(
+    roles: list[str], usages: dict[str, SlotUsage], s: Settings, report: Callable[[dict], None], interval: float
+) -> None:
+    while True:
+        for role in roles:
+            report({"role": role, "pid": os.getpid(), "inflight": usages[role].inflight, "slots": role_slots(s, role)})
+        await asyncio.sleep(interval)
+
+
+async def main(roles: list[str] | None = None, report: Callable[[dict], None] | None = None, report_interval: float = 5.0):
+    # Without roles this hosts every role in one process (local dev); the
+    # supervisor runs one role per process instead.
+    s = get_settings()
+    roles = roles or list(ROLES)
+    setup_tracing(f"{s.app_name}-worker")
+    client = await get_temporal_client()
+    usages = {role: SlotUsage() for role in roles}
+    workers = [build_worker(client, s, role, usages[role]) for role in roles]
+    print(f"Worker started: {', '.join(queue_name(s.temporal_task_queue, r) for r in roles)}", flush=True)
+    reporter = asyncio.create_task(_report_loop(roles, usages, s, report, report_interval)) if report else None
+    try:
+        await asyncio.gather(*(w.run() for w in workers))
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        await close_emitter()
+        await close_pool()
+        shutdown_tracing()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--role", action="append", choices=ROLES, help="repeatable; default: all roles")
+    args = ap.parse_args()
+    # Standalone (no supervisor): expose this process's metrics directly
+    if get_settings().worker_metrics_port:
+        start_exporter(get_settings().worker_metrics_port)
+    asyncio.run(main(args.role))
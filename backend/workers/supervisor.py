@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+from dataclasses import dataclass, field
+
+from prometheus_client import Counter, Gauge
+
+from ..app.metrics import mark_process_dead, start_exporter
+from ..app.settings import Settings, get_settings
+from ..workflows.queues import BROWSER, IO, ROLES, WORKFLOW
+from .runner import role_slots
+
+
+log = logging.getLogger(__name__)
+
+CHILDREN = Gauge("worker_supervisor_children", "Live worker processes", ["role"], multiprocess_mode="livesum")
+RESTARTS = Counter("worker_supervisor_restarts_total", "Worker processes restarted after exiting", ["role"])
+SLOTS = Gauge("worker_slots", "Configured activity/workflow-task slots", ["role"], multiprocess_mode="livesum")
+SLOTS_USED = Gauge(
+    "worker_slots_used", "Slots in use (last report per process)", ["role"], multiprocess_mode="livesum"
+)
+
+_MAX_BACKOFF_S = 60.0
+_STABLE_AFTER_S = 30.0  # a child that lived this long resets its backoff
+
+
+def _child(role: str, reports: mp.Queue) -> None:
+    # Runs in the spawned process: one role, reporting slot usage upstream
+    import asyncio
+
+    from .runner import main
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor owns shutdown
+
+    def report(sample: dict) -> None:
+        try:
+            reports.put_nowait(sample)
+        except queue.Full:
+            pass
+
+    async def run() -> None:
+        # SIGTERM cancels the workers, which lets them shut down gracefully
+        task = asyncio.current_task()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        try:
+            await main([role], report=report)
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+
+
+@dataclass
+class Slot:
+    role: str
+    index: int
+    proc: mp.Process | None = None
+    started: float = 0.0
+    backoff: float = 1.0
+    restart_at: float = 0.0
+    usage: dict = field(default_factory=dict)
+
+
+def role_processes(s: Settings, role: str) -> int:
+    n = {WORKFLOW: s.worker_workflow_processes, BROWSER: s.worker_browser_processes, IO: s.worker_io_processes}[role]
+    # 0 = one per core (browser steps are CPU-heavy; they scale with cores)
+    return n if n > 0 else os.cpu_count() or 1
+
+
+class Supervisor:
+    def __init__(self, s: Settings | None = None, report_interval: float = 15.0) -> None:
+        self.s = s or get_settings()
+        self.ctx = mp.get_context("spawn")  # no inherited event loops or sockets
+        self.reports: mp.Queue = self.ctx.Queue(maxsize=10_000)
+        self.slots = [Slot(role, i) for role in ROLES for i in range(role_processes(self.s, role))]
+        self.report_interval = report_interval
+        self.stopping = False
+
+    def _start(self, slot: Slot) -> None:
+        slot.proc = self.ctx.Process(target=_child, args=(slot.role, self.reports), name=f"worker-{slot.role}-{slot.index}")
+        slot.proc.start()
+        slot.started = time.monotonic()
+        slot.usage = {}
+        log.info("started %s (pid %s)", slot.proc.name, slot.proc.pid)
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        for slot in self.slots:
+            proc = slot.proc
+            if proc is not None and proc.exitcode is None:
+                continue
+            if proc is not None:
+                # Exited: schedule a restart with exponential backoff, reset
+                # once the previous process had been up for a while
+                slot.backoff = 1.0 if now - slot.started > _STABLE_AFTER_S else min(slot.backoff * 2, _MAX_BACKOFF_S)
+                slot.restart_at = now + slot.backoff
+                log.warning("%s exited with %s; restarting in %.0fs", proc.name, proc.exitcode, slot.backoff)
+                RESTARTS.labels(slot.role).inc()
+                # Drop the dead process's live gauges from the shared metrics dir
+                mark_process_dead(proc.pid)
+                slot.proc = None
+            if now >= slot.restart_at:
+                self._start(slot)
+
+    def _drain_reports(self) -> None:
+        by_pid = {slot.proc.pid: slot for slot in self.slots if slot.proc is not None}
+        while True:
+            try:
+                sample = self.reports.get_nowait()
+            except queue.Empty:
+                break
+            slot = by_pid.get(sample.get("pid"))
+            if slot is not None:
+                slot.usage = sample
+
+    def usage(self) -> dict[str, dict[str, int]]:
+        out: dict[str, dict[str, int]] = {}
+        for slot in self.slots:
+            r = out.setdefault(slot.role, {"processes": 0, "slots": 0, "used": 0})
+            alive = slot.proc is not None and slot.proc.exitcode is None
+            r["processes"] += int(alive)
+            if alive:
+                r["slots"] += role_slots(self.s, slot.role)
+                r["used"] += int(slot.usage.get("inflight", 0))
+        return out
+
+    def _report(self) -> None:
+        usage = self.usage()
+        for role, u in usage.items():
+            CHILDREN.labels(role).set(u["processes"])
+            SLOTS.labels(role).set(u["slots"])
+            SLOTS_USED.labels(role).set(u["used"])
+        log.info(
+            "slots: %s",
+            "  ".join(f"{role} {u['used']}/{u['slots']} ({u['processes']} procs)" for role, u in usage.items()),
+        )
+
+    def stop(self, *_: object) -> None:
+        self.stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while not self.stopping:
+                self._reap()
+                self._drain_reports()
+                if time.monotonic() >= next_report:
+                    self._report()
+                    next_report = time.monotonic() + self.report_interval
+                time.sleep(0.5)
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        procs = [slot.proc for slot in self.slots if slot.proc is not None and slot.proc.exitcode is None]
+        for proc in procs:
+            proc.terminate()  # SIGTERM: workers finish or abandon in-flight tasks
+        deadline = time.monotonic() + timeout
+        for proc in procs:
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.exitcode is None:
+                proc.kill()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    s = get_settings()
+    if s.worker_metrics_port:
+        # Serves every child's samples when PROMETHEUS_MULTIPROC_DIR is set
+        start_exporter(s.worker_metrics_port)
+    sup = Supervisor(s)
+    print(
+        "Worker supervisor started: "
+        + ", ".join(f"{role} x{role_processes(s, role)}" for role in ROLES),
+        flush=True,
+    )
+    sup.run()
+
+
+if __name__ == "__main__":
+    main()
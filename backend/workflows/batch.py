@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from temporalio import workflow
+
+from .portal import PortalFlow
+from .queues import IO, activity_queue
+
+
+@dataclass
+class BatchProgress:
+    total: int = 0
+    claimed: int = 0
+    running: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    linked: int = 0  # items sharing a run another item drives
+    generations: int = 1  # runs of this workflow id (continue_as_new)
+
+
+@dataclass
+class BatchParams:
+    batch_id: str
+    window: int = 50  # child PortalFlows in flight
+    page_size: int = 100  # items claimed per activity call
+    continue_every: int = 2000  # children per run before continue_as_new
+    purpose: str | None = None  # resolved on the first run, then carried over
+    progress: BatchProgress | None = None
+
+
+@workflow.defn
+class BatchFlow:
+    # One workflow per batch: pages through queued items and runs each as a
+    # child PortalFlow inside a bounded window. History grows with every
+    # child, so after `continue_every` children the window is drained and the
+    # workflow continues as new with its progress carried over.
+    def __init__(self) -> None:
+        self.progress = BatchProgress()
+        self._children: set[asyncio.Task] = set()
+
+    @workflow.query
+    def get_progress(self) -> BatchProgress:
+        return self.progress
+
+    async def _run_item(self, purpose: str, item: dict[str, Any]) -> None:
+        output: dict | None = None
+        error: str | None = None
+        try:
+            output = await workflow.execute_child_workflow(
+                PortalFlow.run,
+                args=[
+                    f"{item['payer_id']}:{purpose}",
+                    item.get("flow_hash"),
+                    item["local_emit"],
+                    item["payer_id"],
+                    item["credential_id"],
+                    None,  # recorded below, with the batch item
+                    item.get("input"),
+                ],
+                id=f"run-{item['run_id']}",
+            )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        try:
+            await workflow.execute_activity(
+                "record_batch_item",
+                args=[item, output, error],
+                task_queue=activity_queue(IO),
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+        finally:
+            self.progress.running -= 1
+            if error is None:
+                self.progress.succeeded += 1
+            else:
+                self.progress.failed += 1
+
+    @workflow.run
+    async def run(self, params: BatchParams) -> BatchProgress:
+        if params.progress is not None:
+            self.progress = params.progress
+        purpose = params.purpose
+        if purpose is None:
+            info = await workflow.execute_activity(
+                "get_batch_info",
+                params.batch_id,
+                task_queue=activity_queue(IO),
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+            purpose = info["purpose"]
+            self.progress.total = info["valid_rows"]
+
+        started = 0
+        while started < params.continue_every:
+            # Claim no more than this run will start, so nothing claimed is
+            # left behind when the workflow continues as new
+            page = await workflow.execute_activity(
+                "claim_batch_page",
+                args=[params.batch_id, purpose, min(params.page_size, params.continue_every - started)],
+                task_queue=activity_queue(IO),
+                start_to_close_timeout=timedelta(minutes=1),
+            )
+            if not page:
+                break
+            self.progress.claimed += len(page)
+            for item in page:
+                if not item.get("owner", True):
+                    self.progress.linked += 1
+                    continue
+                if item.get("error"):
+                    self.progress.failed += 1  # no flow or credential; already recorded
+                    continue
+                await workflow.wait_condition(lambda: self.progress.running < params.window)
+                self.progress.running += 1
+                started += 1
+                task = asyncio.ensure_future(self._run_item(purpose, item))
+                self._children.add(task)
+                task.add_done_callback(self._children.discard)
+
+        await workflow.wait_condition(lambda: self.progress.running == 0)
+        if started >= params.continue_every:
+            self.progress.generations += 1
+            workflow.continue_as_new(dataclasses.replace(params, purpose=purpose, progress=self.progress))
+        return self.progress
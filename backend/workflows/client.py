@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 from temporalio.client import Client
 from ..app.settings import get_settings
+from ..app.tracing import temporal_interceptors
 
 
 _client: Client | None = None
@@ -15,7 +16,12 @@ async def get_temporal_client() -> Client:
         last_err: Exception | None = None
         for attempt in range(30):
             try:
-                _client = await Client.connect(s.temporal_target, namespace=s.temporal_namespace)
+                _client = await Client.connect(
+                    s.temporal_target,
+                    namespace=s.temporal_namespace,
+                    # Carries trace context through workflow/activity headers
+                    interceptors=temporal_interceptors(),
+                )
                 break
             except Exception as e:  # retry until Temporal is ready/DNS resolves
                 last_err = e
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Any
 
 from temporalio import workflow
-from temporalio import activity
+from temporalio.exceptions import ApplicationError
+
+from .queues import BROWSER, IO, activity_queue
 
 
 @dataclass
@@ -13,40 +16,226 @@ class State:
     waiting_mfa: bool = False
     mfa_code: str | None = None
     output: dict[str, Any] | None = None
+    session: str | None = None  # "cached" | "login" while a payer session is in play
+
+
+# Waiting on a session another workflow is logging in: its release signals
+# the waiters; the re-check interval only backstops a lost signal and backs
+# off to SESSION_WAIT_MAX. Past SESSION_WAIT_DEADLINE the run fails.
+SESSION_WAIT = timedelta(seconds=5)
+SESSION_WAIT_MAX = timedelta(minutes=5)
+SESSION_WAIT_DEADLINE = timedelta(hours=2)
+# How often a workflow waiting for MFA extends its re-auth lock; well under
+# SESSION_LOCK_TTL_S so a second login never starts while it waits
+SESSION_LOCK_REFRESH = timedelta(minutes=1)
 
 
 @workflow.defn
 class PortalFlow:
     def __init__(self) -> None:
         self.state = State()
+        self.local_emit = True
+        self._session_released = False
 
     @workflow.signal
     def provide_mfa(self, code: str) -> None:
         self.state.mfa_code = code
         self.state.waiting_mfa = False
 
+    @workflow.signal
+    def session_released(self) -> None:
+        self._session_released = True
+
     @workflow.query
     def get_state(self) -> State:
         return self.state
 
-    @workflow.run
-    async def run(self, flow_id: str, steps: list[dict]) -> dict:
-        # Enter waiting state first (reduces race for queries)
-        self.state.waiting_mfa = True
-        # Emit a breakpoint requiring MFA
-        await workflow.execute_activity(
-            "emit_event",
-            {"type": "breakpoint.mfa.requested", "payload": {"flow_id": flow_id}},
-            start_to_close_timeout=timedelta(seconds=30),
-        )
-        # Wait for MFA signal indefinitely (test endpoint convenience)
-        await workflow.wait_condition(lambda: not self.state.waiting_mfa)
-        # Execute stubbed steps (real execution will be in activities)
-        # Return deterministic mock for now
-        self.state.output = {"flow_id": flow_id, "steps": len(steps), "status": "ok"}
+    async def _emit(self, event: dict) -> None:
+        if not workflow.patched("emit-envelope"):
+            # Histories recorded before events were tagged and emitted locally
+            await workflow.execute_activity(
+                "emit_event",
+                event,
+                task_queue=activity_queue(IO),
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+            return
+        # Tag with the workflow id so long-poll waiters on this workflow wake,
+        # and with the (deterministic) workflow time for SSE send-lag metrics
+        event = {
+            "ts": workflow.now().isoformat(),
+            **event,
+            "payload": {**event.get("payload", {}), "workflow_id": workflow.info().workflow_id},
+        }
+        # Local activities run in the same worker without a task queue round trip
+        if self.local_emit:
+            await workflow.execute_local_activity(
+                "emit_event",
+                event,
+                start_to_close_timeout=timedelta(seconds=10),
+            )
+        else:
+            await workflow.execute_activity(
+                "emit_event",
+                event,
+                task_queue=activity_queue(IO),
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+
+    async def _record(
+        self, run_id: str, output: dict[str, Any] | None, error: str | None, error_code: str = "portal_error"
+    ) -> None:
+        # Standalone runs have no driver waiting on the result; the run row is
+        # updated before the run.* event goes out
         await workflow.execute_activity(
-            "emit_event",
-            {"type": "run.succeeded", "payload": {"flow_id": flow_id}},
+            "record_run",
+            args=[run_id, output, error, error_code],
+            task_queue=activity_queue(IO),
             start_to_close_timeout=timedelta(seconds=30),
         )
+
+    async def _checkout_session(self, payer_id: str, credential_id: str) -> bool:
+        # True when this workflow must log in (and holds the re-auth lock);
+        # False when a cached session is valid. Concurrent workflows for the
+        # same credential wait here instead of all triggering MFA at once.
+        owner = workflow.info().workflow_id
+        wait = SESSION_WAIT
+        deadline = workflow.now() + SESSION_WAIT_DEADLINE
+        while True:
+            self._session_released = False
+            status = await workflow.execute_activity(
+                "session_checkout",
+                args=[payer_id, credential_id, owner],
+                task_queue=activity_queue(BROWSER),  # may probe the portal
+                start_to_close_timeout=timedelta(minutes=1),
+            )
+            if status == "valid":
+                return False
+            if status == "owner":
+                return True
+            if not workflow.patched("session-wait-signal"):
+                await asyncio.sleep(SESSION_WAIT.total_seconds())
+                continue
+            if workflow.now() >= deadline:
+                raise ApplicationError(
+                    f"{payer_id} session stayed locked by another login for {SESSION_WAIT_DEADLINE}",
+                    type="SessionBusy",
+                    non_retryable=True,
+                )
+            try:
+                await workflow.wait_condition(lambda: self._session_released, timeout=wait)
+            except asyncio.TimeoutError:
+                wait = min(wait * 2, SESSION_WAIT_MAX)
+
+    async def _wait_mfa_holding_lock(self, payer_id: str, credential_id: str) -> None:
+        while self.state.waiting_mfa:
+            try:
+                await workflow.wait_condition(lambda: not self.state.waiting_mfa, timeout=SESSION_LOCK_REFRESH)
+            except asyncio.TimeoutError:
+                held = await workflow.execute_activity(
+                    "session_refresh",
+                    args=[payer_id, credential_id, workflow.info().workflow_id],
+                    task_queue=activity_queue(IO),
+                    start_to_close_timeout=timedelta(seconds=30),
+                )
+                if not held:
+                    workflow.logger.warning("session lock for %s expired while waiting for MFA", payer_id)
+
+    @workflow.run
+    async def run(
+        self,
+        flow_id: str,
+        flow_hash: str | None = None,
+        local_emit: bool = True,
+        payer_id: str | None = None,
+        credential_id: str | None = None,
+        record_run_id: str | None = None,
+        inputs: dict[str, Any] | None = None,
+    ) -> dict:
+        self.local_emit = local_emit
+        # Each patch below marks a command sequence that changed after runs
+        # were already in flight; unpatched branches replay the old histories
+        use_session = bool(payer_id and credential_id) and workflow.patched("payer-session")
+        # Without a session cache every run logs in; with one, only the
+        # workflow that checked out the re-auth lock does (and releases it)
+        login = not use_session
+        try:
+            if use_session:
+                login = await self._checkout_session(payer_id, credential_id)
+                self.state.session = "login" if login else "cached"
+            if login:
+                # Enter waiting state first (reduces race for queries)
+                self.state.waiting_mfa = True
+                # Emit a breakpoint requiring MFA
+                await self._emit({"type": "breakpoint.mfa.requested", "payload": {"flow_id": flow_id}})
+                # Wait for MFA signal indefinitely (test endpoint convenience)
+                if use_session and workflow.patched("session-lock-refresh"):
+                    await self._wait_mfa_holding_lock(payer_id, credential_id)
+                else:
+                    await workflow.wait_condition(lambda: not self.state.waiting_mfa)
+            # Only the flow's content hash goes through workflow history; the
+            # activity resolves it to compiled IR on the worker. Session state
+            # stays in the encrypted cache and is referenced by credential id.
+            steps = 0
+            extracted: dict[str, Any] = {}
+            emitted: list[dict[str, Any]] = []
+            if not workflow.patched("run-steps-activity"):
+                # Older runs were started with the step list as the second argument
+                steps = len(flow_hash or ())
+            elif flow_hash:
+                # The run's input fills the flow's {{...}} templates
+                params: dict[str, Any] = dict(inputs or {})
+                if payer_id:
+                    params["payer_id"] = payer_id
+                if use_session:
+                    params["session"] = {"credential_id": credential_id, "save": login}
+                if self.state.mfa_code is not None:
+                    # For flows that type the code in themselves ({{mfa_code}})
+                    params["mfa_code"] = self.state.mfa_code
+                result = await workflow.execute_activity(
+                    "run_steps",
+                    args=[flow_hash, params],
+                    task_queue=activity_queue(BROWSER),
+                    start_to_close_timeout=timedelta(minutes=5),
+                )
+                steps = result["steps"]
+                extracted = result.get("extracted") or {}
+                emitted = result.get("emitted") or []
+                if result.get("breakpoint") is not None and workflow.patched("breakpoint-fails"):
+                    # Stopped for a human mid-flow: nothing was checked
+                    raise ApplicationError(
+                        f"flow stopped at breakpoint: {result['breakpoint']}",
+                        type="FlowBreakpoint",
+                        non_retryable=True,
+                    )
+        except Exception as e:
+            busy = isinstance(e, ApplicationError) and e.type == "SessionBusy"
+            if busy and not workflow.patched("session-busy-recorded"):
+                raise  # older histories failed before recording anything
+            if record_run_id:
+                error_code = "session_busy" if busy else "portal_error"
+                await self._record(record_run_id, None, f"{type(e).__name__}: {e}", error_code)
+            if workflow.patched("run-failed-event"):
+                await self._emit({"type": "run.failed", "payload": {"flow_id": flow_id, "error": type(e).__name__}})
+            raise
+        finally:
+            if use_session and login:
+                await workflow.execute_activity(
+                    "session_release",
+                    args=[payer_id, credential_id, workflow.info().workflow_id],
+                    task_queue=activity_queue(IO),
+                    start_to_close_timeout=timedelta(seconds=30),
+                )
+        self.state.output = {
+            "flow_id": flow_id,
+            "flow_hash": flow_hash,
+            "steps": steps,
+            "extracted": extracted,
+            "emitted": emitted,
+            "session": self.state.session,
+            "status": "ok",
+        }
+        if record_run_id:
+            await self._record(record_run_id, self.state.output, None)
+        await self._emit({"type": "run.succeeded", "payload": {"flow_id": flow_id}})
         return self.state.output
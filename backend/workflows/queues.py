@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from temporalio import workflow
+
+
+# Workflows poll the base task queue; activities are split by cost onto
+# queues derived from it (portal -> portal-browser, portal-io), each served by
+# its own pool of worker processes (backend.workers.supervisor).
+WORKFLOW = "workflow"
+BROWSER = "browser"
+IO = "io"
+ROLES = (WORKFLOW, BROWSER, IO)
+
+
+def queue_name(base: str, role: str) -> str:
+    return base if role == WORKFLOW else f"{base}-{role}"
+
+
+def activity_queue(role: str) -> str:
+    # Only valid inside workflow code; derived from the running workflow's
+    # queue so no settings are read in the sandbox
+    return queue_name(workflow.info().task_queue, role)
@@ -23,5 +23,10 @@ PY
 echo "[api] Running migrations..."
 alembic upgrade head
 
+# Per-process metric files, aggregated on /metrics; cleared so samples from
+# previous container runs don't linger
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "[api] Starting API server..."
 exec uvicorn backend.app.main:app --host 0.0.0.0 --port 8000
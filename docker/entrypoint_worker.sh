@@ -20,5 +20,10 @@ print('[worker] DB not ready after timeout')
 sys.exit(1)
 PY
 
-echo "[worker] Starting Temporal worker..."
-exec python -m backend.workers.runner
+# Per-process metric files, aggregated on /metrics; cleared so samples from
+# previous container runs don't linger
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+echo "[worker] Starting Temporal worker supervisor..."
+exec python -m backend.workers.supervisor
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0002_batches"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "batches",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("purpose", sa.String(length=64), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("status", sa.Enum("ingesting", "ready", "failed", name="batchstatus"), nullable=False, server_default="ingesting"),
+        sa.Column("total_rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("valid_rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("invalid_rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("errors_key", sa.String(length=512), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+
+    # Rows arrive via COPY, so every column not in the COPY list needs a server default
+    op.create_table(
+        "batch_items",
+        sa.Column("batch_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("row_num", sa.Integer(), primary_key=True),
+        sa.Column("idempotency_key", sa.String(length=512), nullable=False),
+        sa.Column("input_payload", sa.JSON(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM("queued", "running", "succeeded", "failed", name="runstatus", create_type=False),
+            nullable=False,
+            server_default="queued",
+        ),
+        sa.Column("run_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+
+    op.create_index("ix_batch_items_batch_id_status", "batch_items", ["batch_id", "status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_batch_items_batch_id_status", table_name="batch_items")
+    op.drop_table("batch_items")
+    op.drop_table("batches")
+    sa.Enum(name="batchstatus").drop(op.get_bind(), checkfirst=True)
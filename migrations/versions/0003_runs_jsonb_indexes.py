@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0003_runs_jsonb_indexes"
+down_revision = "0002_batches"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Rewrites the table once; everything after this only adds indexes
+    op.alter_column("runs", "input_payload", type_=postgresql.JSONB(), postgresql_using="input_payload::jsonb")
+    op.alter_column("runs", "output_payload", type_=postgresql.JSONB(), postgresql_using="output_payload::jsonb")
+
+    # Build indexes without blocking writers on large tables
+    with op.get_context().autocommit_block():
+        # Listing is newest-first with (created_at, id) as the keyset cursor
+        op.create_index(
+            "ix_runs_payer_status_created", "runs", ["payer_id", "status", "created_at", "id"], postgresql_concurrently=True
+        )
+        op.create_index("ix_runs_status_created", "runs", ["status", "created_at", "id"], postgresql_concurrently=True)
+        op.create_index("ix_runs_purpose_created", "runs", ["purpose", "created_at", "id"], postgresql_concurrently=True)
+        op.create_index("ix_runs_created", "runs", ["created_at", "id"], postgresql_concurrently=True)
+        op.create_index(
+            "ix_runs_input_member_id",
+            "runs",
+            [sa.text("(input_payload ->> 'member_id')")],
+            postgresql_concurrently=True,
+        )
+        # Containment (@>) filters on any other business id
+        op.create_index(
+            "ix_runs_input_payload_gin",
+            "runs",
+            ["input_payload"],
+            postgresql_using="gin",
+            postgresql_ops={"input_payload": "jsonb_path_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in (
+            "ix_runs_input_payload_gin",
+            "ix_runs_input_member_id",
+            "ix_runs_created",
+            "ix_runs_purpose_created",
+            "ix_runs_status_created",
+            "ix_runs_payer_status_created",
+        ):
+            op.drop_index(name, table_name="runs", postgresql_concurrently=True)
+    op.alter_column("runs", "output_payload", type_=sa.JSON(), postgresql_using="output_payload::json")
+    op.alter_column("runs", "input_payload", type_=sa.JSON(), postgresql_using="input_payload::json")
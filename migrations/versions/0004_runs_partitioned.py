@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0004_runs_partitioned"
+down_revision = "0003_runs_jsonb_indexes"
+branch_labels = None
+depends_on = None
+
+
+_INDEXES = (
+    "ix_runs_payer_status_created",
+    "ix_runs_status_created",
+    "ix_runs_purpose_created",
+    "ix_runs_created",
+    "ix_runs_input_member_id",
+    "ix_runs_input_payload_gin",
+)
+
+# Creates monthly partitions from `start_month` through `months_ahead` months
+# from now. Idempotent; also run by the archiver so partitions always exist
+# before rows for that month arrive (the default partition only catches gaps).
+_ENSURE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION runs_ensure_partitions(start_month date, months_ahead int)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    m date := date_trunc('month', start_month)::date;
+    stop date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+BEGIN
+    WHILE m <= stop LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF runs FOR VALUES FROM (%L) TO (%L)',
+            'runs_' || to_char(m, 'YYYY_MM'), m, (m + interval '1 month')::date
+        );
+        m := (m + interval '1 month')::date;
+    END LOOP;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.rename_table("runs", "runs_legacy")
+    for name in _INDEXES:
+        op.drop_index(name, table_name="runs_legacy")
+
+    # The partition key has to be part of the primary key; ids stay unique on
+    # their own (UUIDs), the ORM keeps addressing runs by id.
+    op.create_table(
+        "runs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("purpose", sa.String(length=64), nullable=False),
+        sa.Column("payer_id", sa.String(length=64), nullable=False),
+        sa.Column("provider_npi", sa.String(length=20), nullable=True),
+        sa.Column(
+            "status",
+            postgresql.ENUM("queued", "running", "succeeded", "failed", name="runstatus", create_type=False),
+            nullable=False,
+            server_default="queued",
+        ),
+        sa.Column("source", sa.String(length=32), nullable=True),
+        sa.Column("input_payload", postgresql.JSONB(), nullable=True),
+        sa.Column("output_payload", postgresql.JSONB(), nullable=True),
+        sa.Column("error_code", sa.String(length=64), nullable=True),
+        sa.Column("error_msg", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("archive_key", sa.String(length=512), nullable=True),
+        sa.PrimaryKeyConstraint("id", "created_at", name="pk_runs"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute(_ENSURE_PARTITIONS)
+    op.execute(
+        "SELECT runs_ensure_partitions(coalesce((SELECT min(created_at) FROM runs_legacy), now())::date, 3)"
+    )
+    op.execute("CREATE TABLE runs_default PARTITION OF runs DEFAULT")
+
+    # Defined on the parent, so every current and future partition gets them
+    op.create_index("ix_runs_payer_status_created", "runs", ["payer_id", "status", "created_at", "id"])
+    op.create_index("ix_runs_status_created", "runs", ["status", "created_at", "id"])
+    op.create_index("ix_runs_purpose_created", "runs", ["purpose", "created_at", "id"])
+    op.create_index("ix_runs_created", "runs", ["created_at", "id"])
+    op.create_index("ix_runs_input_member_id", "runs", [sa.text("(input_payload ->> 'member_id')")])
+    op.create_index(
+        "ix_runs_input_payload_gin",
+        "runs",
+        ["input_payload"],
+        postgresql_using="gin",
+        postgresql_ops={"input_payload": "jsonb_path_ops"},
+    )
+
+    op.execute(
+        "INSERT INTO runs (id, purpose, payer_id, provider_npi, status, source, input_payload, output_payload,"
+        " error_code, error_msg, created_at, updated_at)"
+        " SELECT id, purpose, payer_id, provider_npi, status, source, input_payload, output_payload,"
+        " error_code, error_msg, created_at, updated_at FROM runs_legacy"
+    )
+    op.drop_table("runs_legacy")
+
+
+def downgrade() -> None:
+    op.rename_table("runs", "runs_partitioned")
+    op.create_table(
+        "runs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("purpose", sa.String(length=64), nullable=False),
+        sa.Column("payer_id", sa.String(length=64), nullable=False),
+        sa.Column("provider_npi", sa.String(length=20), nullable=True),
+        sa.Column(
+            "status",
+            postgresql.ENUM("queued", "running", "succeeded", "failed", name="runstatus", create_type=False),
+            nullable=False,
+            server_default="queued",
+        ),
+        sa.Column("source", sa.String(length=32), nullable=True),
+        sa.Column("input_payload", postgresql.JSONB(), nullable=True),
+        sa.Column("output_payload", postgresql.JSONB(), nullable=True),
+        sa.Column("error_code", sa.String(length=64), nullable=True),
+        sa.Column("error_msg", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    # Archived payloads stay in object storage; rows keep NULL payloads
+    op.execute(
+        "INSERT INTO runs SELECT id, purpose, payer_id, provider_npi, status, source, input_payload, output_payload,"
+        " error_code, error_msg, created_at, updated_at FROM runs_partitioned"
+    )
+    op.drop_table("runs_partitioned")  # drops all partitions
+    op.execute("DROP FUNCTION IF EXISTS runs_ensure_partitions(date, int)")
+    op.create_index("ix_runs_payer_status_created", "runs", ["payer_id", "status", "created_at", "id"])
+    op.create_index("ix_runs_status_created", "runs", ["status", "created_at", "id"])
+    op.create_index("ix_runs_purpose_created", "runs", ["purpose", "created_at", "id"])
+    op.create_index("ix_runs_created", "runs", ["created_at", "id"])
+    op.create_index("ix_runs_input_member_id", "runs", [sa.text("(input_payload ->> 'member_id')")])
+    op.create_index(
+        "ix_runs_input_payload_gin",
+        "runs",
+        ["input_payload"],
+        postgresql_using="gin",
+        postgresql_ops={"input_payload": "jsonb_path_ops"},
+    )
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_batch_item_leases"
+down_revision = "0004_runs_partitioned"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Claims are leases: the claimant renews claimed_at while it works on the
+    # item, and an expired lease puts the item back to queued
+    op.add_column("batch_items", sa.Column("claimed_by", sa.String(length=128), nullable=True))
+    op.add_column("batch_items", sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True))
+
+    with op.get_context().autocommit_block():
+        # Only running items hold leases, so the reaper's scan stays small
+        op.create_index(
+            "ix_batch_items_lease",
+            "batch_items",
+            ["claimed_at"],
+            postgresql_where=sa.text("status = 'running'"),
+            postgresql_concurrently=True,
+        )
+        # Items linked to a run by idempotency key finish when that run does
+        op.create_index("ix_batch_items_run_id", "batch_items", ["run_id"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_batch_items_run_id", table_name="batch_items", postgresql_concurrently=True)
+        op.drop_index("ix_batch_items_lease", table_name="batch_items", postgresql_concurrently=True)
+    op.drop_column("batch_items", "claimed_at")
+    op.drop_column("batch_items", "claimed_by")
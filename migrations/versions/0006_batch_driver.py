@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0006_batch_driver"
+down_revision = "0005_batch_item_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    driver = postgresql.ENUM("executor", "workflow", name="batchdriver")
+    driver.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        "batches",
+        sa.Column(
+            "driver",
+            postgresql.ENUM("executor", "workflow", name="batchdriver", create_type=False),
+            nullable=False,
+            server_default="executor",
+        ),
+    )
+
+    with op.get_context().autocommit_block():
+        # BatchFlow looks up what a retried claim activity already claimed
+        op.create_index(
+            "ix_batch_items_claimed_by",
+            "batch_items",
+            ["batch_id", "claimed_by"],
+            postgresql_where=sa.text("claimed_by IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_batch_items_claimed_by", table_name="batch_items", postgresql_concurrently=True)
+    op.drop_column("batches", "driver")
+    sa.Enum(name="batchdriver").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from backend.app.settings import get_settings
+
+
+# Modules such as backend.app.db read settings at import time
+for name, value in {
+    "DATABASE_URL": "postgresql+asyncpg://test/test",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "S3_ACCESS_KEY": "test",
+    "S3_SECRET_KEY": "test",
+    "S3_BUCKET": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def settings():
+    get_settings.cache_clear()
+    yield get_settings()
+    get_settings.cache_clear()
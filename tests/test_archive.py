@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.app.services import archive
+from backend.app.services.archive import archive_key, load_archived_many, pack, unpack
+from backend.app.services.runs import run_by_id, runs_by_ids
+from backend.app.utils.ids import uuid7, uuid7_time
+
+
+def test_uuid7_layout_and_time():
+    ts = 1_717_243_815.123
+    u = uuid7(ts)
+    assert u.version == 7 and u.variant == uuid.RFC_4122
+    assert uuid7_time(u) == datetime.fromtimestamp(1_717_243_815.123, tz=timezone.utc)
+    assert uuid7_time(uuid.uuid4()) is None
+
+
+def test_uuid7_sorts_by_time():
+    ids = [uuid7(1_700_000_000 + n / 1000) for n in range(50)]
+    assert sorted(ids) == ids
+    assert len({uuid7(1_700_000_000) for _ in range(100)}) == 100
+
+
+def sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_id_lookups_are_bounded_to_the_ids_partitions():
+    assert "BETWEEN" in sql(run_by_id(uuid7()))
+    assert "BETWEEN" not in sql(run_by_id(uuid.uuid4()))  # legacy ids probe every partition
+    assert "BETWEEN" in sql(runs_by_ids([uuid7(1_700_000_000), uuid7(1_710_000_000)]))
+    assert "BETWEEN" not in sql(runs_by_ids([uuid7(), uuid.uuid4()]))
+
+
+def test_pack_round_trips_and_keys_group_by_month():
+    blob = pack({"member_id": "M1"}, {"plan": "Gold", "copay": {"amount": 20}})
+    assert unpack(blob) == ({"member_id": "M1"}, {"plan": "Gold", "copay": {"amount": 20}})
+    assert unpack(pack(None, None)) == (None, None)
+    assert archive_key("r1", datetime(2024, 6, 30, 23, 59)) == "archive/runs/2024-06/r1.json.zst"
+
+
+@pytest.mark.asyncio
+async def test_load_archived_many_fetches_each_key_once(monkeypatch):
+    fetched = []
+
+    def get_bytes(key):
+        fetched.append(key)
+        return pack({"key": key}, None)
+
+    monkeypatch.setattr(archive, "get_bytes", get_bytes)
+    out = await load_archived_many(["a", "b", "a"])
+    assert out == {"a": ({"key": "a"}, None), "b": ({"key": "b"}, None)}
+    assert sorted(fetched) == ["a", "b"]
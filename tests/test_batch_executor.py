@@ -0,0 +1,151 @@
+import asyncio
+import uuid
+
+import pytest
+
+from backend.app.models import RunStatus
+from backend.app.services.batches import Item
+from backend.workers import batch_executor
+from backend.workers.batch_executor import BatchExecutor, _is_lockout
+
+
+def item(**kw) -> Item:
+    fields = dict(
+        batch_id=uuid.uuid4(),
+        row_num=0,
+        run_id=uuid.uuid4(),
+        payer_id="availity",
+        purpose="eligibility",
+        owner=True,
+    )
+    fields.update(kw)
+    return Item(**fields)
+
+
+class PortalError(Exception):
+    def __init__(self, msg: str, status: int | None = None) -> None:
+        super().__init__(msg)
+        self.status = status
+
+
+@pytest.mark.parametrize(
+    "exc, lockout",
+    [
+        (RuntimeError("Account locked, call support"), True),
+        (RuntimeError("portal returned HTTP 429"), True),
+        (RuntimeError("upstream status=429"), True),
+        (PortalError("slow down", status=429), True),
+        (RuntimeError("member not found for claim 94291-429"), False),
+        (RuntimeError("NPI 1429012345 is not enrolled"), False),
+        (RuntimeError("connect to 10.0.0.5:4290 refused"), False),
+        (PortalError("server error", status=503), False),
+    ],
+)
+def test_is_lockout(exc, lockout):
+    assert _is_lockout(exc) is lockout
+
+
+def test_is_lockout_follows_the_cause_chain():
+    try:
+        try:
+            raise PortalError("too many requests")
+        except PortalError as e:
+            raise RuntimeError("Workflow execution failed") from e
+    except RuntimeError as e:
+        assert _is_lockout(e)
+
+
+@pytest.fixture
+def executor(settings, monkeypatch):
+    ex = BatchExecutor()
+    recorded: list[tuple] = []
+
+    async def record(it, status, **result):
+        recorded.append((it.run_id, status, result))
+
+    monkeypatch.setattr(ex, "_record", record)
+    ex.recorded = recorded
+    return ex
+
+
+class FlakyBucket:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+
+    async def acquire(self) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis down")
+
+    async def cooldown(self, seconds: float) -> None:
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_lane_survives_rate_limiter_failures(executor, monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda s: sleep(0))  # no backoff
+    ran: list[Item] = []
+
+    async def execute(lane, it):
+        ran.append(it)
+        await lane.limiter.release(0.1, True)
+
+    monkeypatch.setattr(executor, "_execute", execute)
+    lane = executor._lane("availity")
+    lane.bucket = FlakyBucket(failures=2)
+    first = item()
+    lane.push(first)
+    for _ in range(50):
+        await asyncio.sleep(0)
+        if ran:
+            break
+    assert ran == [first]
+    assert lane.limiter.inflight == 0
+    for task in executor._lane_tasks:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_dead_lane_is_restarted(executor, monkeypatch):
+    started = []
+
+    async def crash_once(lane):
+        started.append(lane)
+        if len(started) == 1:
+            raise RuntimeError("boom")
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(executor, "_lane_loop", crash_once)
+    lane = executor._lane("availity")
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert started == [lane, lane]
+    (task,) = executor._lane_tasks
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert executor._lane_tasks == set()  # cancelled on shutdown: stays down
+
+
+@pytest.mark.asyncio
+async def test_result_is_recorded_when_cooldown_fails(executor, monkeypatch):
+    async def noop(*args, **kwargs):
+        return None
+
+    async def locked_out(*args):
+        raise RuntimeError("too many requests")
+
+    monkeypatch.setattr(batch_executor, "set_item_status", noop)
+    monkeypatch.setattr(batch_executor.get_bus(), "publish", noop)
+    monkeypatch.setattr(batch_executor, "run_portal_flow", locked_out)
+    lane = executor._lane("availity")
+    lane.bucket = FlakyBucket(failures=0)
+    it = item()
+    await lane.limiter.acquire()
+    await executor._execute(lane, it)
+
+    assert executor.recorded == [(it.run_id, RunStatus.failed, {"output": None, "error": "RuntimeError: too many requests"})]
+    assert lane.limiter.inflight == 0 and lane.limiter.limit == 1
+    for task in executor._lane_tasks:
+        task.cancel()
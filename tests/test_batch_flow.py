@@ -0,0 +1,106 @@
+import uuid
+
+import pytest
+from temporalio import activity, workflow
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Replayer, Worker
+
+from backend.workflows.batch import BatchFlow, BatchParams
+from backend.workflows.queues import IO, queue_name
+
+
+QUEUE = "batch-test"
+
+
+def item(row_num: int, payer_id: str = "availity", **extra) -> dict:
+    return {
+        "batch_id": "b1",
+        "row_num": row_num,
+        "payer_id": payer_id,
+        "run_id": str(uuid.uuid4()),
+        "owner": True,
+        "local_emit": True,
+        "flow_hash": "f" * 64,
+        "credential_id": None,
+        "input": {"member_id": f"M{row_num}"},
+        **extra,
+    }
+
+
+queued: list[dict] = []
+limits: list[int] = []
+infos: list[str] = []
+recorded: list[tuple] = []
+
+
+@activity.defn(name="get_batch_info")
+async def get_batch_info(batch_id: str) -> dict:
+    infos.append(batch_id)
+    return {"purpose": "eligibility", "valid_rows": 7}
+
+
+@activity.defn(name="claim_batch_page")
+async def claim_batch_page(batch_id: str, purpose: str, limit: int) -> list[dict]:
+    limits.append(limit)
+    page = queued[:limit]
+    del queued[:limit]
+    return page
+
+
+@activity.defn(name="record_batch_item")
+async def record_batch_item(item: dict, output: dict | None, error: str | None) -> None:
+    recorded.append((item["row_num"], output, error))
+
+
+@workflow.defn(name="PortalFlow")
+class FakePortalFlow:
+    # Stands in for the child so the batch test needs no browser activities
+    @workflow.run
+    async def run(self, purpose, flow_hash, local_emit, payer_id, credential_id, record_run_id, inputs) -> dict:
+        if payer_id == "broken":
+            raise ApplicationError("portal down", non_retryable=True)
+        return {"status": "ok", "member_id": inputs["member_id"]}
+
+
+@pytest.mark.asyncio
+async def test_batch_flow_continues_as_new_with_progress():
+    queued[:] = [
+        item(1),
+        item(2),
+        item(3, owner=False),  # linked to a run another item drives
+        item(4),
+        item(5, error="not_configured"),
+        item(6, payer_id="broken"),
+        item(7),
+    ]
+    for seen in (limits, infos, recorded):
+        seen.clear()
+
+    async with await WorkflowEnvironment.start_time_skipping() as env:
+        async with (
+            Worker(env.client, task_queue=QUEUE, workflows=[BatchFlow, FakePortalFlow]),
+            Worker(
+                env.client,
+                task_queue=queue_name(QUEUE, IO),
+                activities=[get_batch_info, claim_batch_page, record_batch_item],
+            ),
+        ):
+            handle = await env.client.start_workflow(
+                BatchFlow.run,
+                BatchParams("b1", window=2, page_size=3, continue_every=2),
+                id=f"batch-{uuid.uuid4()}",
+                task_queue=QUEUE,
+            )
+            progress = await handle.result()
+            await Replayer(workflows=[BatchFlow]).replay_workflow(await handle.fetch_history())
+
+    assert progress.generations == 3
+    assert (progress.total, progress.claimed, progress.running) == (7, 7, 0)
+    assert (progress.succeeded, progress.failed, progress.linked) == (4, 2, 1)
+    # purpose is resolved once and carried across continue_as_new
+    assert infos == ["b1"]
+    # never claims more than the current run will start
+    assert limits == [2, 2, 1, 1, 2, 1]
+    assert sorted(r[0] for r in recorded) == [1, 2, 4, 6, 7]
+    assert [r[0] for r in recorded if r[2] is not None] == [6]
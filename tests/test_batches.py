@@ -0,0 +1,48 @@
+import uuid
+
+from backend.app.models import Run, RunStatus
+from backend.app.services.batches import link_rows
+
+
+def run(status: RunStatus = RunStatus.queued) -> Run:
+    return Run(id=uuid.uuid4(), purpose="eligibility", payer_id="availity", status=status)
+
+
+def owners(rows, runs, created=(), driven=()):
+    return [(r.id, status, owner) for r, status, owner in link_rows(rows, runs, set(created), set(driven))]
+
+
+def test_created_run_is_driven_by_its_first_row():
+    r = run()
+    rows = [(0, "k", {}, None), (1, "k", {}, None)]
+    assert owners(rows, {"k": r}, created={r.id}) == [(r.id, RunStatus.running, True), (r.id, RunStatus.running, False)]
+
+
+def test_row_duplicating_an_undriven_api_run_drives_it():
+    # POST /runs created the run and started nothing: it stays queued
+    # unless the batch row sharing its key drives it
+    api_run = run()
+    rows = [(0, "k", {}, None), (1, "k", {}, None)]
+    assert owners(rows, {"k": api_run}) == [
+        (api_run.id, RunStatus.running, True),
+        (api_run.id, RunStatus.running, False),
+    ]
+
+
+def test_row_links_to_a_run_another_claim_drives():
+    queued, running = run(), run(RunStatus.running)
+    rows = [(0, "q", {}, None), (1, "r", {}, None)]
+    assert owners(rows, {"q": queued, "r": running}, driven={queued.id}) == [
+        (queued.id, RunStatus.running, False),
+        (running.id, RunStatus.running, False),
+    ]
+
+
+def test_finished_run_finishes_the_row():
+    done = run(RunStatus.succeeded)
+    assert owners([(0, "k", {}, None)], {"k": done}) == [(done.id, RunStatus.succeeded, False)]
+
+
+def test_row_drives_its_run_again_after_an_expired_lease():
+    r = run(RunStatus.running)
+    assert owners([(0, "k", {}, r.id)], {"k": r}) == [(r.id, RunStatus.running, True)]
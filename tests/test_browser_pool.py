@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from backend.agents.playwright_executor import BrowserPool, PooledBrowser
+
+
+class FakeContext:
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.connected = True
+        self._handlers = []
+
+    def on(self, event, fn):
+        self._handlers.append(fn)
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    async def close(self):
+        self.crash()
+
+    def crash(self):
+        self.connected = False
+        for fn in self._handlers:
+            fn(self)
+
+
+class FakePlaywright:
+    def __init__(self) -> None:
+        self.chromium = self
+        self.launched = 0
+
+    async def launch(self, **kwargs):
+        self.launched += 1
+        return FakeBrowser()
+
+    async def stop(self):
+        pass
+
+
+def pool(**kw) -> BrowserPool:
+    p = BrowserPool(**kw)
+    p._pw = FakePlaywright()
+    p._browsers = [PooledBrowser(i, 0, FakeBrowser(), None) for i in range(p.size)]
+    p._started = True
+    return p
+
+
+async def settle(until=lambda: False):
+    # Relaunches run in the background (and look up the pid in a thread)
+    for _ in range(200):
+        if until():
+            return
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_contexts_go_to_the_least_loaded_browser():
+    p = pool(size=2, contexts_per_browser=2)
+    async with p.context("a"), p.context("a"):
+        assert [b.active for b in p._browsers] == [1, 1]
+        assert p.stats()["per_payer"] == {"a": 2}
+    assert p.stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_payer_limit_waits_for_a_release():
+    p = pool(size=1, contexts_per_browser=4, payer_limits={"a": 1})
+    waiting = p.context("a")
+    async with p.context("a"):
+        second = asyncio.ensure_future(waiting.__aenter__())
+        await settle()
+        assert not second.done()
+        async with p.context("b"):  # other payers still get slots
+            pass
+    await asyncio.wait_for(second, 1)
+    await waiting.__aexit__(None, None, None)
+    assert p.stats()["per_payer"] == {"a": 0, "b": 0}
+
+
+@pytest.mark.asyncio
+async def test_browser_is_recycled_after_max_contexts():
+    p = pool(size=1, max_contexts=2)
+    first = p._browsers[0]
+    for _ in range(2):
+        async with p.context():
+            pass
+    await settle(lambda: p._browsers[0] not in (None, first))
+    assert p._browsers[0] is not first and p._browsers[0].generation > 0
+    assert not first.crashed  # drained, not crashed
+    await p.close()
+
+
+@pytest.mark.asyncio
+async def test_crashed_browser_is_replaced_and_skipped_meanwhile():
+    p = pool(size=2)
+    crashed = p._browsers[0]
+    async with p.context():
+        crashed.browser.crash()
+    assert crashed.crashed and not crashed.usable
+    await settle(lambda: p._browsers[0] not in (None, crashed))
+    assert p._browsers[0] is not crashed and p._pw.launched == 1
+    await p.close()
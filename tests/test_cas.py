@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from backend.app.artifacts.cas import MAX_CHUNK, MIN_CHUNK, ChunkStore, MemoryStore, chunk_boundaries
+
+
+def page(seed: int, rows: int = 3000) -> bytes:
+    rnd = random.Random(seed)
+    return b"".join(
+        f'<tr class="r{i % 7}"><td>{rnd.randrange(10**9)}</td><td>member {i}</td></tr>\n'.encode() for i in range(rows)
+    )
+
+
+@pytest.mark.parametrize("data", [b"", b"x" * 10, page(1), b"y" * (3 * MAX_CHUNK + 5)])
+def test_boundaries_tile_the_data_within_size_limits(data):
+    bounds = chunk_boundaries(data)
+    assert b"".join(data[s:e] for s, e in bounds) == data
+    assert all(prev[1] == cur[0] for prev, cur in zip(bounds, bounds[1:]))
+    assert all(e - s <= MAX_CHUNK for s, e in bounds)
+    assert all(e - s >= MIN_CHUNK for s, e in bounds[:-1] if e - s < MAX_CHUNK)
+
+
+def test_an_edit_only_moves_nearby_cuts():
+    before = page(1)
+    after = before[:50_000] + b"<p>inserted</p>\n" + before[50_000:]
+    chunks = lambda d: {d[s:e] for s, e in chunk_boundaries(d)}
+    old, new = chunks(before), chunks(after)
+    assert len(old) > 10
+    assert len(old - new) <= 2
+
+
+@pytest.fixture
+def store():
+    s = ChunkStore(MemoryStore(), io_threads=2)
+    yield s
+    s._pool.shutdown()
+
+
+def test_round_trip_and_dedupe(store):
+    data = page(2)
+    manifest, first = store.put("dom.html", data, "text/html")
+    assert store.get(manifest) == data
+    assert first.new_chunks == len({c.key for c in manifest.chunks}) and first.new_stored_bytes < len(data)
+
+    again, second = store.put("dom.html", data, "text/html")
+    assert again.chunks == manifest.chunks
+    assert second.new_chunks == 0 and second.bytes_saved == len(data)
+
+
+@pytest.mark.asyncio
+async def test_run_artifact_streams_back_from_its_manifest(store):
+    data = page(3)
+    store.put_run_artifact("run-1", "failure.html", data, "text/html")
+    manifest = store.read_manifest("run-1", "failure.html")
+    assert (manifest.content_type, manifest.size) == ("text/html", len(data))
+    assert b"".join([part async for part in store.iter_object(manifest, lookahead=2)]) == data
+    with pytest.raises(KeyError):
+        store.read_manifest("run-1", "missing.html")
+
+
+def test_payer_dictionary_is_used_for_new_artifacts(store):
+    samples = [page(seed, rows=200) for seed in range(40)]
+    dict_key = store.train_dictionary("availity", samples, size=16_384)
+    assert store.current_dictionary("availity") == dict_key
+    assert store.current_dictionary("aetna") is None
+
+    data = page(99)
+    store.put_run_artifact("run-2", "dom.html", data, payer_id="availity")
+    manifest = store.read_manifest("run-2", "dom.html")
+    assert manifest.dict_key == dict_key
+    fresh = ChunkStore(store.store, io_threads=1)  # loads the dictionary from the store
+    assert fresh.get(manifest) == data
+    fresh._pool.shutdown()
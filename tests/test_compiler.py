@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from backend.dsl.compiler import FlowCache, FlowError, Template, compile_cached, compile_flow, flow_hash
+
+
+def flow(*steps: str, version: int | None = None) -> str:
+    head = f"version: {version}\n" if version is not None else ""
+    return head + "steps:\n" + "".join(f"  - {s}\n" for s in steps)
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("steps: [", "Invalid flow:"),
+        ("- op: click", "missing steps"),
+        ("steps: []", "non-empty list"),
+        (flow("click"), "step 0 must be a mapping with 'op'"),
+        (flow("{op: hover, selector: a}"), "unknown op 'hover'"),
+        (flow("{op: click, selector: a, force: true}"), r"unknown params \['force'\]"),
+        (flow("{op: input, selector: a}"), r"missing params \['value'\]"),
+        (flow("{op: click, selector: '  '}"), "selector must be a non-empty string"),
+        (flow("{op: extract, mappings: {}}"), "mappings must be a non-empty mapping"),
+        (flow("{op: extract, mappings: {id: 3}}"), "mapping 'id' needs a selector"),
+        (flow("{op: navigate, url: 'x'}", "{op: input, selector: a, value: '{{member.id}}'}"), r"step 1 \(input\) .*\['member.id'\]"),
+    ],
+)
+def test_compile_errors(source, message):
+    with pytest.raises(FlowError, match=message):
+        compile_flow(source)
+
+
+@pytest.mark.parametrize(
+    "selector, normalized",
+    [
+        ("  div   p ", "div p"),
+        ("#member\n  >\tlabel", "#member > label"),
+        ('[aria-label="Member  ID"]', '[aria-label="Member  ID"]'),
+        ("[title='a  >  b']   span", "[title='a  >  b'] span"),
+        ('text="Sign   in"', 'text="Sign   in"'),
+    ],
+)
+def test_selector_normalization(selector, normalized):
+    quoted = json.dumps(selector)
+    ir = compile_flow(flow(f"{{op: click, selector: {quoted}}}"))
+    assert ir.steps[0].selector == normalized
+    ir = compile_flow(flow(f"{{op: extract, mappings: {{a: {quoted}, b: {{selector: {quoted}, attr: href}}}}}}"))
+    assert dict(ir.steps[0].param("mappings")) == {"a": normalized, "b": (("selector", normalized), ("attr", "href"))}
+
+
+@pytest.mark.parametrize(
+    "value, params, rendered",
+    [
+        ("{{member_id}}", {"member_id": "M1"}, "M1"),
+        ("id={{ member_id }}&d={{dos}}", {"member_id": "M1", "dos": "2024-01-15"}, "id=M1&d=2024-01-15"),
+        ("{{n}}{{n}}", {"n": 7}, "77"),
+    ],
+)
+def test_template_render(value, params, rendered):
+    ir = compile_flow(flow(f"{{op: input, selector: q, value: {value!r}}}"))
+    template = ir.steps[0].param("value")
+    assert isinstance(template, Template)
+    assert template.variables == frozenset(params)
+    assert ir.variables == frozenset(params)
+    assert template.render(params) == rendered
+
+
+def test_template_missing_parameter():
+    template = compile_flow(flow("{op: input, selector: q, value: 'x{{a}}y'}")).steps[0].param("value")
+    assert template.source == "x{{a}}y"
+    with pytest.raises(KeyError, match="missing flow parameter 'a'"):
+        template.render({})
+
+
+@pytest.mark.parametrize(
+    "step, param, lowered",
+    [
+        ("{op: navigate, url: 'https://x'}", "url", "https://x"),
+        ("{op: wait, selector: a, timeout_ms: 500}", "timeout_ms", 500),
+        ("{op: emit, schema: s, map: {a: 1, b: [x, y]}}", "map", (("a", 1), ("b", ("x", "y")))),
+    ],
+)
+def test_lowered_params_are_immutable(step, param, lowered):
+    ir = compile_flow(flow(step))
+    assert ir.steps[0].param(param) == lowered
+    hash(ir)
+
+
+@pytest.mark.parametrize("version, expected", [(None, 1), (2, 2)])
+def test_flow_hash_and_version(version, expected):
+    source = flow("{op: click, selector: a}", version=version)
+    ir = compile_flow(source)
+    assert (ir.hash, ir.version) == (flow_hash(source), expected)
+    assert compile_cached(source) is compile_cached(source)
+
+
+def test_flow_cache_evicts_least_recently_used():
+    cache = FlowCache(maxsize=2)
+    a, b, c = (compile_flow(flow(f"{{op: click, selector: {s}}}")) for s in "abc")
+    cache.put(a)
+    cache.put(b)
+    assert cache.get(a.hash) is a
+    cache.put(c)
+    assert cache.get(b.hash) is None
+    assert (cache.get(a.hash), cache.get(c.hash)) == (a, c)
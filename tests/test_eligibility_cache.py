@@ -0,0 +1,82 @@
+import time
+
+import fakeredis.aioredis
+import pytest
+
+from backend.app.schemas.eligibility import EligibilityInput
+from backend.app.services.eligibility_cache import LOOKUPS, EligibilityCache, eligibility_input, normalize
+
+
+def inp(**kw) -> EligibilityInput:
+    fields = dict(
+        payer_id="aetna",
+        provider_npi="1234567893",
+        member_id="W123456789",
+        patient_last_name="Smith",
+        patient_first_name="Ann",
+        patient_dob="1980-01-02",
+        service_date="2024-06-01",
+    )
+    fields.update(kw)
+    return EligibilityInput(**fields)
+
+
+def lookups(payer: str, result: str) -> float:
+    return LOOKUPS.labels(payer, result)._value.get()
+
+
+def test_normalize_ignores_casing_whitespace_and_date_format():
+    a = inp()
+    b = inp(
+        payer_id=" Aetna ",
+        member_id="w123 456 789",
+        patient_last_name="SMITH ",
+        patient_first_name="ann",
+        patient_dob="01/02/1980",
+        service_date="20240601",
+        service_type_code="30",
+    )
+    assert normalize(a) == normalize(b)
+    assert EligibilityCache.cache_key(a) == EligibilityCache.cache_key(b)
+    assert EligibilityCache.cache_key(a) != EligibilityCache.cache_key(inp(service_date="2024-06-02"))
+
+
+def test_eligibility_input_only_for_complete_eligibility_runs():
+    payload = {"member_id": "W1", "patient_last_name": "Smith", "patient_dob": "1980-01-02", "service_date": "2024-06-01"}
+    assert eligibility_input("eligibility", "aetna", "1234567893", payload) is not None
+    assert eligibility_input("claim_status", "aetna", "1234567893", payload) is None
+    assert eligibility_input("eligibility", "aetna", "1234567893", {"member_id": "W1"}) is None
+
+
+@pytest.mark.asyncio
+async def test_entries_go_stale_then_expire():
+    redis = fakeredis.aioredis.FakeRedis()
+    cache = EligibilityCache(redis, ttl_s=60, swr_s=30)
+    assert await cache.get(inp()) is None
+
+    await cache.put(inp(), {"plan": "Gold"}, "run-1")
+    hit = await cache.get(inp(payer_id="AETNA"))
+    assert (hit.run_id, hit.output, hit.stale) == ("run-1", {"plan": "Gold"}, False)
+    assert 60 < await redis.ttl(EligibilityCache.cache_key(inp())) <= 90
+
+    await cache.put(inp(), {"plan": "Gold"}, "run-1", as_of=time.time() - 61)
+    assert (await cache.get(inp())).stale
+
+    assert await cache.invalidate_payer(" Aetna") == 1
+    assert await cache.get(inp()) is None
+
+
+@pytest.mark.asyncio
+async def test_payer_ttl_and_labels_use_the_normalized_payer():
+    cache = EligibilityCache(fakeredis.aioredis.FakeRedis(), ttl_s=3600, payer_ttls={"Aetna": 60}, payers={"aetna"})
+    assert cache.ttl_for("aetna") == cache.ttl_for(" AETNA ") == 60
+    assert cache.ttl_for("cigna") == 3600
+
+    await cache.put(inp(payer_id="Aetna"), {}, "run-1", as_of=time.time() - 120)
+    fresh_before, stale_before = lookups("aetna", "fresh"), lookups("aetna", "stale")
+    assert (await cache.get(inp(payer_id="aetna"))).stale
+    assert (lookups("aetna", "fresh"), lookups("aetna", "stale")) == (fresh_before, stale_before + 1)
+
+    other_before = lookups("other", "miss")
+    await cache.get(inp(payer_id="x' OR 1=1 --"))
+    assert lookups("other", "miss") == other_before + 1
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from backend.app.events.emitter import BufferedEmitter
+
+
+class RecordingBus:
+    def __init__(self, fail: int = 0) -> None:
+        self.batches: list[list[dict]] = []
+        self.fail = fail
+
+    async def publish_many(self, events):
+        await asyncio.sleep(0)
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("redis down")
+        self.batches.append(list(events))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_emits_share_one_publish():
+    bus = RecordingBus()
+    emitter = BufferedEmitter(bus, flush_interval=0.01)
+    await asyncio.gather(*(emitter.emit({"n": n}) for n in range(5)))
+    assert bus.batches == [[{"n": n} for n in range(5)]]
+    assert emitter.stats()["avg_batch"] == 5
+    await emitter.close()
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_interval():
+    bus = RecordingBus()
+    emitter = BufferedEmitter(bus, flush_interval=60, max_batch=3)
+    await asyncio.wait_for(asyncio.gather(*(emitter.emit({"n": n}) for n in range(3))), 1)
+    assert [len(b) for b in bus.batches] == [3]
+    await emitter.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_fails_every_emit_in_it_then_recovers():
+    bus = RecordingBus(fail=1)
+    emitter = BufferedEmitter(bus, flush_interval=0.01)
+    results = await asyncio.gather(*(emitter.emit({"n": n}) for n in range(2)), return_exceptions=True)
+    assert [type(r) for r in results] == [ConnectionError, ConnectionError]
+    await emitter.emit({"n": 2})
+    assert bus.batches == [[{"n": 2}]]
+    await emitter.close()
+
+
+@pytest.mark.asyncio
+async def test_close_writes_what_is_buffered():
+    bus = RecordingBus()
+    emitter = BufferedEmitter(bus, flush_interval=60)
+    pending = asyncio.ensure_future(emitter.emit({"n": 1}))
+    await asyncio.sleep(0)
+    await emitter.close()
+    await asyncio.wait_for(pending, 1)
+    assert bus.batches == [[{"n": 1}]]
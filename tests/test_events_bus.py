@@ -0,0 +1,117 @@
+import json
+
+import fakeredis.aioredis
+import pytest
+
+from backend.app.events.bus import EventBus
+from backend.app.events.hub import EventHub
+from backend.app.routes import events as events_route
+from backend.app.settings import get_settings
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    for name, value in {
+        "DATABASE_URL": "postgresql+asyncpg://test/test",
+        "REDIS_URL": "redis://localhost:6379/0",
+        "S3_ACCESS_KEY": "test",
+        "S3_SECRET_KEY": "test",
+        "S3_BUCKET": "test",
+        "EVENTS_STREAM_MAXLEN": "1000",
+    }.items():
+        monkeypatch.setenv(name, value)
+    get_settings.cache_clear()
+    b = EventBus()
+    b._redis = fakeredis.aioredis.FakeRedis()
+    yield b
+    get_settings.cache_clear()
+
+
+async def add(bus, *events):
+    ids = []
+    for evt in events:
+        eid = await bus._redis.xadd(bus._stream, {"data": json.dumps(evt)})
+        ids.append(eid.decode())
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_read_range_pages_strictly_after(bus):
+    ids = await add(bus, *({"type": "run.created", "n": n} for n in range(7)))
+    got = [(eid, evt["n"]) async for eid, evt in bus.read_range(ids[1], count=2)]
+    assert got == [(ids[n], n) for n in range(2, 7)]
+    assert [e async for e in bus.read_range(ids[-1])] == []
+
+
+@pytest.mark.asyncio
+async def test_trimmed_after(bus):
+    ids = await add(bus, *({"n": n} for n in range(5)))
+    assert not await bus.trimmed_after(ids[2])
+    assert not await bus.trimmed_after(ids[-1])  # nothing newer to lose
+    await bus._redis.xtrim(bus._stream, maxlen=2, approximate=False)
+    assert await bus.trimmed_after(ids[0])
+    assert not await bus.trimmed_after(ids[3])
+
+
+@pytest.mark.asyncio
+async def test_consume_redelivers_unacked_batch(bus):
+    await bus.ensure_group("g", start_id="0")
+    await bus.ensure_group("g")  # existing group is fine
+    await add(bus, {"n": 0}, {"n": 1}, {"n": 2})
+
+    gen = bus.consume("g", "c1", count=2, block_ms=10)
+    first = await gen.__anext__()
+    assert [evt["n"] for _, evt in first] == [0, 1]
+    await gen.aclose()  # "crash" before asking for the next batch: nothing acked
+
+    gen = bus.consume("g", "c1", count=2, block_ms=10)
+    assert [evt["n"] for _, evt in await gen.__anext__()] == [0, 1]
+    assert [evt["n"] for _, evt in await gen.__anext__()] == [2]
+    await gen.aclose()
+    pending = await bus._redis.xpending(bus._stream, "g")
+    assert pending["pending"] == 1  # only the batch not yet followed by a read
+
+
+@pytest.mark.asyncio
+async def test_event_stream_resets_when_resume_point_was_trimmed(bus, monkeypatch):
+    ids = await add(bus, *({"type": "run.running", "run_id": "r1", "n": n} for n in range(5)))
+    await bus._redis.xtrim(bus._stream, maxlen=2, approximate=False)
+    hub = EventHub(bus=bus)
+    monkeypatch.setattr(hub, "_ensure_started", lambda: None)
+    monkeypatch.setattr(events_route, "get_bus", lambda: bus)
+    monkeypatch.setattr(events_route, "get_hub", lambda: hub)
+
+    stream = events_route._event_stream(run_id="r1", last_event_id=ids[0])
+    frames = [await stream.__anext__() for _ in range(3)]
+    await stream.aclose()
+
+    assert frames[0].startswith(b"event: reset\n")
+    assert json.loads(frames[0].split(b"data: ", 1)[1]) == {"type": "stream.reset", "last_event_id": ids[0]}
+    assert frames[1].startswith(f"id: {ids[3]}\n".encode())
+    assert frames[2].startswith(f"id: {ids[4]}\n".encode())
+
+
+@pytest.mark.asyncio
+async def test_event_stream_resumes_without_reset(bus, monkeypatch):
+    ids = await add(bus, *({"type": "run.running", "run_id": "r1", "n": n} for n in range(3)))
+    hub = EventHub(bus=bus)
+    monkeypatch.setattr(hub, "_ensure_started", lambda: None)
+    monkeypatch.setattr(events_route, "get_bus", lambda: bus)
+    monkeypatch.setattr(events_route, "get_hub", lambda: hub)
+
+    stream = events_route._event_stream(run_id="r1", last_event_id=ids[0])
+    frames = [await stream.__anext__() for _ in range(2)]
+    await stream.aclose()
+
+    assert [f.split(b"\n", 1)[0] for f in frames] == [f"id: {ids[1]}".encode(), f"id: {ids[2]}".encode()]
+
+
+@pytest.mark.asyncio
+async def test_consume_side_stream(bus):
+    await bus.ensure_group("wake", stream="batches:wake")
+    await bus.append("batches:wake", {"batch_id": "b1"}, maxlen=10)
+    await add(bus, {"type": "run.created"})  # the events stream is not read
+
+    gen = bus.consume("wake", "c1", stream="batches:wake", block_ms=10)
+    assert [evt for _, evt in await gen.__anext__()] == [{"batch_id": "b1"}]
+    await gen.aclose()
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+import uuid
+import zlib
+
+import pytest
+
+from backend.app.batches import export
+from backend.app.batches.export import CSV_COLUMNS, export_results
+
+
+def record(n: int) -> dict:
+    run_id = str(uuid.UUID(int=n))
+    return {
+        "row_num": n,
+        "status": "succeeded",
+        "run_id": run_id,
+        "source": "portal",
+        "error_code": None,
+        "error_msg": None,
+        "input": {"member_id": f"M{n}", "note": 'say "hi", ok'},
+        "output": {"plan": "Gold"},
+        "archive_key": None,
+        "artifacts_path": f"/runs/{run_id}/artifacts",
+    }
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    pages = [[record(1), record(2)], [record(3)]]
+
+    async def iter_result_pages(batch_id, page_size=export.PAGE_SIZE):
+        for page in pages:
+            yield page
+
+    monkeypatch.setattr(export, "iter_result_pages", iter_result_pages)
+    return pages
+
+
+async def collect(fmt: str, gzip: bool = False) -> bytes:
+    return b"".join([chunk async for chunk in export_results(uuid.uuid4(), fmt, gzip=gzip)])
+
+
+@pytest.mark.asyncio
+async def test_csv_streams_one_chunk_per_page(pages):
+    chunks = [chunk async for chunk in export_results(uuid.uuid4(), "csv")]
+    assert len(chunks) == 2  # header rides with the first page
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert [r["row_num"] for r in rows] == ["1", "2", "3"]
+    assert list(rows[0]) == CSV_COLUMNS
+    assert json.loads(rows[0]["input"]) == {"member_id": "M1", "note": 'say "hi", ok'}
+    assert rows[0]["error_code"] == ""
+
+
+@pytest.mark.asyncio
+async def test_ndjson_round_trips(pages):
+    lines = (await collect("ndjson")).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [rec for page in pages for rec in page]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+async def test_gzip_matches_plain_output(pages, fmt):
+    assert zlib.decompress(await collect(fmt, gzip=True), wbits=31) == await collect(fmt)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+from backend.app.events.hub import EventHub, encode_frame
+
+
+class IdleBus:
+    async def tail(self, last_id):
+        await asyncio.Event().wait()
+        yield  # pragma: no cover
+
+
+def frames(sub) -> list[dict]:
+    out = []
+    while not sub.queue.empty():
+        item = sub.queue.get_nowait()
+        out.append(None if item is None else json.loads(item[1].decode().split("data: ", 1)[1]))
+    return out
+
+
+@pytest_asyncio.fixture
+async def hub():
+    hub = EventHub(bus=IdleBus(), queue_size=2)
+    yield hub
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_events_reach_matching_subscribers_only(hub):
+    run = hub.subscribe(run_id="r1")
+    batch = hub.subscribe(batch_id="b1")
+    both = hub.subscribe(run_id="r2", batch_id="b1")
+    everything = hub.subscribe()
+
+    hub.dispatch({"type": "run.running", "run_id": "r1"})
+    hub.dispatch({"type": "run.running", "run_id": "r3", "batch_id": "b1"})
+
+    assert [e["run_id"] for e in frames(run)] == ["r1"]
+    assert [e["run_id"] for e in frames(batch)] == ["r3"]
+    assert frames(both) == []
+    assert [e["run_id"] for e in frames(everything)] == ["r1", "r3"]
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_frames(hub):
+    sub = hub.subscribe(run_id="r1")
+    for n in range(4):
+        hub.dispatch({"type": "run.progress", "run_id": "r1", "n": n})
+    assert [e["n"] for e in frames(sub)] == [2, 3]
+    assert sub.dropped == 2 and hub.stats()["dropped"] == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_disconnected_under_disconnect_policy(hub):
+    hub.slow_policy = "disconnect"
+    sub = hub.subscribe(run_id="r1")
+    for n in range(3):
+        hub.dispatch({"type": "run.progress", "run_id": "r1", "n": n})
+    assert frames(sub) == [None]  # closed marker only
+    assert sub.closed
+    assert hub.stats()["connections"] == 0 and hub.stats()["run_filters"] == 0
+    hub.dispatch({"type": "run.progress", "run_id": "r1"})
+    assert frames(sub) == []
+
+
+@pytest.mark.asyncio
+async def test_listener_errors_do_not_stop_delivery(hub):
+    seen = []
+
+    def broken(evt):
+        raise RuntimeError("boom")
+
+    hub.add_listener(broken)
+    hub.add_listener(seen.append)
+    sub = hub.subscribe(run_id="r1")
+    hub.dispatch({"type": "run.succeeded", "run_id": "r1"})
+    assert len(seen) == 1 and len(frames(sub)) == 1
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_prunes_filters(hub):
+    a, b = hub.subscribe(run_id="r1"), hub.subscribe(run_id="r1")
+    hub.unsubscribe(a)
+    assert hub.stats()["run_filters"] == 1
+    hub.unsubscribe(b)
+    hub.unsubscribe(b)  # idempotent
+    assert hub.stats()["connections"] == 0 and hub.stats()["run_filters"] == 0
+
+
+def test_frames_carry_the_stream_id_but_not_the_trace():
+    frame = encode_frame({"type": "run.running", "trace": {"traceparent": "00-x"}}, "1-0").decode()
+    assert frame.startswith("id: 1-0\n")
+    assert "traceparent" not in frame
@@ -0,0 +1,79 @@
+import pytest
+
+from backend.app.batches.ingest import iter_rows, validate_chunk
+
+
+async def body(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def rows(data: bytes, fmt: str, size: int = 7) -> list:
+    return [row async for chunk in iter_rows(body(data, size), fmt) for row in chunk]
+
+
+CSV = (
+    "\ufeffpayer_id,member_id,note\r\n"
+    'availity,M1,"multi\nline, with ""quotes"""\r\n'
+    "availity,Mé2,\r\n"
+    "availity,M3\r\n"
+).encode()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 2, 7, 1 << 16])
+async def test_csv_rows_survive_any_chunking(size):
+    assert await rows(CSV, "csv", size) == [
+        (1, {"payer_id": "availity", "member_id": "M1", "note": 'multi\nline, with "quotes"'}, None),
+        (2, {"payer_id": "availity", "member_id": "Mé2"}, None),  # empty cell: not provided
+        (3, None, "expected 3 columns, got 2"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_unterminated_quote_is_reported():
+    assert await rows(b'a,b\n1,"open\n2,3\n', "csv") == [(1, None, "unterminated quoted field")]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_rows_and_errors():
+    data = b'{"member_id": "M1"}\n\n[1, 2]\n{broken\n{"member_id": "M2"}'
+    out = await rows(data, "ndjson", 5)
+    assert [(n, raw) for n, raw, _ in out] == [(1, {"member_id": "M1"}), (2, None), (3, None), (4, {"member_id": "M2"})]
+    assert out[1][2] == "row must be a JSON object"
+    assert out[2][2].startswith("invalid json")
+
+
+def eligibility(**kw) -> dict:
+    row = {
+        "payer_id": "availity",
+        "provider_npi": "1234567893",
+        "member_id": "M1",
+        "patient_last_name": "Smith",
+        "patient_dob": "1980-01-02",
+        "service_date": "2024-06-01",
+    }
+    row.update(kw)
+    return row
+
+
+def test_validate_chunk_keeps_good_rows_of_a_failing_chunk():
+    chunk = validate_chunk(
+        "eligibility",
+        [
+            (1, eligibility(), None),
+            (2, None, "invalid json"),
+            (3, {"payer_id": "availity"}, None),
+            (4, eligibility(member_id="M4"), None),
+        ],
+    )
+    assert [(n, payload["member_id"]) for n, _, payload in chunk.valid] == [(1, "M1"), (4, "M4")]
+    assert [e.row_num for e in chunk.invalid] == [2, 3]
+    assert chunk.invalid[0].errors == [{"msg": "invalid json"}]
+    assert {tuple(e["loc"]) for e in chunk.invalid[1].errors} >= {("member_id",), ("provider_npi",)}
+
+
+def test_validate_chunk_keys_match_across_equivalent_rows():
+    chunk = validate_chunk("eligibility", [(1, eligibility(), None), (2, eligibility(), None), (3, eligibility(member_id="M2"), None)])
+    keys = [key for _, key, _ in chunk.valid]
+    assert keys[0] == keys[1] != keys[2]
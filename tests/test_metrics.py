@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY, Histogram
+
+from backend.app.metrics import CREATE_RUN_STAGE, LatencyMiddleware, timed
+
+
+def count(route: str, status: str, method: str = "GET") -> float:
+    sample = REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": method, "route": route, "status": status}
+    )
+    return sample or 0.0
+
+
+def app_for(route: str | None, status: int = 200, fail: bool = False):
+    async def app(scope, receive, send):
+        # The router sets scope["route"] once a path matches
+        if route is not None:
+            scope["route"] = SimpleNamespace(path=route)
+        if fail:
+            raise RuntimeError("boom")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+async def call(app, path: str = "/runs/abc") -> list[dict]:
+    sent: list[dict] = []
+
+    async def send(message):
+        sent.append(message)
+
+    await LatencyMiddleware(app)({"type": "http", "method": "GET", "path": path}, None, send)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_requests_are_labelled_by_route_template():
+    before = count("/runs/{run_id}", "200")
+    await call(app_for("/runs/{run_id}"), "/runs/abc")
+    await call(app_for("/runs/{run_id}"), "/runs/def")
+    assert count("/runs/{run_id}", "200") == before + 2
+
+
+@pytest.mark.asyncio
+async def test_unmatched_paths_share_a_label():
+    before = count("unmatched", "404")
+    sent = await call(app_for(None, status=404), "/nope/1")
+    assert sent[0]["status"] == 404
+    assert count("unmatched", "404") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_unhandled_errors_count_as_500():
+    before = count("/boom", "500")
+    with pytest.raises(RuntimeError):
+        await call(app_for("/boom", fail=True), "/boom")
+    assert count("/boom", "500") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_non_http_scopes_pass_through():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["type"])
+
+    await LatencyMiddleware(app)({"type": "lifespan"}, None, None)
+    assert seen == ["lifespan"]
+
+
+def test_timed_observes_even_when_the_block_raises():
+    def stage_count() -> float:
+        return REGISTRY.get_sample_value("create_run_stage_seconds_count", {"stage": "db_insert"}) or 0.0
+
+    before = stage_count()
+    with timed(CREATE_RUN_STAGE, "db_insert"):
+        pass
+    with pytest.raises(ValueError):
+        with timed(CREATE_RUN_STAGE, "db_insert"):
+            raise ValueError
+    assert stage_count() == before + 2
+
+
+def test_timed_without_labels():
+    hist = Histogram("test_timed_seconds", "unlabelled", registry=None)
+    with timed(hist):
+        pass
+    samples = {s.name: s.value for s in hist.collect()[0].samples}
+    assert samples["test_timed_seconds_count"] == 1
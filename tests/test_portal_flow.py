@@ -0,0 +1,156 @@
+import uuid
+
+import pytest
+from temporalio import activity
+from temporalio.client import WorkflowFailureError
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Replayer, Worker
+
+from backend.agents.playwright_executor import _run_step
+from backend.dsl.compiler import compile_flow, flow_hash
+from backend.workflows.portal import PortalFlow
+from backend.workflows.queues import BROWSER, IO, queue_name
+
+
+QUEUE = "portal-test"
+
+FLOW = """
+steps:
+  - {op: navigate, url: "https://portal.test/members/{{member_id}}"}
+  - {op: input, selector: "#dob", value: "{{dob}}"}
+  - {op: extract, mappings: {plan: span.plan}}
+  - {op: emit, schema: eligibility, map: {member_id: "{{member_id}}", plan: $plan}}
+"""
+
+BREAKPOINT_FLOW = FLOW + '  - {op: breakpoint, reason: "captcha for {{member_id}}"}\n'
+
+MFA_FLOW = """
+steps:
+  - {op: navigate, url: "https://portal.test/login"}
+  - {op: input, selector: "#otp", value: "{{mfa_code}}"}
+"""
+
+FLOWS = {flow_hash(src): compile_flow(src) for src in (FLOW, BREAKPOINT_FLOW, MFA_FLOW)}
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.actions: list[tuple[str, ...]] = []
+
+    async def goto(self, url):
+        self.actions.append(("goto", url))
+
+    async def fill(self, selector, value):
+        self.actions.append(("fill", selector, value))
+
+    def locator(self, selector):
+        return self
+
+    @property
+    def first(self):
+        return self
+
+    async def inner_text(self):
+        return " Gold "
+
+
+pages: list[FakePage] = []
+recorded: list[tuple] = []
+emitted: list[dict] = []
+released: list[tuple] = []
+
+
+@activity.defn(name="run_steps")
+async def run_steps(flow_hash: str, params: dict) -> dict:
+    # The real step interpreter against a fake page
+    page = FakePage()
+    pages.append(page)
+    out: dict = {"extracted": {}, "emitted": [], "breakpoint": None}
+    for step in FLOWS[flow_hash].steps:
+        reason = await _run_step(page, step, params, out)
+        if reason is not None:
+            out["breakpoint"] = reason
+            break
+    return {"ok": True, "flow_hash": flow_hash, "steps": len(FLOWS[flow_hash].steps), **out}
+
+
+@activity.defn(name="emit_event")
+async def emit_event(event: dict) -> None:
+    emitted.append(event)
+
+
+@activity.defn(name="session_checkout")
+async def session_checkout(payer_id: str, credential_id: str, owner: str) -> str:
+    return "locked"  # another workflow is logging in and never releases
+
+
+@activity.defn(name="session_release")
+async def session_release(payer_id: str, credential_id: str, owner: str) -> None:
+    released.append((payer_id, credential_id, owner))
+
+
+@activity.defn(name="record_run")
+async def record_run(run_id: str, output: dict | None, error: str | None, error_code: str = "portal_error") -> None:
+    recorded.append((run_id, output, error, error_code))
+
+
+async def run_flow(source: str, inputs: dict, credential_id: str | None = None, record_run_id: str | None = None):
+    for seen in (pages, recorded, emitted, released):
+        seen.clear()
+    async with await WorkflowEnvironment.start_time_skipping() as env:
+        async with (
+            Worker(env.client, task_queue=QUEUE, workflows=[PortalFlow], activities=[emit_event]),
+            Worker(env.client, task_queue=queue_name(QUEUE, BROWSER), activities=[run_steps, session_checkout]),
+            Worker(env.client, task_queue=queue_name(QUEUE, IO), activities=[emit_event, session_release, record_run]),
+        ):
+            handle = await env.client.start_workflow(
+                PortalFlow.run,
+                args=["availity:eligibility", flow_hash(source), True, "availity", credential_id, record_run_id, inputs],
+                id=f"run-{uuid.uuid4()}",
+                task_queue=QUEUE,
+            )
+            if credential_id is None:
+                await handle.signal(PortalFlow.provide_mfa, "123456")
+            try:
+                return await handle.result()
+            finally:
+                # Every run must replay deterministically from its own history
+                await Replayer(workflows=[PortalFlow]).replay_workflow(await handle.fetch_history())
+
+
+@pytest.mark.asyncio
+async def test_run_inputs_render_flow_templates():
+    out = await run_flow(FLOW, {"member_id": "M123", "dob": "1980-01-02"})
+
+    assert pages[0].actions == [("goto", "https://portal.test/members/M123"), ("fill", "#dob", "1980-01-02")]
+    assert out["status"] == "ok"
+    assert out["extracted"] == {"plan": "Gold"}
+    assert out["emitted"] == [{"schema": "eligibility", "data": {"member_id": "M123", "plan": "Gold"}}]
+
+
+@pytest.mark.asyncio
+async def test_mfa_code_reaches_the_flow():
+    out = await run_flow(MFA_FLOW, {})
+
+    assert pages[0].actions == [("goto", "https://portal.test/login"), ("fill", "#otp", "123456")]
+    assert out["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_breakpoint_fails_the_run():
+    with pytest.raises(WorkflowFailureError) as e:
+        await run_flow(BREAKPOINT_FLOW, {"member_id": "M123", "dob": "1980-01-02"})
+    assert "captcha for M123" in str(e.value.cause)
+
+
+@pytest.mark.asyncio
+async def test_session_busy_records_the_run_as_failed():
+    run_id = str(uuid.uuid4())
+    with pytest.raises(WorkflowFailureError) as e:
+        await run_flow(FLOW, {"member_id": "M123", "dob": "1980-01-02"}, credential_id="cred-1", record_run_id=run_id)
+
+    assert e.value.cause.type == "SessionBusy"
+    assert [(r[0], r[1], r[3]) for r in recorded] == [(run_id, None, "session_busy")]
+    assert [evt["type"] for evt in emitted] == ["run.failed"]
+    assert released == []  # never held the re-auth lock
+    assert pages == []
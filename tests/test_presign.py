@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+import botocore.auth
+import pytest
+from botocore.config import Config
+from botocore.credentials import Credentials
+
+from backend.app.artifacts.client import Presigner
+
+
+SIGNED_AT = 1_760_000_000  # fixed clock for both signers
+
+
+def boto_url(creds: Credentials, key: str, expires: int, endpoint_url: str | None, monkeypatch) -> str:
+    at = datetime.fromtimestamp(SIGNED_AT, tz=timezone.utc).replace(tzinfo=None)
+    monkeypatch.setattr(botocore.auth, "get_current_datetime", lambda: at)
+    client = boto3.session.Session().client(
+        "s3",
+        endpoint_url=endpoint_url,
+        region_name="us-east-2",
+        aws_access_key_id=creds.access_key,
+        aws_secret_access_key=creds.secret_key,
+        aws_session_token=creds.token,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path" if endpoint_url else "virtual"}),
+    )
+    return client.generate_presigned_url("get_object", Params={"Bucket": "artifacts", "Key": key}, ExpiresIn=expires)
+
+
+def parts(url: str):
+    u = urlsplit(url)
+    return u.scheme, u.netloc, u.path, parse_qs(u.query, keep_blank_values=True)
+
+
+@pytest.mark.parametrize("token", [None, "FwoGZXIvYXdzEJr//session+token="])
+@pytest.mark.parametrize("endpoint_url", [None, "http://minio:9000"])
+@pytest.mark.parametrize("key", ["runs/0191/screenshot 1.png", "runs/a~b/c+d=e&f.html"])
+def test_matches_botocore(token, endpoint_url, key, monkeypatch):
+    creds = Credentials("AKIDEXAMPLE", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY", token)
+    ours = Presigner(creds, "us-east-2", "artifacts", endpoint_url).sign(key, 900, SIGNED_AT)
+    assert parts(ours) == parts(boto_url(creds, key, 900, endpoint_url, monkeypatch))
+    assert ("X-Amz-Security-Token" in ours) is (token is not None)
+
+
+def test_rotated_credentials_get_new_urls(monkeypatch):
+    creds = Credentials("AKID1", "secret1", "token1")
+    p = Presigner(creds, "us-east-2", "artifacts")
+    first = p.presign_get("runs/1/a.png")
+    assert p.presign_get("runs/1/a.png") == first and p.hits == 1
+    monkeypatch.setattr(creds, "access_key", "AKID2")
+    monkeypatch.setattr(creds, "secret_key", "secret2")
+    monkeypatch.setattr(creds, "token", "token2")
+    rotated = p.presign_get("runs/1/a.png")
+    assert rotated != first and "AKID2" in rotated and "token2" in rotated
@@ -0,0 +1,55 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from backend.app.utils.ratelimit import AIMDLimiter, RedisTokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spends_burst_then_waits():
+    bucket = RedisTokenBucket(fakeredis.aioredis.FakeRedis(), "payer:a", rate=2, burst=3)
+    assert [await bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    wait = await bucket.try_acquire()
+    assert 0 < wait <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_cooldown_blocks_every_holder():
+    redis = fakeredis.aioredis.FakeRedis()
+    a = RedisTokenBucket(redis, "payer:a", rate=10, burst=10)
+    b = RedisTokenBucket(redis, "payer:a", rate=10, burst=10)
+    await a.cooldown(30)
+    assert 29 < await b.try_acquire() <= 30
+    assert await RedisTokenBucket(redis, "payer:b", rate=10, burst=10).try_acquire() == 0
+
+
+@pytest.mark.asyncio
+async def test_aimd_grows_on_success_and_halves_on_errors():
+    limiter = AIMDLimiter(initial=4, max_limit=5, latency_target_s=1)
+    await limiter.acquire()
+    await limiter.release(0.1, ok=True)
+    assert limiter.limit == 4.25
+    await limiter.acquire()
+    await limiter.release(2.0, ok=True)  # slow
+    assert limiter.limit == pytest.approx(3.825)
+    await limiter.acquire()
+    await limiter.release(0.1, ok=False)
+    assert limiter.limit == pytest.approx(1.9125)
+    for _ in range(3):
+        await limiter.acquire()
+        await limiter.release(0.1, ok=True, lockout=True)
+    assert limiter.limit == 1  # min_limit
+    assert limiter.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_aimd_blocks_at_limit_until_a_slot_is_given_back():
+    limiter = AIMDLimiter(initial=1)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    await limiter.cancel()
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.limit == 1 and limiter.inflight == 1
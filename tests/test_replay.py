@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from backend.agents.replay import compile_selector, parse_snapshot, replay
+
+
+PAGE = """
+<html><body>
+  <div id="member" class="card summary">
+    <label aria-label="Member ID">Member ID</label>
+    <span class="value" data-field="member id">M123</span>
+    <p class="greeting">Hello Ada</p>
+    <ul><li class="plan">Gold</li><li class="plan">Silver</li></ul>
+    <input name="q"><br>
+  </div>
+  <a href="/next" title="a > b">Next</a>
+</body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def snap():
+    return parse_snapshot(PAGE)
+
+
+@pytest.mark.parametrize(
+    "selector, texts",
+    [
+        ("span.value", ["M123"]),
+        ("#member > label", ["Member ID"]),
+        ('[aria-label="Member ID"]', ["Member ID"]),
+        ("[aria-label='Member ID']", ["Member ID"]),
+        ('[data-field="member id"]', ["M123"]),
+        ('a[title="a > b"]', ["Next"]),
+        ("div.card.summary li.plan", ["Gold", "Silver"]),
+        ("ul > li", ["Gold", "Silver"]),
+        ("div   p", ["Hello Ada"]),
+        ("[href^=/ne]", ["Next"]),
+        ("li[class$=an]", ["Gold", "Silver"]),
+        ("body > li", []),
+        (".missing", []),
+    ],
+)
+def test_select(snap, selector, texts):
+    assert [snap.text_of(i) for i in compile_selector(selector).select(snap)] == texts
+
+
+@pytest.mark.parametrize("selector", ["", '[x="a]', "div{", "   "])
+def test_unsupported_selectors(selector):
+    with pytest.raises(ValueError):
+        compile_selector(selector)
+
+
+def _flow(*steps: str) -> str:
+    return "steps:\n" + "".join(f"  - {s}\n" for s in steps)
+
+
+@pytest.mark.parametrize(
+    "flow, params, key, expected",
+    [
+        (_flow("{op: extract, mappings: {member_id: span.value}}"), {}, "extracted", {"member_id": "M123"}),
+        (
+            _flow('{op: extract, mappings: {href: {selector: "a", attr: href}, gone: ".nope"}}'),
+            {},
+            "extracted",
+            {"href": "/next", "gone": None},
+        ),
+        (_flow('{op: assert, selector: p.greeting, contains: "Hello {{name}}"}'), {"name": "Ada"}, "errors", []),
+        (
+            _flow('{op: assert, selector: p.greeting, contains: "Hello {{name}}"}'),
+            {"name": "Bob"},
+            "errors",
+            ["step 0 assert: 'p.greeting' does not contain 'Hello Bob'"],
+        ),
+        (
+            _flow('{op: assert, selector: p.greeting, contains: "Hello {{name}}"}'),
+            {},
+            "errors",
+            ["step 0 assert: cannot evaluate 'Hello {{name}}', missing parameters name"],
+        ),
+        (_flow("{op: click, selector: button.go}"), {}, "errors", ["step 0 click: no match for 'button.go'"]),
+        (
+            _flow(
+                "{op: extract, mappings: {plan: li.plan}}",
+                '{op: emit, schema: elig, map: {plan: $plan, member: "{{member_id}}", payer: acme}}',
+            ),
+            {"member_id": "M9"},
+            "emitted",
+            [{"schema": "elig", "data": {"plan": "Gold", "member": "M9", "payer": "acme"}}],
+        ),
+        (
+            _flow('{op: emit, schema: elig, map: {member: "{{member_id}}"}}'),
+            {},
+            "emitted",
+            [{"schema": "elig", "data": {"member": "{{member_id}}"}}],
+        ),
+        (_flow('{op: breakpoint, reason: "mfa for {{payer}}"}'), {"payer": "acme"}, "breakpoints", ["mfa for acme"]),
+    ],
+)
+def test_replay(flow, params, key, expected):
+    out = replay(flow, PAGE, params)
+    assert out[key] == expected
+    json.dumps(out)  # results are written as NDJSON
@@ -0,0 +1,106 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+from redis.exceptions import ConnectionError
+
+from backend.app.services.run_cache import RunStatusCache, etag_for
+
+
+class Loader:
+    def __init__(self, body: bytes = b'{"status":"queued"}') -> None:
+        self.body = body
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.body
+
+
+@pytest.mark.asyncio
+async def test_reads_go_lru_then_redis_then_loader():
+    redis = fakeredis.aioredis.FakeRedis()
+    load = Loader()
+    cache = RunStatusCache(redis)
+    assert await cache.get_or_load("r1", load) == (etag_for(load.body), load.body)
+    assert await cache.get_or_load("r1", load) == (etag_for(load.body), load.body)
+    assert load.calls == 1
+
+    other = RunStatusCache(redis)  # another replica: served from Redis
+    assert await other.get_or_load("r1", load) == (etag_for(load.body), load.body)
+    assert load.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_run_events_drop_both_layers():
+    redis = fakeredis.aioredis.FakeRedis()
+    load = Loader()
+    cache = RunStatusCache(redis)
+    await cache.get_or_load("r1", load)
+
+    cache.on_event({"type": "batch.created", "run_id": "r1"})  # not a run event
+    cache.on_event({"type": "run.running", "run_id": "r2"})
+    await asyncio.sleep(0.01)
+    assert await redis.exists("runs:view:r1")
+
+    load.body = b'{"status":"running"}'
+    cache.on_event({"type": "run.running", "run_id": "r1"})
+    await asyncio.sleep(0.01)
+    assert not await redis.exists("runs:view:r1")
+    assert (await cache.get_or_load("r1", load))[1] == b'{"status":"running"}'
+    assert load.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_a_load_that_raced_an_event_is_not_stored():
+    cache = RunStatusCache(fakeredis.aioredis.FakeRedis())
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow():
+        started.set()
+        await release.wait()
+        return b'{"status":"queued"}'
+
+    task = asyncio.ensure_future(cache.get_or_load("r1", slow))
+    await started.wait()
+    cache.on_event({"type": "run.running", "run_id": "r1"})
+    release.set()
+    assert (await task)[1] == b'{"status":"queued"}'  # the caller still gets its answer
+
+    fresh = Loader(b'{"status":"running"}')
+    assert (await cache.get_or_load("r1", fresh))[1] == b'{"status":"running"}'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = RunStatusCache(fakeredis.aioredis.FakeRedis())
+    release = asyncio.Event()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return b"{}"
+
+    waiters = [asyncio.ensure_future(cache.get_or_load("r1", load)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(*waiters)
+    assert calls == 1
+
+
+class DownRedis:
+    async def get(self, key):
+        raise ConnectionError("down")
+
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("down")
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_the_loader():
+    load = Loader()
+    cache = RunStatusCache(DownRedis(), lru_ttl_s=0)
+    assert (await cache.get_or_load("r1", load))[1] == load.body
+    assert await cache.get_or_load("missing", Loader(None)) is None
@@ -0,0 +1,135 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.sql.dml import Insert
+
+from backend.app.models import IdempotentRun, Run, RunStatus
+from backend.app.schemas.base import RunCreate
+from backend.app.services.runs import RunFilters, claim_runs, decode_cursor, encode_cursor, list_runs
+from backend.app.utils.ids import uuid7
+
+
+def body(member_id: str) -> RunCreate:
+    return RunCreate(purpose="eligibility", payer_id="availity", input={"member_id": member_id})
+
+
+class Result:
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    # Answers the statements claim_runs issues from `existing` (key -> run)
+    def __init__(self, existing: dict[str, Run], windowed_out: set[uuid.UUID] = frozenset()) -> None:
+        self.existing = existing
+        self.windowed_out = windowed_out  # runs the created_at-bounded lookup misses
+        self.claimed: list[str] = []
+        self.inserted: list[dict] = []
+        self.run_lookups = 0
+
+    async def execute(self, stmt, params=None):
+        if isinstance(stmt, Insert) and stmt.table.name == IdempotentRun.__tablename__:
+            bound = stmt.compile(dialect=postgresql.dialect()).params
+            self.claimed = [v for name, v in bound.items() if name.startswith("key_m")]  # row order
+            return Result([k for k in self.claimed if k not in self.existing])
+        if isinstance(stmt, Insert):
+            self.inserted = params
+            return Result([])
+        if stmt.column_descriptions[0]["name"] == "key":
+            return Result([(k, r.id) for k, r in self.existing.items() if r is not None])
+        assert stmt.column_descriptions[0]["entity"] is Run
+        self.run_lookups += 1
+        skip = self.windowed_out if self.run_lookups == 1 else set()
+        return Result([r for r in self.existing.values() if r is not None and r.id not in skip])
+
+
+def run(status: RunStatus = RunStatus.queued) -> Run:
+    return Run(id=uuid7(), purpose="eligibility", payer_id="availity", status=status)
+
+
+@pytest.mark.asyncio
+async def test_claims_keys_in_sorted_order_and_collapses_duplicates():
+    s = FakeSession({})
+    runs, new_runs = await claim_runs(s, [("k3", body("3")), ("k1", body("1")), ("k3", body("3b")), ("k2", body("2"))])
+
+    assert s.claimed == ["k1", "k2", "k3"]  # lock order never depends on the request
+    assert list(runs) == ["k3", "k1", "k2"]
+    assert [r.input_payload["member_id"] for r in new_runs] == ["3", "1", "2"]
+    assert [row["id"] for row in s.inserted] == [r.id for r in new_runs]
+
+
+@pytest.mark.asyncio
+async def test_lost_keys_resolve_to_the_existing_runs():
+    old = run(RunStatus.succeeded)
+    s = FakeSession({"k1": old})
+    runs, new_runs = await claim_runs(s, [("k1", body("1")), ("k2", body("2"))])
+
+    assert runs["k1"] is old
+    assert new_runs == [runs["k2"]]
+
+
+@pytest.mark.asyncio
+async def test_runs_outside_the_id_window_are_looked_up_again():
+    old = run()
+    s = FakeSession({"k1": old}, windowed_out={old.id})
+    runs, _ = await claim_runs(s, [("k1", body("1"))])
+    assert runs["k1"] is old and s.run_lookups == 2
+
+
+@pytest.mark.asyncio
+async def test_a_claimed_key_without_a_run_raises():
+    s = FakeSession({"k1": None})
+    with pytest.raises(NoResultFound):
+        await claim_runs(s, [("k1", body("1"))])
+
+
+def run_at(created_at: datetime) -> Run:
+    r = run()
+    r.created_at = created_at
+    return r
+
+
+def test_cursor_round_trips():
+    r = run_at(datetime(2024, 6, 1, 12, 30, 15, 123456, tzinfo=timezone.utc))
+    cursor = encode_cursor(r)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (r.created_at, r.id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bnVsbA", encode_cursor(run_at(datetime(2024, 1, 1)))[:-3]])
+def test_bad_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+class PageSession:
+    def __init__(self, rows: list[Run]) -> None:
+        self.rows = rows
+        self.sql = ""
+
+    async def execute(self, stmt):
+        self.sql = str(stmt.compile(dialect=postgresql.dialect()))
+        return Result(self.rows)
+
+
+@pytest.mark.asyncio
+async def test_list_runs_pages_by_created_at_and_id():
+    rows = [run_at(datetime(2024, 6, 1, tzinfo=timezone.utc) - timedelta(minutes=n)) for n in range(3)]
+    s = PageSession(rows)  # limit + 1 rows come back: there is a next page
+    page, cursor = await list_runs(s, RunFilters(payer_id="availity"), limit=2)
+    assert page == rows[:2] and decode_cursor(cursor) == (rows[1].created_at, rows[1].id)
+    assert "ORDER BY runs.created_at DESC, runs.id DESC" in s.sql and "LIMIT" in s.sql
+
+    s = PageSession(rows[2:])
+    page, cursor = await list_runs(s, RunFilters(), limit=2, cursor=cursor)
+    assert page == rows[2:] and cursor is None
+    assert "(runs.created_at, runs.id) < (" in s.sql
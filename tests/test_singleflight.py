@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from backend.app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    waiters = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert len(flight) == 1
+    release.set()
+    assert await asyncio.gather(*waiters) == [1] * 5
+    assert len(flight) == 0
+
+    assert await flight.do("k", fn) == 2  # finished calls are not reused
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight()
+    attempts = 0
+
+    async def fn():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(flight.do("k", fn), flight.do("k", fn), return_exceptions=True)
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    with pytest.raises(RuntimeError):
+        await flight.do("k", fn)
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fn():
+        await release.wait()
+        return "run-1"
+
+    first = asyncio.ensure_future(flight.do("k", fn))
+    second = asyncio.ensure_future(flight.do("k", fn))
+    await asyncio.sleep(0)
+    first.cancel()  # e.g. the client disconnected
+    release.set()
+    assert await second == "run-1"
+    assert first.cancelled()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from backend.app import tracing
+from backend.app.events.envelope import Event
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    # A private provider instead of the process-global one, so tests that
+    # expect tracing off are unaffected
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_provider", provider)
+    monkeypatch.setattr(tracing, "_memory", exporter)
+    monkeypatch.setattr(tracing, "get_tracer", lambda: provider.get_tracer("rcm"))
+    yield exporter
+    provider.shutdown()
+
+
+def test_disabled_tracing_adds_nothing():
+    assert tracing.current_carrier() is None
+    assert Event(type="run.queued", run_id="r1", payload={}).trace is None
+    with tracing.span_from_carrier("event.deliver", {"traceparent": "00-" + "1" * 32 + "-" + "2" * 16 + "-01"}) as span:
+        assert span is None
+
+
+def test_carrier_continues_the_trace(spans):
+    with tracing.get_tracer().start_as_current_span("create_run") as parent:
+        evt = Event(type="run.queued", run_id="r1", payload={})
+    assert evt.trace and "traceparent" in evt.trace
+
+    with tracing.span_from_carrier("event.deliver", evt.trace, **{tracing.RUN_ID: "r1"}) as span:
+        assert span is not None
+
+    create, deliver = sorted(tracing.finished_spans(), key=lambda s: s.name)
+    assert deliver.context.trace_id == create.context.trace_id == parent.get_span_context().trace_id
+    assert deliver.parent.span_id == create.context.span_id
+    assert deliver.attributes[tracing.RUN_ID] == "r1"
+
+
+def test_no_carrier_outside_a_span(spans):
+    assert tracing.current_carrier() is None
+    with tracing.span_from_carrier("event.deliver", None) as span:
+        assert span is None
+    assert tracing.finished_spans() == []
+
+
+def test_annotate_sets_only_given_attributes(spans):
+    with tracing.get_tracer().start_as_current_span("run_steps"):
+        tracing.annotate(run_id="r1", payer="availity")
+    (span,) = tracing.finished_spans()
+    assert dict(span.attributes) == {tracing.RUN_ID: "r1", tracing.PAYER: "availity"}
+
+
+@pytest.mark.parametrize(
+    "workflow_id, run_id",
+    [("run-0190f3a4-7d1e-7000-8000-000000000001", "0190f3a4-7d1e-7000-8000-000000000001"), ("batch-b1", None), ("", None)],
+)
+def test_run_id_from_workflow_id(workflow_id, run_id):
+    assert tracing.run_id_from_workflow_id(workflow_id) == run_id
+
+
+def test_file_exporter_writes_one_line_per_span(spans, tmp_path):
+    with tracing.get_tracer().start_as_current_span("outer"):
+        with tracing.get_tracer().start_as_current_span("inner"):
+            pass
+    path = tmp_path / "traces.jsonl"
+    tracing.FileSpanExporter(str(path)).export(tracing.finished_spans())
+
+    inner, outer = [json.loads(line) for line in path.read_text().splitlines()]
+    assert (inner["name"], outer["name"]) == ("inner", "outer")
+    assert inner["trace_id"] == outer["trace_id"]
+    assert inner["parent_id"] == outer["span_id"] and outer["parent_id"] is None
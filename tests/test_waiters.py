@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from backend.app.events.waiters import ChangeWaiters, run_key, wait_for_change, workflow_key
+from backend.app.services.workflow_cache import WorkflowSnapshotCache
+
+
+@pytest.mark.asyncio
+async def test_run_waiters_wake_on_run_events_only():
+    waiters = ChangeWaiters()
+    with waiters.watch(run_key("r1")) as changed:
+        waiters.on_event({"type": "batch.created", "run_id": "r1"})
+        waiters.on_event({"type": "run.running", "run_id": "r2"})
+        assert not changed.done()
+        waiters.on_event({"type": "run.running", "run_id": "r1"})
+        assert (await wait_for_change(changed, 1))["type"] == "run.running"
+    assert waiters.stats() == {"keys": 0, "waiters": 0}
+
+
+@pytest.mark.asyncio
+async def test_workflow_waiters_wake_on_any_tagged_event():
+    waiters = ChangeWaiters()
+    with waiters.watch(workflow_key("wf-1")) as a, waiters.watch(workflow_key("wf-1")) as b:
+        assert waiters.stats() == {"keys": 1, "waiters": 2}
+        waiters.on_event({"type": "breakpoint.mfa.requested", "payload": {"workflow_id": "wf-1"}})
+        assert a.done() and b.done()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_change_times_out():
+    waiters = ChangeWaiters()
+    with waiters.watch(run_key("r1")) as changed:
+        assert await wait_for_change(changed, 0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_cache_follows_workflow_events():
+    cache = WorkflowSnapshotCache()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return f'{{"n":{len(loads)}}}'.encode(), False
+
+    etag, body = await cache.get_or_load("wf-1", load)
+    assert (etag, body) == await cache.get_or_load("wf-1", load)  # finished: cached
+    assert len(loads) == 1
+
+    cache.on_event({"type": "run.succeeded", "payload": {"workflow_id": "wf-2"}})
+    assert cache.peek("wf-1") == (etag, body)
+    cache.on_event({"type": "run.succeeded", "payload": {"workflow_id": "wf-1"}})
+    assert cache.peek("wf-1") is None
+    etag2, body2 = await cache.get_or_load("wf-1", load)
+    assert body2 == b'{"n":2}' and etag2 != etag
+    await cache.get_or_load("wf-1", load, fresh=True)
+    assert len(loads) == 3
+
+
+@pytest.mark.asyncio
+async def test_snapshot_cache_expires_running_workflows():
+    cache = WorkflowSnapshotCache(running_ttl_s=0)
+
+    async def load():
+        return b'{"status":"running"}', True
+
+    await cache.get_or_load("wf-1", load)
+    await asyncio.sleep(0.001)
+    assert cache.peek("wf-1") is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_cache_drops_loads_that_raced_an_event():
+    cache = WorkflowSnapshotCache()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return b'{"status":"running"}', False
+
+    task = asyncio.ensure_future(cache.get_or_load("wf-1", slow_load))
+    await started.wait()
+    cache.on_event({"type": "breakpoint.mfa.requested", "payload": {"workflow_id": "wf-1"}})
+    release.set()
+    await task
+    assert cache.peek("wf-1") is None
@@ -0,0 +1,224 @@
+import mmap
+
+import pytest
+
+from backend.app.x12.mappers import parse_responses, x12_date, x12_datetime
+from backend.app.x12.tokenizer import Delimiters, X12Error, detect_delimiters, iter_segments, iter_transactions
+
+
+def isa(element="*", component=":", segment="~", repetition="^", version="00501", control="000000905") -> str:
+    e = element
+    return (
+        f"ISA{e}00{e}          {e}00{e}          {e}ZZ{e}PAYER          {e}ZZ{e}RECEIVER       "
+        f"{e}240115{e}1230{e}{repetition}{e}{version}{e}{control}{e}0{e}P{e}{component}{segment}"
+    )
+
+
+def interchange(*transactions: str, gs_date="20240115", gs_time="1230", **delims) -> bytes:
+    body = "".join(transactions)
+    return (isa(**delims) + f"GS*HB*PAYER*RCV*{gs_date}*{gs_time}*1*X*005010X279A1~{body}GE*1*1~IEA*1*000000905~").encode()
+
+
+ELIGIBILITY = (
+    "ST*271*0001*005010X279A1~BHT*0022*11*REQ1*20240115*1230~HL*1**20*1~"
+    "NM1*PR*2*ACME HEALTH*****PI*ACME01~HL*2*1*21*1~NM1*1P*2*CLINIC*****XX*1234567890~"
+    "HL*3*2*22*1~TRN*1*OWN1*9877281234~TRN*2*TRACE1*9877281234~NM1*IL*1*DOE*JOHN****MI*M1~REF*6P*GRP9~"
+    "DTP*346*D8*20240101~DTP*291*RD8*20240101-20241231~EB*1*IND*30^1^33*HM*GOLD PPO~"
+    "EB*B*IND*98*HM**27*25*****Y~EB*B*IND*98*HM**27*40*****N~EB*C*IND*30*HM**23*1500~"
+    "EB*C*FAM*30*HM**29*750.50~EB*G*IND*30*HM**23*5000~EB*A*IND*30*HM****0.2***Y~"
+    "HL*4*3*23*0~NM1*03*1*DOE*JANE~EB*6~SE*22*0001~"
+)
+
+CLAIM_STATUS = (
+    "ST*277*0002*005010X212~BHT*0010*08*REF1*20240116*0800*DG~HL*1**20*1~HL*2*1*21*1~HL*3*2*19*1~"
+    "HL*4*3*22*0~NM1*IL*1*DOE*JOHN****MI*M1~TRN*2*CLM1~STC*F1:65*20240112**300*280~"
+    "TRN*2*CLM2~STC*F2:85:PR*20240112**300*0*******DENIED FOR AUTH~SVC*HC:99213*300*0~STC*F2:96*20240113~"
+    "HL*5*3*23*0~TRN*2*CLM3~STC*P1:20*20240110~SE*17*0002~"
+)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (isa(), Delimiters(ord("*"), ord(":"), ord("~"), ord("^"))),
+        (isa(element="|", component=">", segment="\n", repetition="}"), Delimiters(ord("|"), ord(">"), ord("\n"), ord("}"))),
+        (isa(repetition="U", version="00401"), Delimiters(ord("*"), ord(":"), ord("~"), None)),
+        ("\xef\xbb\xbf" + isa(), Delimiters(ord("*"), ord(":"), ord("~"), ord("^"))),
+        ("\r\n  " + isa(), Delimiters(ord("*"), ord(":"), ord("~"), ord("^"))),
+    ],
+)
+def test_detect_delimiters(header, expected):
+    delims, _ = detect_delimiters(header.encode("latin-1"))
+    assert delims == expected
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (b"GS*HB~", "no ISA header"),
+        (isa()[:80].encode(), "no ISA header"),
+        (isa().replace("ISA*00*", "ISA*00 ").encode(), "fewer than 16 elements"),
+        (isa(component="~").encode(), "not distinct"),
+        (isa().replace("*", "~").encode(), "not distinct"),
+    ],
+)
+def test_detect_delimiters_errors(data, message):
+    with pytest.raises(X12Error, match=message):
+        detect_delimiters(data)
+
+
+def _as(kind: str, data: bytes):
+    if kind == "bytes":
+        return data
+    if kind == "bytearray":
+        return bytearray(data)
+    if kind == "memoryview":
+        return memoryview(data)
+    m = mmap.mmap(-1, len(data))
+    m.write(data)
+    return m
+
+
+@pytest.mark.parametrize("kind", ["bytes", "bytearray", "memoryview", "mmap"])
+def test_iter_segments_buffers(kind):
+    data = interchange("ST*271*0001~HL*1**20*1~SE*3*0001~")
+    segs = list(iter_segments(_as(kind, data)))
+    assert [s.tag for s in segs] == ["ISA", "GS", "ST", "HL", "SE", "GE", "IEA"]
+    assert segs[3][3] == "20" and segs[3][9] == ""
+
+
+def test_segment_elements():
+    (seg,) = [s for s in iter_segments(interchange("ST*271*1~EB*1*IND*30^1^33*HM*GOLD PPO~SE*3*1~")) if s.tag == "EB"]
+    assert seg[5] == "GOLD PPO"
+    assert seg.repeats(3) == ["30", "1", "33"]
+    assert seg.repeats(9) == []
+    assert seg.raw() == b"EB*1*IND*30^1^33*HM*GOLD PPO"
+
+
+def test_segment_components_and_no_repetition():
+    data = interchange("ST*277*1~STC*F2:85:PR*20240112~SE*3*1~", repetition="U", version="00401")
+    (seg,) = [s for s in iter_segments(data) if s.tag == "STC"]
+    assert seg.components(1) == ["F2", "85", "PR"]
+    assert seg.repeats(1) == ["F2:85:PR"]
+
+
+def test_newline_separated_and_concatenated_interchanges():
+    first = interchange("ST*271*0001~SE*2*0001~").decode().replace("~", "~\r\n")
+    second = interchange("ST|277|0002\nSE|2|0002\n", element="|", segment="\n").decode().replace("*", "|").replace("~", "\n")
+    txs = list(iter_transactions((first + second).encode()))
+    assert [(t.code, t.control, len(t.segments)) for t in txs] == [("271", "0001", 2), ("277", "0002", 2)]
+
+
+@pytest.mark.parametrize(
+    "codes, expected",
+    [(None, ["271", "277"]), ({"271"}, ["271"]), ({"277"}, ["277"]), ({"835"}, [])],
+)
+def test_iter_transactions_filter(codes, expected):
+    data = interchange(ELIGIBILITY, CLAIM_STATUS)
+    assert [t.code for t in iter_transactions(data, codes=codes)] == expected
+
+
+def test_transaction_envelope():
+    (tx,) = iter_transactions(interchange(ELIGIBILITY))
+    assert (tx.interchange, tx.group, tx.sender, tx.date, tx.time) == ("000000905", "1", "PAYER", "20240115", "1230")
+    assert tx.trace_id == "000000905-1-0001"
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (interchange("ST*271*0001~HL*1**20*1~"), "has no SE"),
+        ((isa() + "ST*271*0001~SE*2*0001~").encode(), "outside of an ISA/GS envelope"),
+    ],
+)
+def test_iter_transactions_errors(data, message):
+    with pytest.raises(X12Error, match=message):
+        list(iter_transactions(data))
+
+
+@pytest.mark.parametrize(
+    "fmt, value, expected",
+    [
+        ("D8", "20240115", "2024-01-15"),
+        ("RD8", "20240101-20241231", "2024-01-01/2024-12-31"),
+        ("D8", "", None),
+        ("D8", "2024", "2024"),
+    ],
+)
+def test_x12_date(fmt, value, expected):
+    assert x12_date(fmt, value) == expected
+
+
+@pytest.mark.parametrize(
+    "date, time, expected",
+    [
+        ("20240115", "1230", "2024-01-15T12:30:00"),
+        ("20240115", "123045", "2024-01-15T12:30:45"),
+        ("20240115", "", "2024-01-15"),
+    ],
+)
+def test_x12_datetime(date, time, expected):
+    assert x12_datetime(date, time) == expected
+
+
+def test_map_271():
+    subscriber, dependent = parse_responses(interchange(ELIGIBILITY))
+    assert subscriber.model_dump() == {
+        "correlation_id": "TRACE1",
+        "member_id": "M1",
+        "payer": "ACME01",
+        "plan_name": "GOLD PPO",
+        "coverage": {
+            "group_number": "GRP9",
+            "dates": {"346": "2024-01-01", "291": "2024-01-01/2024-12-31"},
+            "active": True,
+            "status_code": "1",
+            "insurance_type": "HM",
+            "service_types": ["30", "1", "33"],
+            "out_of_pocket": {"IND": {"calendar_year": 5000.0}},
+            "coinsurance": {"30": 0.2},
+        },
+        "copay": {"98": {"amount": 25.0, "in_network": True}},
+        "deductible": {"IND": {"calendar_year": 1500.0}, "FAM": {"remaining": 750.5}},
+        "as_of": "2024-01-15T12:30:00",
+        "source": "271",
+        "trace_id": "000000905-1-0001",
+    }
+    # A dependent without its own id is reported under the subscriber's
+    assert (dependent.member_id, dependent.coverage) == ("M1", {"active": False, "status_code": "6"})
+    assert dependent.correlation_id == "REQ1"
+
+
+def test_map_271_payer_rejection():
+    tx = (
+        "ST*271*0003~BHT*0022*11*REQ3*20240115*1230~HL*1**20*1~NM1*PR*2*ACME~AAA*N**42*P~"
+        "HL*2*1*22*0~NM1*IL*1*DOE****MI*M3~AAA*Y**72*C~SE*8*0003~"
+    )
+    (resp,) = parse_responses(interchange(tx))
+    assert resp.payer == "ACME"
+    assert resp.coverage["errors"] == [
+        {"reject_reason": "72", "follow_up": "C"},
+        {"reject_reason": "42", "follow_up": "P"},
+    ]
+
+
+def test_map_277():
+    paid, denied, pending = parse_responses(interchange(CLAIM_STATUS))
+    assert (paid.correlation_id, paid.status, paid.paid_amount, paid.denials, paid.last_update) == (
+        "CLM1",
+        "paid",
+        280.0,
+        None,
+        "2024-01-12",
+    )
+    assert (denied.status, denied.paid_amount, denied.last_update) == ("denied", 0.0, "2024-01-13")
+    assert denied.denials == [
+        {"category": "F2", "status_code": "85", "entity": "PR", "date": "2024-01-12", "message": "DENIED FOR AUTH", "line": None},
+        {"category": "F2", "status_code": "96", "entity": None, "date": "2024-01-13", "message": None, "line": "99213"},
+    ]
+    assert (pending.correlation_id, pending.status, pending.trace_id) == ("CLM3", "pending", "000000905-1-0002")
+
+
+def test_parse_responses_skips_unsupported_sets():
+    other = "ST*835*0009~BPR*I*100~SE*3*0009~"
+    assert [r.source for r in parse_responses(interchange(other, ELIGIBILITY, other))] == ["271", "271"]